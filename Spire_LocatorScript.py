@@ -10,17 +10,23 @@
 # Import modules
 import sys, arcpy, datetime, traceback
 import os
+import numpy
 import pandas
-import geopandas
 import shutil
 import keyring
 import requests
 import base64
-import regex as re
-import urllib.request
-from urllib.parse import urlparse
-from office365.runtime.auth.user_credential import UserCredential
-from office365.sharepoint.files.file import File
+import cardfetch
+import doccache
+import svcclean
+import regionrun
+import shpexport
+import tablereader
+import locindex
+import attachexport
+import svcends
+import stagestats
+import stagegraph
 # This helps print statements generate as they are produced instead of at once.
 class Unbuffered(object):
    def __init__(self, stream):
@@ -33,103 +39,25 @@ class Unbuffered(object):
        self.stream.flush()
    def __getattr__(self, attr):
        return getattr(self.stream, attr)
-def arcgis_table_to_df(in_fc, input_fields=None, query=""):
+def arcgis_table_to_df(in_fc, input_fields=None, query="", dtypes=None, chunk_size=100000, bulk=None):
     """Function will convert an arcgis table into a pandas dataframe with an object ID index, and the selected
-    input fields using an arcpy.da.SearchCursor.
+    input fields. Rows are read with an arcpy.da.SearchCursor and converted chunk_size rows at a time so
+    memory stays close to the size of the final dataframe.
     :param - in_fc - input feature class or table to convert
-    :param - input_fields - fields to input to a da search cursor for retrieval
+    :param - input_fields - fields to input to a da search cursor for retrieval. All fields if omitted.
     :param - query - sql query to grab appropriate values
+    :param - dtypes - dictionary of field name to dtype, such as 'category' for codes or 'string' for text
+    :param - chunk_size - number of rows converted at a time
+    :param - bulk - 'numpy' or 'arrow' to read every row in one call instead of with a cursor
     :returns - pandas.DataFrame"""
-    # Set object id field name 
-    OIDFieldName = arcpy.Describe(in_fc).OIDFieldName
-    # If there are input fields entered...
-    if input_fields:
-        # add oid to input fields variable
-        final_fields = [OIDFieldName] + input_fields
-    # otherwise if no input fields supplied...
-    else:
-        # Utilize all fields
-        final_fields = [field.name for field in arcpy.ListFields(in_fc)]
-    # Iterate through rows to get a list of all data that is relevant
-    data = [row for row in arcpy.da.SearchCursor(in_fc,final_fields,where_clause=query)]
-    # Convert that list into a dataframe
-    fc_dataframe = pandas.DataFrame(data,columns=final_fields)
-    # Set an index based on the input object id
-    fc_dataframe = fc_dataframe.set_index(OIDFieldName,drop=True)
-    # Return a dataframe object
-    return fc_dataframe
-def copyFeature(shpName, sdeConnect, keepList, inputFC, sqlQ='#'):
-    """
-    This function creates a shapefile based on an input
-    feature class within a Spire SDE while using a list of
-    field names to keep.
-    It optionally can take a SQL query to take only certain
-    features from the original feature class.
-    """
-    # Set the workspace to the sdeConnect variable given. Get output is used as
-    # a string to path avoids some issues.
-    wsConnect = sdeConnect.getOutput(0)
-    arcpy.env.workspace = wsConnect
-    print("Set Environment to: {0}".format(wsConnect))
-    # Empty field mapping object created
-    fmap = arcpy.FieldMappings()
-    # The input FC is added to the field mappings object
-    fmap.addTable(inputFC)
-    # Get all fields
-    fields = {f.name: f for f in arcpy.ListFields(inputFC)}
-    # Clean up field map based on keep list
-    for fname, fld in fields.items():
-        # Avoid required OID and Geometry fields as well as SHAPE field
-        if fld.type not in ('OID', 'Geometry') and 'shape' not in fname.lower():
-            # if the field name isn't something set to be kept...
-          if fname not in keepList:
-              # Delete it from the field mappings object
-              fmap.removeFieldMap(fmap.findFieldMapIndex(fname))
-    # A list of current Spire Directories and areas
-    paths = ['SpireAL','MoEast','MoWest']
-    # Set variable to the path declared in script
-    # TO CHANGE WHAT DIRECTORY THIS CREATES THE BASE FILES IN, POINT THIS
-    # VARIABLE TO DESIRED DIRECTORY.
-    setPath = sdeTempPath
-    # Global variables for the folder directories are created for use outside
-    # the function
-    global shpPath
-    # Determine what SDE is being used and set shpPath to point to a matching
-    # directory to store shapefiles in.
-    if sdeConnect == sdeAL:
-        print("Connecting to the {0} SDE.".format(paths[0]))
-        shpPath = os.path.join(setPath, paths[0])
-    elif sdeConnect == sdeMOE or sdeConnect == sdeMOEPoly:
-        shpPath = os.path.join(setPath, paths[1])
-        print("Connecting to the {0} SDE.".format(paths[1]))
-    elif sdeConnect == sdeMOW or sdeConnect == sdeMOWPoly:
-        shpPath = os.path.join(setPath, paths[2])
-        print("Connecting to the {0} SDE.".format(paths[2]))
-    # Prior to using the directory, test to see if it exists.
-    # If it does not, create a new directory based on that name.
-    if not os.path.exists(shpPath):
-        os.mkdir(shpPath)
-        print("No folder for shapefiles. A directory has been created at {0}.".format(shpPath))
-    # Delete any existing shapefile to avoid overwrite issues
-    doesEx = os.path.join(shpPath, shpName + ".shp")
-    if arcpy.Exists(doesEx):
-        arcpy.Delete_management(doesEx)
-    # Create the new shapefile to be sent to locator company
-    # newSHP is made global so it can be used in Distribution Main/Services/WO Polys
-    global newSHP
-    newSHP = arcpy.conversion.FeatureClassToFeatureClass(inputFC, shpPath, shpName,\
-                                                sqlQ, fmap)
-    print("Shapefile has been created in {0}.".format(newSHP))
-    print("\n")
-    # Delete inputs to prepare for next shapefile
-    del shpName, keepList, inputFC, sdeConnect
-    # return none
-    return
-def create_pdf(fc, path, fields):
+    return tablereader.read_table(in_fc, input_fields, query, dtypes=dtypes,
+                                  chunk_size=chunk_size, bulk=bulk)
+def create_pdf(fc, path, fields, cache=None):
     """
     Take input date, and feature class which contains the
     FIELDBOOKP path and copy the files using the FIELDBOOKP url to the
-    designated path
+    designated path. If a doccache.DocumentCache is given, files that were
+    already delivered and haven't changed are not copied again.
     """
     # Get current date in proper format
     cur_date = datetime.date.today()
@@ -144,7 +72,13 @@ def create_pdf(fc, path, fields):
             # If fieldbookp is not null and its url has a working file in it...
             if row[0] != 'None' and os.path.exists(row[0]):
                 # Copy file to output folder
-                shutil.copy2(row[0], path)
+                if cache is None:
+                    shutil.copy2(row[0], path)
+                else:
+                    cache.copy_file(row[0], path)
+    # Save the manifest so the next run knows what was delivered
+    if cache is not None:
+        cache.save()
 def get_fieldnote(feature, in_field, out_field):
     """
     Take an input shapefile with a FIELDBOOKP field. Create a new field called
@@ -181,88 +115,109 @@ def get_fieldnote(feature, in_field, out_field):
                     # Assign it to the fieldNote
                     row[1] = fieldnote_name
             cursor.updateRow(row)
-def isspatial(table_df, table_field, sp_df, location_field, region, output_path):
+def isspatial(table_chunks, table_field, location_index, region, output_path):
     """
-    This function takes in a dataframe of service sketches from a table and
-    service point feature class made into a geodataframe. It then finds sketches
+    This function takes in service information from a table and an index of
+    the mxlocations on a service point feature class. It then finds records
     from the table that have a matching mxlocation to an existing service point
     and creates two text files based on the match. the _spatial file is created
     if there is a match found and the _nonspatial file is made for
-    non matching records.
+    non matching records. Both files are written in the same pass.
     
     Parameters
     ----------
-    table_df : pandas dataframe
-        A dataframe of a geodatabase table containing service information
-    sp_df : geopandas dataframe
-        A geodataframe from a service point feature class containing mxlocation
+    table_chunks : pandas dataframe or iterable of dataframes
+        A geodatabase table containing service information, either whole or
+        in chunks from tablereader.iter_table_chunks
+    table_field : String
+        The field in the table holding the mxlocation
+    location_index : locindex.LocationIndex
+        The index of mxlocations from the region's service points
     region : String
         A string proving the region name. Valid uses are: SpireAL, MoEast, MoWest
-    Returns Nothing
-    """                
-    # Create a new dataframe based on an intersecting selection of locations
-    spatial_df = table_df[table_df[table_field].isin(sp_df[location_field])]
-    # Send the new dataframe to output
-    spatial_df.to_csv(os.path.join(output_path, "serviceinfo_spatial.txt"))
-    # create a new dataframe based on opposite of intersection
-    nospatial_df = table_df[~table_df[table_field].isin(sp_df[location_field])]
-    # Send no spatial dataframe to csv
-    nospatial_df.to_csv(os.path.join(output_path, "serviceinfo_nospatial.txt"))
-    
-def region_csv(input_df, service_fc, output_path, fieldname):
+    Returns the number of table records read
     """
-    input_df is a cleaned pandas dataframe that will be joined with a target
-    feature class from service_fc and then a csv of joined-only records
-    will be output in the output_path directory.
-    fieldname should be a string containing the MX location data
+    if isinstance(table_chunks, pandas.DataFrame):
+        table_chunks = [table_chunks]
+    spatial_path = os.path.join(output_path, "serviceinfo_spatial.txt")
+    nospatial_path = os.path.join(output_path, "serviceinfo_nospatial.txt")
+    rows = 0
+    # Write the header with the first chunk and append the rest
+    for i, chunk in enumerate(table_chunks):
+        rows += len(chunk)
+        mode = 'w' if i == 0 else 'a'
+        # Split the chunk on whether its location has a service point
+        spatial_df, nospatial_df = location_index.partition(chunk, table_field)
+        spatial_df.to_csv(spatial_path, mode=mode, header=(i == 0))
+        nospatial_df.to_csv(nospatial_path, mode=mode, header=(i == 0))
+    return rows
+
+
+def backfill_addresses(point_fc, line_fc, point_fields=('SERVICEMXL', 'STREETADDR'),
+                       line_fields=('MXLOCATION', 'STREETADDRESS'), blank=' '):
     """
-    # Read the input feature class
-    fc_df = geopandas.read_file(service_fc, usecols=[fieldname])
-    # Merge
-    df_merge = input_df[input_df['Location'].isin(fc_df[fieldname])]
-    # df_merge = fc_df.merge(input_df, left_on=fieldname, right_on="Location")
-    # Output to target location
-    reg_csv = df_merge.to_csv(output_path, columns=['Location', 'Document', 'createdate'], index = False)
-    # Return a csv path and object
-    return reg_csv
-def retrieve_url(path, url, location, filename, region, badcsv):
+    Fill blank street addresses on service points with the street address of
+    the service line sharing the same mx location.
+
+    Only the mx location and address fields are read, column by column, into
+    numpy arrays. Service line addresses are kept in a sorted key array so
+    service points are matched with a binary search over the whole array at
+    once instead of a dictionary of every service line. If an mx location is
+    found on several service lines the last address read is used. Only the
+    service points that change are written, in a single update cursor pass
+    over the points with a blank address.
+
+    Returns the number of service point addresses that were filled.
     """
-    Go to a url and if it is a valid path, store the file
-    with the filename parameter in the listed path and region
-    folder. Otherwise, add the information to the badcsv file.
+    point_fields = list(point_fields)
+    line_fields = list(line_fields)
+    # Read just the mx location and address of service lines that have both
+    where = "{0} IS NOT NULL AND {1} IS NOT NULL".format(line_fields[0], line_fields[1])
+    lines = arcpy.da.TableToNumPyArray(line_fc, line_fields, where_clause=where)
+    # Reverse the arrays so unique keeps the last address read for each key
+    line_keys, last = numpy.unique(lines[line_fields[0]][::-1], return_index=True)
+    line_addrs = lines[line_fields[1]][::-1][last]
+    del lines
+    # Read the object id, mx location and address of every service point
+    points = arcpy.da.TableToNumPyArray(point_fc, ['OID@'] + point_fields)
+    # Only service points with a blank address need a look up
+    points = points[points[point_fields[1]] == blank]
+    if len(points) == 0 or len(line_keys) == 0:
+        return 0
+    # Find where each service point's mx location would sit in the sorted keys
+    pos = numpy.searchsorted(line_keys, points[point_fields[0]])
+    pos[pos == len(line_keys)] = 0
+    found = line_keys[pos] == points[point_fields[0]]
+    new_addrs = line_addrs[pos]
+    # Keep the rows whose address actually changes
+    changed = found & (new_addrs != blank)
+    updates = dict(zip(points['OID@'][changed].tolist(), new_addrs[changed].tolist()))
+    del points
+    if not updates:
+        return 0
+    # Write the changed rows in one pass over the points with a blank address
+    where = "{0} = '{1}'".format(point_fields[1], blank)
+    with arcpy.da.UpdateCursor(point_fc, ['OID@', point_fields[1]], where) as cur:
+        for row in cur:
+            if row[0] in updates:
+                row[1] = updates[row[0]]
+                cur.updateRow(row)
+    return len(updates)
+
+
+def region_csv(input_df, location_index, output_path):
+    """
+    input_df is a cleaned pandas dataframe whose Location field will be
+    matched against location_index, the locindex.LocationIndex of
+    the target feature class, and then a csv of matched-only records will
+    be output in the output_path directory.
     """
-    # Create the sharepoint connection
-    sharepoint_pass = keyring.get_password("rjd_sharepointlogin", "email")
-    credentials = UserCredential("email", sharepoint_pass)
-    # Set path for writing new file
-    filepath = os.path.join(path, region, filename)
-    # If its a sharepoint url...
-    if 'sharepoint' in url:
-        # Try the following operation
-        try:
-            # Create a copy of the url file in target location
-            with open(filepath, 'wb') as new_file:
-                # print("Sharepoint file found at {0}. Storing file now.".format(url))
-                File.from_url(url).with_credentials(credentials).download(new_file).execute_query()
-        # If file/url not found...
-        except Exception as e:
-            print(str(e))
-            print("Error on {0}".format(url))
-            # Add its record to a csv of incorrect service cards
-            with open(badcsv, 'a') as bad_file:
-                bad_file.write(str(location) + "," + str(url) + "\n")
-    # If the url is not a sharepoint url...
-    else:
-        # try to copy the file to the given path using the given filename
-        try:
-            urllib.request.urlretrieve(url, filepath)
-        # If file can't be copied, print errors and send to bad csv
-        except Exception as e:
-            print("Error {0}.".format(e))
-            print("URL location {0} not found.".format(url))
-            #If the file can't be copied, add to the bad csv list
-            with open(badcsv, 'a') as bad_file:
-                bad_file.write(str(location) + "," + str(url))
+    # Keep the records with a location in the feature class
+    df_merge = location_index.select(input_df, 'Location')
+    # Output to target location
+    df_merge.to_csv(output_path, columns=['Location', 'Document', 'createdate'], index = False)
+    # Return the number of records written
+    return len(df_merge)
 def unsplit_service(feature, path, keepList):
     """
     This function takes in a feature class and a list of field names.
@@ -299,189 +254,157 @@ def unsplit_service(feature, path, keepList):
             #Change the field name to the name minus any "MAX" found
             arcpy.AlterField_management(unsplit_fc, field.name, field.name.replace("MAX_", ""))
     return unsplit_fc
-# Set unbuffered mode
-sys.stdout = Unbuffered(sys.stdout)
-# ignore geopandas warnings for chained assignment--its an intentional decision
-pandas.options.mode.chained_assignment = None
-try:
-    # set datetime variable
-    date = datetime.datetime.now()
-    sdeTempPath = r""
-    if not os.path.exists(sdeTempPath):
-        os.mkdir(sdeTempPath)
-        print("Temporary directory not found. A new directory has been " + \
-              "created at {0}.".format(sdeTempPath))
-    else:
-        print("The temp directory already exists at {0} and will be used.".format(sdeTempPath))
-    # open log file for holding errors
-    logName = "Log.txt"
-    logPath = os.path.join(r'', logName)
-    log = open(logPath,"a+")
-    log.write("----------------------------" + "\n")
-    log.write("----------------------------" + "\n")
-    # write datetime to log
-    log.write("Log: " + str(date) + "\n")
-    log.write("\n")
-    ## -----------------------Variable setup---------------------------------------
+def region_setup(ctx):
+    """
+    Prepare a worker process to run a region. Region workers start with a
+    fresh copy of this script, so the temp path and arcpy environment set
+    up by the main script have to be set again from ctx.
+    """
     # set arcpy environment to allow overwriting
     arcpy.env.overwriteOutput=True
     # Set environment to transport subtype descriptions
     arcpy.env.transferDomains = True
-    #--------------------Create SDE Connections------------------------------------
-    print("Creating database connections...")
-    # SDE connetion information removed for confidentiality
-    sdeMOE = arcpy.CreateDatabaseConnection_management()
-    ##Create the MO West SDE Connection
-    sdeMOW = arcpy.CreateDatabaseConnection_management()
-    sdeAL = arcpy.CreateDatabaseConnection_management()
-    #Mo East WO Polygons are stored in a different SDE than gas facilities.
-    # This SDE connection sets that up.
-    sdeMOEPoly = arcpy.CreateDatabaseConnection_management()
-    sdeMOWPoly = arcpy.CreateDatabaseConnection_management()
-    
-    #--------------------Sign into Maximo for Service Card Downloads-----------
-    # Print statement
-    print("Connecting to Maximo...")
-    # Create sign in string from keyring
-    # Elements removed for confidentiality
-    signin_string = "b':" + str(keyring.get_password("Maximo_RD", ""))
-    # Set maximo sign in credentials as bytes
-    maxauth = base64.b64encode(str.encode(signin_string))
-    # Set host url
-    host = 'hostname'
-    # Create maximo headers
-    headers = {'maxauth': maxauth, # BASIC AUTH = LOGIN: PASSWORD}
-               'Accept': "application/json",
-               'Content-Type': "application/json",
-               'Allow-Hidden': "true",
-               }
-    # Set up parameters
-    params = { 'lean':1,
-              }
-    # Send in the maximo request to sign in during session
-    r = requests.post(host, headers=headers, verify=False)
-    ###----------------------------AL Setup------------------------------------
-    ########---------ROW Lines-------------------------------------------------
-    shpName = "Right of Way Lines"
-    inputFC = sdeAL.getOutput(0) + 'location'
-    keepList = []
-    copyFeature(shpName,sdeAL,keepList,inputFC)
-    #####---------Services----------------------------------------------------
-    shpName = "Services"
-    inputFC = sdeAL.getOutput(0) + 'location'
-    keepList = ['INSTALLDATE','MEASUREDLENGTH','LENGTHSOURCE','COATINGTYPE',\
-              'PIPETYPE','NOMINALPIPESIZE','PIPEGRADE','PRESSURECODE',\
-              'MATERIALCODE','LABELTEXT','TRANSMISSION_FLAG',\
-              'LOCATIONDESCRIPTION','HIGHDENSITYPLASTIC','PROJECTYEAR',\
-              'PROJECTNUMBER','SERVICETYPE','MANUFACTURER','LENGTH604',\
-              'STREETADDRESS','MAINMATERIAL','MXLOCATION']
-    copyFeature(shpName,sdeAL,keepList,inputFC)
-    # Assign variable to hold shapefile location
-    alSvc_shp = str(newSHP)
-    #------------------------Service Point------------------------- --------
-    shpName = "ServicePoint"
-    inputFC = sdeAL.getOutput(0) + 'location'
-    keepList = ['CUSTOMERTYPE','SERVICEMXLOCATION','SERVICESTATUS','DISCLOCATION',\
-                  'STREETADDRESS','METERLOCATIONDESC','METERLOCATION','MXSTATUS']
-    copyFeature(shpName,sdeAL,keepList,inputFC)
-    al_svc_pt = str(newSHP)
-    #------Service point CSV creation------
-    #Read text file of service lines, set dtypes and make createdate a date
-    svc_df = pandas.read_csv(r"file.txt", 
-                              usecols=['Location', 'URLName', 'createdate'],
-                              dtype={'Location':'string', 'URLName':'string'},
-                              parse_dates=['createdate'])
-    # Fill null values as those can cause errors
-    svc_df['Location'].fillna("No Location", inplace = True)
-    svc_df['URLName'].fillna("No URL Found", inplace = True)
-    svc_df['createdate'].fillna('01/01/1000', inplace = True)
-    # Clean up csv urls that contain incorrect sections
-    svc_df = svc_df.apply(lambda x: x.replace({'doclocation': 'server',
-                                                '#': '%23', "FieldBook":"Field Book", "\\\\": r'/'},
-                                              regex=True))
-    # Further clean up the URLName field using re.escape to allow ** entries
-    svc_df['URLName'] = svc_df['URLName'].str.split(re.escape('**')).str[0]       
-    # Create new column based on just fieldbook name of last segment
-    svc_df['Document'] = svc_df['URLName'].apply(lambda x: x[x.rfind('/')+1:])
-    # Replace FieldNote where URLName contains 'servicecards' to account for duplicates
-    svc_mask = (svc_df['URLName'].str.contains('servicecards'))
-    #Create a dataframe based on the new mask
-    svc_mask_df = svc_df.loc[svc_mask]
-    # On the masked layer, set all FieldNotes to use the last two parts of the URLName
-    svc_mask_df['Document'] = svc_mask_df['URLName'].apply(lambda x: '_'.join(urlparse(x).path[1:].split('/')[2:]))
-    # Create an inverse mask
-    svc_invert_mask = (~svc_df['URLName'].str.contains('servicecards'))
-    # Create dataframe of inverted mask
-    svc_invert_df = svc_df.loc[svc_invert_mask]
-    # Concantenate the two masked dataframes into one
-    mask_concat = pandas.concat([svc_invert_df, svc_mask_df])
-    # Replacement list
-    replace_list = ["OHBUpoad_", "MaximoDrawers123_Images_", "FY19_Maximo_Images_"]
-    # Set replacement list into a regex string
-    replace_pat = '|'.join(replace_list)
-    # Use a mask to change only columns in Document containing replacement string and replace string with ''
-    mask_concat.loc[mask_concat['Document'].str.contains(replace_pat, regex = True), 'Document'] = mask_concat['Document'].str.replace(replace_pat, '', regex = True)
-    # Set the concat output path
-    svc_tbl_csv = os.path.join(sdeTempPath, 'file.csv')
-    # Create the new base CSV
-    mask_concat.to_csv(svc_tbl_csv)
-#     # Get the dates needed for subset date selection
-    curdate = datetime.datetime.today()
-    # After any testing, make sure b ackdate time is set to 7 days
-    backdate = curdate - datetime.timedelta(days=7)
+    # ignore geopandas warnings for chained assignment--its an intentional decision
+    pandas.options.mode.chained_assignment = None
+def region_card_loader(ctx, region):
+    """
+    Create a service card downloader for a region. Each region keeps its own
+    document manifest so workers never write the same file. The manifest and
+    the document store are kept outside the region folder, which is
+    delivered.
+    """
+    # Manifest of service cards delivered on previous runs
+    doc_cache = doccache.DocumentCache(os.path.join(ctx['sdeTempPath'], 'DocumentCache', region,
+                                                    'DocumentManifest.json'))
+    # Sharepoint login is looked up once and shared by every download in the region
+    return cardfetch.CardDownloader(cardfetch.sharepoint_credentials(),
+                                    workers=ctx['card_workers'],
+                                    per_host=ctx['card_host_limit'],
+                                    cache=doc_cache)
+def region_report(ctx, region):
+    """
+    Create the run report for a region worker. Each region writes its own
+    file, which the main script adds to the run report when the regions
+    finish.
+    """
+    return stagestats.RunReport(os.path.join(ctx['sdeTempPath'], 'RunReport_{0}.jsonl'.format(region)),
+                                'Spire_LocatorScript', ctx['run_id'], region)
+def process_spire_al(ctx):
+    """
+    Alabama pipeline. Creates the SpireAL shapefiles, the region service
+    card csv, downloads the service cards from the last week and creates the
+    spatial and nonspatial service info files.
+    ctx is the dictionary of settings built by the main script. Returns a
+    summary of the service card downloads for the log.
+    """
+    region_setup(ctx)
+    sdeTempPath = ctx['sdeTempPath']
+    sdeAL = ctx['sdeAL']
+    # Get the dates needed for subset date selection
+    curdate = ctx['curdate']
+    backdate = ctx['backdate']
+    # Shapefiles to send for Alabama
+    al_exports = [
+        ########---------ROW Lines---------------------------------------------
+        shpexport.ExportSpec("Right of Way Lines", sdeAL + 'location', [], region='SpireAL'),
+        #####---------Services------------------------------------------------
+        shpexport.ExportSpec("Services", sdeAL + 'location',
+                             ['INSTALLDATE','MEASUREDLENGTH','LENGTHSOURCE','COATINGTYPE',\
+                              'PIPETYPE','NOMINALPIPESIZE','PIPEGRADE','PRESSURECODE',\
+                              'MATERIALCODE','LABELTEXT','TRANSMISSION_FLAG',\
+                              'LOCATIONDESCRIPTION','HIGHDENSITYPLASTIC','PROJECTYEAR',\
+                              'PROJECTNUMBER','SERVICETYPE','MANUFACTURER','LENGTH604',\
+                              'STREETADDRESS','MAINMATERIAL','MXLOCATION'],
+                             region='SpireAL'),
+        #------------------------Service Point---------------------------------
+        shpexport.ExportSpec("ServicePoint", sdeAL + 'location',
+                             ['CUSTOMERTYPE','SERVICEMXLOCATION','SERVICESTATUS','DISCLOCATION',\
+                              'STREETADDRESS','METERLOCATIONDESC','METERLOCATION','MXSTATUS'],
+                             region='SpireAL'),
+        ]
+    report = region_report(ctx, 'SpireAL')
+    runner = shpexport.ExportRunner(sdeTempPath, ctx['export_workers'])
+    with report.stage('shapefile_export', len(al_exports)) as stage:
+        al_shps = runner.run(al_exports)
+        stage.rows_out = len(al_shps)
+    shpPath = runner.region_path('SpireAL')
+    # Assign variables to hold shapefile locations
+    alSvc_shp = al_shps["Services"]
+    al_svc_pt = al_shps["ServicePoint"]
+    # Read the cleaned service table prepared by the main script
+    svc_df = pandas.read_pickle(ctx['svc_table'])
     # Create a boolean mask for the date range
     mask = (svc_df['createdate'] < curdate) & (svc_df['createdate'] >= backdate)
     # Detect the sub-dataframe and then assign to a new dataframe
     sel_df = svc_df.loc[mask]
-    #Create a geodf from alabama services
-    al_gdf = geopandas.read_file(alSvc_shp, usecols=['MXLOCATION'])
-    # output the region-specific CSV for   locators
-    region_csv(svc_df, alSvc_shp, os.path.join(sdeTempPath, 'SpireAL', 'file.txt'), 'MXLOCATION')
-    # Join the service lines to the sketch file to get just AL services that
+    with report.stage('region_csv', len(svc_df)) as stage:
+        # Index the mxlocations of alabama services and service points once
+        al_svc_index = locindex.LocationIndex.from_table(alSvc_shp, 'MXLOCATION')
+        al_sp_index = locindex.LocationIndex.from_table(al_svc_pt, 'SERVICEMXL')
+        # output the region-specific CSV for   locators
+        stage.rows_out = region_csv(svc_df, al_svc_index, os.path.join(sdeTempPath, 'SpireAL', 'file.txt'))
+    # Match the service lines to the sketch file to get just AL services that
     # have been updated in last [backdate] days
-    al_merge = al_gdf.merge(sel_df, left_on="MXLOCATION", right_on="Location")
+    al_merge = al_svc_index.select(sel_df, 'Location')
     # Create bad service card csv path
     badcsv_loc = os.path.join(sdeTempPath, 'SpireAL', 'BadServiceCards.csv')
-    # run the url thing
-    for index, row in al_merge.iterrows():
-        url = row['URLName']
-        file_name = row['Document']
-        # Ignore null or empty file names
-        if file_name or file_name == 'No URL Found':
-            #get the url
-            retrieve_url(sdeTempPath, row['URLName'], row['Location'], row['Document'],
-                          'SpireAL', badcsv_loc)
+    # Download the service cards through the region's downloader
+    card_loader = region_card_loader(ctx, 'SpireAL')
+    with card_loader, report.stage('service_cards', len(al_merge)) as stage:
+        stage.rows_out = card_loader.download_frame(al_merge, sdeTempPath, 'SpireAL', badcsv_loc)[0]
+        stage.bytes = card_loader.bytes_downloaded
     # Create the _spatial and _nospatial text files
     #Read dataframe of service table created in other script
     al_serviceinfo = r"servicehistorylocation"
-    # Convert it to a dataframe
-    svcinfo_df = arcgis_table_to_df(al_serviceinfo)
-    # Read the alabana service point file as a geodataframe
-    al_mxfield = 'SERVICEMXL'
-    # Create service point geodataframe
-    al_gdf_sp = geopandas.read_file(str(al_svc_pt), usecols=[al_mxfield])
+    # Read it in chunks
+    svcinfo_chunks = tablereader.iter_table_chunks(al_serviceinfo)
     # Create spatial and nospatial csvs
-    isspatial(svcinfo_df, 'MXLOC', al_gdf_sp, 'SERVICEMXL',"Alabama", shpPath)
-    
-    #############################   MISSOURI EAST    #######################
+    with report.stage('service_info') as stage:
+        stage.rows_in = isspatial(svcinfo_chunks, 'MXLOC', al_sp_index, "Alabama", shpPath)
+    return 'SpireAL document cache: ' + card_loader.cache.summary()
+def process_mo_east(ctx):
+    """
+    MO East pipeline. Creates the MoEast shapefiles and marker pictures,
+    backfills service point addresses, adds service points for orphan
+    service lines, creates the region service card csv, downloads the
+    service cards from the last week and creates the spatial and nonspatial
+    service info files.
+    ctx is the dictionary of settings built by the main script. Returns a
+    summary of the service card downloads for the log.
+    """
+    region_setup(ctx)
+    sdeTempPath = ctx['sdeTempPath']
+    sdeMOE = ctx['sdeMOE']
+    svc_tbl_csv = ctx['svc_tbl_csv']
+    # Get the dates needed for subset date selection
+    curdate = ctx['curdate']
+    backdate = ctx['backdate']
+    # Shapefiles to send for MO East
+    moe_exports = [
+        ##-------------------------Inspection---------------------------------
+        shpexport.ExportSpec("Inspections", sdeMOE + 'inspectionlocation',
+                             ['DATECREATED', 'SYMBOLROTATION', 'GLOBALID'], region='MoEast'),
+        ##------------------------Service Points------------------------------
+        shpexport.ExportSpec("ServicePointMoEast", sdeMOE + 'location',
+                             ['CUSTOMERTYPE','SERVICEMXLOCATION','SERVICESTATUS','DISCLOCATION',\
+                              'STREETADDRESS','METERLOCATIONDESC','METERLOCATION','MXSTATUS'],
+                             region='MoEast'),
+        ]
+    report = region_report(ctx, 'MoEast')
+    runner = shpexport.ExportRunner(sdeTempPath, ctx['export_workers'])
+    with report.stage('shapefile_export', len(moe_exports)) as stage:
+        moe_shps = runner.run(moe_exports)
+        stage.rows_out = len(moe_shps)
+    shpPath = runner.region_path('MoEast')
+    inspection_shp = moe_shps["Inspections"]
     ##-------------------------Inspection-----------------------------------
-    shpName = "Inspections"
-    inputFC = sdeMOE.getOutput(0) + 'inspectionlocation'
-    keepList = ['DATECREATED', 'SYMBOLROTATION', 'GLOBALID']
-    copyFeature(shpName,sdeMOE,keepList,inputFC)
     # The Inspections FC contains pictures of markerball placement
     # that has been deemed important for the locators. This code segment takes those
     # pictures from an attachment table to the feature class.
     # Get needed variables
-    inputTable = sdeMOE.getOutput(0) + 'file'
+    inputTable = sdeMOE + 'file'
     mbPicPath = os.path.join(shpPath, "ElectronicMarkerPictures")
-    # If path to save pictures does not exist, create it.
-    if not os.path.exists(mbPicPath):
-        os.mkdir(mbPicPath)
-        print("No folder for Electronic Marker Pictures. A directory has been created at {0}.".format(mbPicPath))
     # Only recent pictures need to be sent
-    # Create list to store GlobalIDs that match a certain date range
-    globalList = []
     # set two date variables with no h/m/s to match shapefile format
     cur_date = datetime.date.today()
     # back date should be for 14 days. Currently set to 6000 to give all data in one go.
@@ -489,139 +412,38 @@ try:
     backDate = datetime.date.today() - datetime.timedelta(days=7)
     # Set a sql query using dates
     query='"DATECREATE" <= date '+"'"+str(cur_date)+"' AND "+'"DATECREATE" >= date '+"'"+str(backDate)+"'"
-
-    # Create search cursor in newly created Inspections shapefile
-    # only search where inspection created date is from last two weeks
-    with arcpy.da.SearchCursor(newSHP, ['DATECREATE', 'GLOBALID'], query) as cursor:
-        # Iterate through each row and append the global id's found to the empty list
-        for row in cursor:
-            idList = row[1]
-            globalList.append(idList)
-    # With a list of global ids marking pictures from the last 14 days, search
-    # through the attached table of pictures
-    with arcpy.da.SearchCursor(inputTable, ['DATA', 'ATT_NAME', 'ATTACHMENTID', 'REL_GLOBALID', 'CONTENT_TYPE']) as cursor:
-        for row in cursor:
-            # Only iterate through attachments where the global ids match the
-            # Ids of inspections from the last 14 days
-            # Note: Someone once attached a file with a CONTENT_TYPE of application.
-            # This generated an error. As such, code filters for only images.
-            if row[3] in globalList and row[4] == 'image/jpeg':
-                # Set the attachment variable which contains the data
-                attachment = row[0]
-                # Store the name of the file
-                filename = str(row[3]) + ".jpg"
-                # open the path desired and then write the found attachment to that location
-                # using the filename variable to name it.
-                print("The attachment {0} has been copied to {1}.".format(filename, mbPicPath))
-                open(mbPicPath + os.sep + filename, 'wb').write(attachment.tobytes())
-                # Print statement to check files are copied
+    # Create a set of the GlobalIDs of inspections created in that date range
+    with arcpy.da.SearchCursor(inspection_shp, ['GLOBALID'], query) as cursor:
+        globalIDs = {row[0] for row in cursor}
+    # Export the pictures attached to those inspections.
+    # Note: Someone once attached a file with a CONTENT_TYPE of application.
+    # This generated an error. As such, only images are exported.
+    pic_exporter = attachexport.AttachmentExporter(inputTable, mbPicPath, content_type='image/jpeg')
+    with report.stage('marker_pictures', len(globalIDs)) as stage:
+        written, skipped = pic_exporter.export(globalIDs)
+        stage.rows_out = written
+    print("{0} marker pictures copied to {1}. {2} were already there.".format(written, mbPicPath, skipped))
 
 ##------------------------Service Points--------------------------- ------
-    shpName = "ServicePointMoEast"
-    inputFC = sdeMOE.getOutput(0) + 'location'
-    keepList = ['CUSTOMERTYPE','SERVICEMXLOCATION','SERVICESTATUS','DISCLOCATION',\
-              'STREETADDRESS','METERLOCATIONDESC','METERLOCATION','MXSTATUS']
-    copyFeature(shpName,sdeMOE,keepList,inputFC)
-    # Add missing addresses
-    # Empty dictionary to fill with service line addresses & mxlocations
-    svcDict = {}
-    # Fields to fill dictionary
-    svcFields = ['MXLOCATION','STREETADDRESS']
+    # Assign service points to variable for later use
+    moe_svc_pt = moe_shps["ServicePointMoEast"]
     # service line feature class to use for search
-    searchFC = sdeMOE.getOutput(0) + 'location'
-    distMainFC = sdeMOE.getOutput(0) + 'location'
-    # Insert search cursor
-    with arcpy.da.SearchCursor(searchFC, svcFields) as Searchcursor:
-    # For each row in cursor, get data for dictionary
-        for row in Searchcursor:
-            # store the row data in variables
-            loc = row[0]
-            newAddr = row[1]
-            # Only add addresses that are not blank
-            if row[1] != None:
-                # add address in format of key(mxlocation) and value (streetaddress)
-                svcDict[loc] = newAddr
-# Use update cursor to update service point shp
-    with arcpy.da.UpdateCursor(newSHP, ['SERVICEMXL','STREETADDR']) as cur:
-        #For each row in cursor, iterate
-        for row in cur:
-            #Set variables for serviceMXL and streetaddr in the row
-            mxLoc = row[0]
-            oldAddr = row[1]
-        #If the mx location is found in the dictionary, update
-            if mxLoc in svcDict:
-                # update if old address is blank and the dictionary address isn't null
-                if oldAddr == ' ' and svcDict[mxLoc] != None:
-                    #Change the street address to the street address matching the mxLocation in dict
-                    row[1] = svcDict[mxLoc]
-                    #update the row
-                    cur.updateRow(row)
+    searchFC = sdeMOE + 'location'
+    distMainFC = sdeMOE + 'location'
+    # Add missing addresses from the service lines sharing the mx location
+    with report.stage('address_backfill') as stage:
+        filled = stage.rows_out = backfill_addresses(moe_svc_pt, searchFC)
+    print("{0} missing service point addresses filled from service lines.".format(filled))
   ### The section below is to create service points from services that only have
     #a service line fc and no service point in the data. Locator uses service points
     # to look at whether a service exists so creating phantom ones avoids issues.
-    # Create feature layers from service shp and service line and dist main
-    ws = arcpy.env.workspace = sdeTempPath
-    arcpy.MakeFeatureLayer_management(newSHP, "point_lyr")
-    arcpy.MakeFeatureLayer_management(searchFC, "svcLine_lyr")
-    arcpy.MakeFeatureLayer_management(distMainFC, "distMain_lyr")
-    # Select feature layers by location, lines that intersect service point shp
-    # can use INVERT to invert selection
-    arcpy.SelectLayerByLocation_management(in_layer="svcLine_lyr",\
-                                          overlap_type="INTERSECT",\
-                                          select_features="point_lyr",\
-                                          search_distance="",\
-                                          selection_type="NEW_SELECTION",\
-                                          invert_spatial_relationship="INVERT")
-    # Copy features to in memory fc
-    memLine = "in_memory" + "\\" + "svcLine_lyr"
-    arcpy.CopyFeatures_management("svcLine_lyr", memLine)
-    print("Service line copied.")
-    # Generate points along lines for END_POINTS
-    # Use FeatureVerticesToPoints_management using BOTH_ENDS
-    memPoints = "in_memory" + "\\" + "vertice_points"
-    arcpy.FeatureVerticesToPoints_management(memLine, memPoints, "BOTH_ENDS")
-    arcpy.MakeFeatureLayer_management(memPoints, "memPoint_lyr")
-    print("Vertice Points created.")
-    # Select newly generated points that intersect with dist main, invert
-    arcpy.SelectLayerByLocation_management(in_layer="memPoint_lyr",\
-                                        overlap_type="INTERSECT",\
-                                        select_features="distMain_lyr",\
-                                        search_distance="",\
-                                        selection_type="NEW_SELECTION",\
-                                        invert_spatial_relationship="INVERT")
-    # Copy selected features to in memory
-    memPointsNew = "in_memory" + "\\" + "notdMain_points"
-    arcpy.CopyFeatures_management("memPoint_lyr", memPointsNew)
-    fieldsLi = arcpy.ListFields(memPointsNew)
-    # Append in memory features to shapefile using No_Test
-    appendLayer = memPointsNew
-    target_layer = newSHP
-    # Set field mappings object var
-    fieldMappings = arcpy.FieldMappings()
-    # Add tables for layers to be used
-    fieldMappings.addTable(target_layer)
-    fieldMappings.addTable(appendLayer)
-    # Create list for map fields and add the fields wanted
-    listMapFields = []
-    # List goes append layer(1) ,target layer (2)
-    listMapFields.append(('MXLOCATION','SERVICEMXL'))
-    listMapFields.append(('STREETADDRESS','STREETADDR'))
-  # Iterate through the fields
-    for field_map in listMapFields:
-      # Add fields to a field map index with target layer
-      fieldToMapIndex = fieldMappings.findFieldMapIndex(field_map[1])
-      # Get map var
-      fieldToMap = fieldMappings.getFieldMap(fieldToMapIndex)
-      # Add append layer to field map to match target layer
-      fieldToMap.addInputField(appendLayer, field_map[0])
-      # Replace original index with updated one
-      fieldMappings.replaceFieldMap(fieldToMapIndex, fieldToMap)
-    # Create append layer as a list
-    inData = [appendLayer]
-    # Append the newly created points to the target shapefile
-    arcpy.Append_management(inData, target_layer, "NO_TEST", fieldMappings)
-    # Assign service points to variable for later use
-    moe_svc_pt = str(newSHP)
+    # Endpoints of service lines with no service point that aren't on a main
+    # are found with one spatial index pass and inserted straight into the shapefile
+    with report.stage('orphan_endpoints') as stage:
+        added = stage.rows_out = svcends.append_orphan_points(moe_svc_pt, searchFC, distMainFC,
+                                                              line_fields=('MXLOCATION', 'STREETADDRESS'),
+                                                              point_fields=('SERVICEMXL', 'STREETADDR'))
+    print("{0} service points created from service line endpoints.".format(added))
 ###--------------Add Service Sketches----------------------------------------
 ### This section sends over service sketches to based on the last 7 days
     # Read the cleaned csv
@@ -633,72 +455,237 @@ try:
     mask = (clean_df['createdate'] < curdate) & (clean_df['createdate'] >= backdate)
     # Detect the sub-dataframe and then assign to a new dataframe
     sel_df = clean_df.loc[mask]
-    #Create a geodf from mo east services
-    moe_mxfield = 'SERVICEMXL'
-    moe_gdf = geopandas.read_file(str(moe_svc_pt), usecols=[moe_mxfield])
-    # output the region-specific CSV for locator
-    region_csv(clean_df, str(moe_svc_pt),
-                os.path.join(sdeTempPath, 'MOEast', 'location.txt'),
-                moe_mxfield)
-    # Join the service lines to the sketch file to get just AL services that
-    # have been updated in last [backdate] days
-    moe_merge = moe_gdf.merge(sel_df, left_on=moe_mxfield, right_on="Location")
+    with report.stage('region_csv', len(clean_df)) as stage:
+        # Index the mxlocations of mo east service points once
+        moe_index = locindex.LocationIndex.from_table(moe_svc_pt, 'SERVICEMXL')
+        # output the region-specific CSV for locator
+        stage.rows_out = region_csv(clean_df, moe_index, os.path.join(sdeTempPath, 'MOEast', 'location.txt'))
+    # Match the service points to the sketch file to get just MO East services
+    # that have been updated in last [backdate] days
+    moe_merge = moe_index.select(sel_df, 'Location')
     # Create bad service card csv path
     badcsv_loc = os.path.join(sdeTempPath, 'MOEast', 'BadServiceCards.csv')
-    # grab url names that aren't good so they can be added to a bad csv file
-    for index, row in moe_merge.iterrows():
-        url = row['URLName']
-        file_name = row['Document']
-        # Ignore null or empty file names
-        if file_name or file_name == 'No URL Found':
-            #get the url
-            retrieve_url(sdeTempPath, row['URLName'], row['Location'], row['Document'],
-                          'MOEast', badcsv_loc)
+    # Download the service cards. Urls that aren't good are added to the bad csv file
+    card_loader = region_card_loader(ctx, 'MOEast')
+    with card_loader, report.stage('service_cards', len(moe_merge)) as stage:
+        stage.rows_out = card_loader.download_frame(moe_merge, sdeTempPath, 'MOEast', badcsv_loc)[0]
+        stage.bytes = card_loader.bytes_downloaded
     # service info table created in another script
     moe_serviceinfo = r"serviceinfotablelocation"
-    # Convert it to a dataframe
-    svcinfo_df = arcgis_table_to_df(moe_serviceinfo)
+    # Read it in chunks
+    svcinfo_chunks = tablereader.iter_table_chunks(moe_serviceinfo)
     # Create spatial and nospatial csvs
-    isspatial(svcinfo_df, 'LOC', moe_gdf, 'SERVICEMXL', "MOEast", shpPath)
-    
-    
-    #Clean up the workspace
-    arcpy.env.workspace = ""
-    # Clean up sde connections in loop
-    for item in [sdeAL, sdeMOE, sdeMOW, sdeMOEPoly, sdeMOWPoly]:
-        os.remove(item.getOutput(0))
-    #close out the log file
-    print("Closing the log file.")
-    log.write("Log: Script Ran successfully at  " + str(date) + "\n")
-    log.close()
-    # Send Email
-    # List of people to email in string format
-    recepientAddress = "TargetEmails"
-    # String as command line using the blat.exe SMTP program from www.blat.net to send email
-    command = 'blat.exe -f email -to {} -s "Log File" -body "New log from Script. Please see attached report for more details.<br><br>This is an automated email. Please do not reply." -server emailserver -attach "{}" -html'.format(recepientAddress,logPath)
-    # Enter system command
-    os.system(command)
-except:
-    # Grab the traceback information
-    tb = sys.exc_info()[2]
-    tbinfo = traceback.format_tb(tb)[0]
-    # Creae a message for it and send it to the log
-    pymsg = "PYTHON ERRORS:\nTraceback info:\n" + tbinfo + "\nError Info:\n" \
-            + str(sys.exc_info()[1])
-    # Send arcpy errors to log
-    msgs = "ArcPy ERRORS:\n" + arcpy.GetMessages(2) + "\n"
-    log.write("" + pymsg + "\n")
-    log.write("" + msgs + "")
-    # Print any messages to console
-    print(msgs)
-    # Close log
-    log.close()
-    # Clean up sde connections
-    for item in [sdeAL, sdeMOE, sdeMOW, sdeMOEPoly, sdeMOWPoly]:
-        os.remove(item.getOutput(0))
-    # list of emails to  be sent to in string format
-    recepientAddress = "emails"
-    # String as command line using the blat.exe SMTP program from www.blat.net to send email
-    command = 'blat.exe -f email -to {} -s " Log File. Error Found." -body "New log from Script. Please see attached report for more details.<br><br>This is an automated email. Please do not reply." -server emailserver -attach "{}" -html'.format(recepientAddress,logPath)
-    # Enter system command
-    os.system(command)
\ No newline at end of file
+    with report.stage('service_info') as stage:
+        stage.rows_in = isspatial(svcinfo_chunks, 'LOC', moe_index, "MOEast", shpPath)
+    return 'MOEast document cache: ' + card_loader.cache.summary()
+# Only the main process runs the script. Region worker processes import this
+# file to find the region functions and must skip everything below.
+if __name__ == '__main__':
+    # Set unbuffered mode
+    sys.stdout = Unbuffered(sys.stdout)
+    # ignore geopandas warnings for chained assignment--its an intentional decision
+    pandas.options.mode.chained_assignment = None
+    # Paths of the SDE connection files made this run, so they can be removed
+    # even if the run fails part way through creating them
+    connections = {}
+    try:
+        # set datetime variable
+        date = datetime.datetime.now()
+        sdeTempPath = r""
+        if not os.path.exists(sdeTempPath):
+            os.mkdir(sdeTempPath)
+            print("Temporary directory not found. A new directory has been " + \
+                  "created at {0}.".format(sdeTempPath))
+        else:
+            print("The temp directory already exists at {0} and will be used.".format(sdeTempPath))
+        # open log file for holding errors
+        logName = "Log.txt"
+        logPath = os.path.join(r'', logName)
+        log = open(logPath,"a+")
+        log.write("----------------------------" + "\n")
+        log.write("----------------------------" + "\n")
+        # write datetime to log
+        log.write("Log: " + str(date) + "\n")
+        log.write("\n")
+        # Stage timings, memory and row counts for the run, one json line each
+        report = stagestats.RunReport(os.path.join(r'', "RunReport.jsonl"), 'Spire_LocatorScript')
+        # Stages are checkpointed so a rerun on the same day skips the service
+        # table cleanup and the regions that already finished
+        graph = stagegraph.StageGraph(os.path.join(sdeTempPath, 'Checkpoints.json'),
+                                      str(date.date()), report=report)
+        ## -----------------------Variable setup---------------------------------------
+        # set arcpy environment to allow overwriting
+        arcpy.env.overwriteOutput=True
+        # Set environment to transport subtype descriptions
+        arcpy.env.transferDomains = True
+        # Get the dates needed for subset date selection
+        curdate = datetime.datetime.today()
+        # After any testing, make sure b ackdate time is set to 7 days
+        backdate = curdate - datetime.timedelta(days=7)
+        # Set the concat output path
+        svc_tbl_csv = os.path.join(sdeTempPath, 'file.csv')
+        # Cleaned table for the region workers
+        svc_table = os.path.join(sdeTempPath, 'svc_table.pkl')
+
+        #--------------------Create SDE Connections------------------------------------
+        def create_connections(stage):
+            print("Creating database connections...")
+            # SDE connetion information removed for confidentiality
+            connections['sdeMOE'] = arcpy.CreateDatabaseConnection_management().getOutput(0)
+            ##Create the MO West SDE Connection
+            connections['sdeMOW'] = arcpy.CreateDatabaseConnection_management().getOutput(0)
+            connections['sdeAL'] = arcpy.CreateDatabaseConnection_management().getOutput(0)
+            #Mo East WO Polygons are stored in a different SDE than gas facilities.
+            # This SDE connection sets that up.
+            connections['sdeMOEPoly'] = arcpy.CreateDatabaseConnection_management().getOutput(0)
+            connections['sdeMOWPoly'] = arcpy.CreateDatabaseConnection_management().getOutput(0)
+
+        #--------------------Sign into Maximo for Service Card Downloads-----------
+        def maximo_signin(stage):
+            # Print statement
+            print("Connecting to Maximo...")
+            # Create sign in string from keyring
+            # Elements removed for confidentiality
+            signin_string = "b':" + str(keyring.get_password("Maximo_RD", ""))
+            # Set maximo sign in credentials as bytes
+            maxauth = base64.b64encode(str.encode(signin_string))
+            # Set host url
+            host = 'hostname'
+            # Create maximo headers
+            headers = {'maxauth': maxauth, # BASIC AUTH = LOGIN: PASSWORD}
+                       'Accept': "application/json",
+                       'Content-Type': "application/json",
+                       'Allow-Hidden': "true",
+                       }
+            # Send in the maximo request to sign in during session
+            requests.post(host, headers=headers, verify=False)
+
+        #--------------------Service Table Cleanup--------------------------------
+        def service_table_cleanup(stage):
+            #Read text file of service lines, set dtypes and make createdate a date
+            svc_df = pandas.read_csv(r"file.txt",
+                                      usecols=['Location', 'URLName', 'createdate'],
+                                      dtype={'Location':'string', 'URLName':'string'},
+                                      parse_dates=['createdate'])
+            stage.rows_in = len(svc_df)
+            # Fill null values as those can cause errors
+            svc_df['Location'].fillna("No Location", inplace = True)
+            svc_df['URLName'].fillna("No URL Found", inplace = True)
+            svc_df['createdate'].fillna('01/01/1000', inplace = True)
+            # Clean up the Location and URLName fields and get the document name from the url
+            svc_df = svcclean.clean_service_urls(svc_df)
+            # Name service cards after the last two parts of their url to account for
+            # duplicates and remove image folder prefixes from the document names
+            mask_concat = svcclean.service_card_documents(svc_df)
+            # Create the new base CSV
+            svcclean.write_service_csv(mask_concat, svc_tbl_csv)
+            stage.rows_out = len(mask_concat)
+            # Save the cleaned table for the region workers
+            svc_df.to_pickle(svc_table)
+            return stage.rows_out
+
+        #--------------------Run the Regions--------------------------------------
+        # Regions to run. Each one runs in its own process.
+        region_funcs = [('SpireAL', process_spire_al),
+                        ('MoEast', process_mo_east)]
+        # Each region is checkpointed on its own, so a rerun only runs the
+        # regions that failed
+        region_stages = {region: stagegraph.Stage('region_' + region, func, deps=['service_table_cleanup'])
+                         for region, func in region_funcs}
+
+        def run_regions(stage):
+            # Everything a region worker needs to run on its own
+            region_ctx = dict(connections,
+                              sdeTempPath=sdeTempPath,
+                              svc_table=svc_table,
+                              svc_tbl_csv=svc_tbl_csv,
+                              curdate=curdate,
+                              backdate=backdate,
+                              # Region stage reports are tagged with this run
+                              run_id=report.run_id,
+                              # Number of service cards to download at once, and at once
+                              # per server, in each region
+                              card_workers=8,
+                              card_host_limit=4,
+                              # Number of shapefile exports to run at once, each in its
+                              # own process, in each region
+                              export_workers=2)
+            region_jobs = [(region, func, region_ctx) for region, func in region_funcs
+                           if not graph.is_current(region_stages[region])]
+            for region, func in region_funcs:
+                if not any(job[0] == region for job in region_jobs):
+                    print("Region {0} already finished this run and was skipped.".format(region))
+            stage.rows_in = len(region_jobs)
+            # Set to 1 to run the regions one after another in this process
+            region_workers = max(1, len(region_jobs))
+            failed = regionrun.run_regions(region_jobs, log, sdeTempPath, region_workers)
+            stage.rows_out = len(region_jobs) - len(failed)
+            # Checkpoint the regions that finished
+            for region, func, ctx in region_jobs:
+                if region not in failed:
+                    graph.record(region_stages[region], None)
+            # Add the region stage lines to the run report
+            for region, func, ctx in region_jobs:
+                report.merge(os.path.join(sdeTempPath, 'RunReport_{0}.jsonl'.format(region)))
+            if failed:
+                raise RuntimeError("Region(s) failed: {0}. See the log above for details.".format(", ".join(failed)))
+            return stage.rows_out
+
+        # Send Email
+        def send_email(stage):
+            #close out the log file
+            print("Closing the log file.")
+            log.write("Log: Script Ran successfully at  " + str(date) + "\n")
+            log.close()
+            # List of people to email in string format
+            recepientAddress = "TargetEmails"
+            # String as command line using the blat.exe SMTP program from www.blat.net to send email
+            command = 'blat.exe -f email -to {} -s "Log File" -body "New log from Script. Please see attached report for more details.<br><br>This is an automated email. Please do not reply." -server emailserver -attach "{}" -html'.format(recepientAddress,logPath)
+            # Enter system command
+            if os.system(command) != 0:
+                raise RuntimeError("The log email could not be sent.")
+
+        graph.add('connections', create_connections, always=True)
+        graph.add('maximo_signin', maximo_signin, always=True)
+        graph.add('service_table_cleanup', service_table_cleanup, inputs=[r"file.txt"],
+                  outputs=[svc_tbl_csv, svc_table])
+        graph.add('regions', run_regions, deps=['service_table_cleanup'])
+        graph.add('email', send_email, deps=['regions'], always=True)
+        graph.run()
+        # The run finished, so the next one starts fresh
+        graph.clear()
+        os.remove(svc_table)
+        #Clean up the workspace
+        arcpy.env.workspace = ""
+        # Clean up sde connections in loop
+        for item in connections.values():
+            if os.path.exists(item):
+                os.remove(item)
+    except Exception:
+        # Grab the traceback information
+        tb = sys.exc_info()[2]
+        tbinfo = traceback.format_tb(tb)[0]
+        # Creae a message for it and send it to the log
+        pymsg = "PYTHON ERRORS:\nTraceback info:\n" + tbinfo + "\nError Info:\n" \
+                + str(sys.exc_info()[1])
+        # Send arcpy errors to log
+        msgs = "ArcPy ERRORS:\n" + arcpy.GetMessages(2) + "\n"
+        if not log.closed:
+            log.write("" + pymsg + "\n")
+            log.write("" + msgs + "")
+            # Close log
+            log.close()
+        # Print any messages to console
+        print(pymsg)
+        print(msgs)
+        # Clean up the sde connections that were made. Checkpoints and the
+        # cleaned service table are kept so a rerun resumes where this one failed.
+        for item in connections.values():
+            if os.path.exists(item):
+                os.remove(item)
+        # list of emails to  be sent to in string format
+        recepientAddress = "emails"
+        # String as command line using the blat.exe SMTP program from www.blat.net to send email
+        command = 'blat.exe -f email -to {} -s " Log File. Error Found." -body "New log from Script. Please see attached report for more details.<br><br>This is an automated email. Please do not reply." -server emailserver -attach "{}" -html'.format(recepientAddress,logPath)
+        # Enter system command
+        os.system(command)
@@ -10,8 +10,17 @@
 # Import modules
 import arcpy
 import os
-import time
 import pcbbuff as pcbGen
+import dnrfetch
+import contamsync
+import parceljoin
+import contamschema
+import sitedissolve
+import layercache
+import stagestats
+import stagegraph
+import datetime
+import threading
 from pathlib import Path
 
 # Set environment options
@@ -44,263 +53,226 @@ else:
     
 # Assign gdb as workspace
 arcpy.env.workspace = wsGDB
+# Stage timings, memory and row counts for the run, one json line each
+report = stagestats.RunReport(os.path.join(ws, "RunReport.jsonl"), 'UpdateContaminationPolygons')
+# arcpy isn't thread safe, so stages running at once take turns with it
+# while the DNR downloads run alongside
+arcpy_lock = threading.Lock()
+
+
+def gdb_exists(path):
+    """arcpy.Exists taken in turn with the running stages."""
+    with arcpy_lock:
+        return arcpy.Exists(path)
+
+
+# Stages are checkpointed so a rerun on the same day picks up at the stage
+# that failed instead of downloading everything again. The two DNR fetches
+# and the FUSRAP and PCB layers run at once. arcpy isn't thread safe, so
+# those stages take arcpy_lock around their arcpy calls, and the parcel
+# join waits for all four so it and the stages after it run alone.
+graph = stagegraph.StageGraph(os.path.join(ws, "Checkpoints.json"), str(datetime.date.today()),
+                              exists=gdb_exists, report=report, workers=4)
+
 # MO Hazardous Waste from Department of Natural Resources
 hwpServer = "https://gis.dnr.mo.gov/arcgis/rest/services/e_start/e_start/MapServer/0"
 # set copy feature class location
 hwpCopy = os.path.join(wsGDB,"DNRHWPSite")
-# Set the path as a feature set to wrap the map service in a feature layer
-# this allows the arcpy tool to manipulate it
-hwp_fs = arcpy.FeatureSet()
-hwp_fs.load(hwpServer)
-# Query to copy only certain features
+# Query to copy only certain features. It is run by the server so only
+# matching sites are downloaded.
 hwp_query = "SITESTAT IN ('Active', 'Brownfield Assessment', 'Long-Term Stewardship', 'Inactive VCP (Terminated/Withdrew)')"
-# Generating a feature set takes some time with slower services. Add
-# a delay to give it time to finish
-arcpy.AddMessage("Creating feature set for Hazardous Waste Programs...")
-time.sleep(240)
-# Copy the features
-arcpy.conversion.FeatureClassToFeatureClass(hwp_fs, wsGDB, "DNRHWPSite", hwp_query)
-print("Copy of HWP points has been made at {0}.".format(wsGDB))
-arcpy.AddMessage("Copy of HWP points has been made at {0}.".format(wsGDB))
-
-# Modify HWP points to match schema
-# DNR added an OBJECTID field and named their normal one OBJECTID_1 which needs to be dealt with
-# First delete the OBJECTID
-dnrSite = os.path.join(wsGDB, "DNRHWPSite")
-arcpy.DeleteField_management(dnrSite, "OBJECTID")
-# Rename object ID field to OBJECTID_1
-arcpy.management.AlterField(dnrSite, "OBJECTID_1", "OBJECTID", "OBJECTID")
-# Alter shape field to match SDE
-arcpy.management.AlterField(dnrSite, "Shape", "SHAPE")
-
 #MO Underground Storage Tank Facilities from MO Department of Natural Resources
 ustServer = "https://gis.dnr.mo.gov/arcgis/rest/services/e_start/e_start/MapServer/3"
 #Set copy feature class location
 ustCopy = os.path.join(wsGDB, "DNRTankSite")
-#Set feature set
-ust_fs = arcpy.FeatureSet()
-#Load usts into feature set
-ust_fs.load(ustServer)
 # Query for only copying certain features
 ust_query = "FACSTAT IN ('Investigation/Corrective Action is Ongoing or Incomplete', 'No Further Action Letter Issued with Restriction', 'Administrative Closure')"
-arcpy.AddMessage("Creating feature set for Underground Storage Sites...")
-#Delay for load time
-time.sleep(240)
-#Copy the features
-arcpy.conversion.FeatureClassToFeatureClass(ust_fs, wsGDB, "DNRTankSite", ust_query)
-print("Copy of UST points has been made at {0}.".format(wsGDB))
-arcpy.AddMessage("Copy of UST points has been made at {0}.".format(wsGDB))
-# Modify DNR points to match schema
-# DNR added an OBJECTID field and named their normal one OBJECTID_1 which needs to be dealt with
-# First delete the OBJECTID
-ustSite = os.path.join(wsGDB, "DNRTankSite")
-arcpy.DeleteField_management(ustSite, "OBJECTID")
-# Rename object ID field to OBJECTID_1
-arcpy.management.AlterField(ustSite, "OBJECTID_1", "OBJECTID", "OBJECTID")
-# Alter shape field to match SDE
-arcpy.management.AlterField(ustSite, "Shape", "SHAPE")
-
 # Assign variables for parcel layers
 parcel_fc = maximo_connection + 'parcels'
-
-# Conduct a spatial join for UST and HWP with the merged parcels
-# Change these to in_memory after test
-hwp_output = "in_memory/HWP_Join"
-#Set up field mappings for spatial join
-hwp_fmappings = arcpy.FieldMappings()
-hwp_fmappings.addTable(hwpCopy)
-#Spatial join parcels and hwp sites
-arcpy.SpatialJoin_analysis(parcel_fc, hwpCopy, hwp_output, 
-                            "JOIN_ONE_TO_ONE", "KEEP_COMMON",hwp_fmappings,
-                            "WITHIN_A_DISTANCE", "50 Feet")
-print("HWP Sites joined to parcels...")
-arcpy.AddMessage("HWP Sites joined to parcels...")
-# Set variables for ust join
-ust_output = "in_memory/UST_Join"
-# Set up field mappings for spatial join
-ust_fmappings = arcpy.FieldMappings()
-ust_fmappings.addTable(ustCopy)
-#Spatial join parcels and ust sites
-arcpy.SpatialJoin_analysis(parcel_fc, ustCopy, ust_output, 
-                            "JOIN_ONE_TO_ONE", "KEEP_COMMON",ust_fmappings,
-                            "WITHIN_A_DISTANCE", "50 Feet")
-print("UST Sites joined to parcels...")
-arcpy.AddMessage("UST Sites joined to parcels...")
-
-# Merge the two features together to prepare for combining all the 
-# polygon feature classes into one contamination FC
-# Set merge variables
-union_output = "in_memory/contamination_union"
-arcpy.management.Merge([ust_output, hwp_output], union_output)
-print("UST and HWP parcel joins unioned together...")
-arcpy.AddMessage("UST and HWP parcel joins unioned together...")
-#The merge will need to be dissolved based on SITENAME but usts use FACNAME instead
-# A cursor is needed to move FACNAME to SITENAME
-with arcpy.da.UpdateCursor(union_output, ["SITENAME","FACNAME"]) as cursor:
-    # Iterate through all rows in the union
-    for row in cursor:
-        # If the sitename is not null...
-        if row[0] is not None:
-            #Test if the sitename is just a  blank string...
-            if len(row[0]) == 0:
-                #If it is, replace it with the facility name
-                row[0] = row[1]
-        # If the sitename is filled in...
-        if row[0] is None:
-            # Replace it with the facility name
-            row[0] = row[1]
-        # Update the row
-        cursor.updateRow(row)
-# Print messages
-print("Empty SITENAME fields filled with FACNAME fields...")
-arcpy.AddMessage("Empty SITENAME fields filled with FACNAME fields...")
-
-# Dissolve based on newly updated field which should have no null or blank values
+# The parcel join is kept in the GDB rather than in_memory so it survives
+# for a rerun
+union_output = os.path.join(wsGDB, "contamination_union")
 # Set dissolve variables
 dis_output = "contamination_dissolve"
-dis_output_loc = os.path.join(wsGDB, dis_output)   
-#Perform dissolve based on site name with multi-part features
-fields_dissolve = "AULID FIRST; OUID FIRST; SMARSID FIRST; FEDERALID FIRST; COUNTY FIRST; DNRPROGRAM FIRST; SITEOWN FIRST"
-arcpy.management.Dissolve(union_output, dis_output_loc, "SITENAME",
-                          fields_dissolve, 
-                          "MULTI_PART")
-# Print messages
-print("UST/HWP dissolved based on SITNAME...")
-arcpy.AddMessage("UST/HWP dissolved based on SITNAME...")
-# Change field names to remove FIRST_ from them.
-# List variable of field names to be changed
-first_list = ["FIRST_AULID","FIRST_OUID","FIRST_SMARSID",
-              "FIRST_FEDERALID","FIRST_COUNTY","FIRST_DNRPROGRAM","FIRST_SITEOWN"]
-# Loop through field names to remove FIRST_ from them
-for name in first_list:
-    arcpy.management.AlterField(dis_output_loc, name, (name.replace('FIRST_', '')))  
-# Print cleanup message
-print("Removed FIRST_ lines from kept fields...")
-arcpy.AddMessage("Removed FIRST_ lines from kept fields...")
+dis_output_loc = os.path.join(wsGDB, dis_output)
 #Set FUSRAP location
 fusrap_input = os.path.join(wsGDB, "FUSRAP")
-# Check for FUSRAP data existing
-if not arcpy.Exists(fusrap_input):
-    arcpy.AddMessage("FUSRAP Feature Class not found...")
-    print("FUSRAP Feature Class not found...")
-    # Create query for just FUSRAP type
-    fusrap_where = "SUBTYPECD = 1"
-    # Get the Production Contamination layer
-    fusrap_sde = MoEastConnection + 'tamination feature class'
-    # Create the production contamination in the wsGDB
-    fusrap_name = "FUSRAP"
-    #Copy the SDE file into the geodatabase
-    arcpy.conversion.FeatureClassToFeatureClass(fusrap_sde, wsGDB, fusrap_name, fusrap_where)
-    print("FUSRAP Feature Class created in {0}.".format(wsGDB))
-    arcpy.AddMessage("FUSRAP Feature Class created in {0}.".format(wsGDB))
-else:
-    arcpy.AddMessage("FUSRAP Feature Class found...")
-    print("FUSRAP Feature Class found...")
-    
+# Create query for just FUSRAP type
+fusrap_where = "SUBTYPECD = 1"
+# Get the Production Contamination layer
+fusrap_sde = MoEastConnection + 'tamination feature class'
+# Create the production contamination in the wsGDB
+fusrap_name = "FUSRAP"
 # Set the PCB input path
 pcb_input = os.path.join(wsGDB, "PCB_Samples")
-#Check if PCBs exist
-if not arcpy.Exists(pcb_input):
-    arcpy.AddMessage("PCB points not found...")
-    #Create the points
-    pcbGen.create_pcbPoints(ws, wsGDBName)
-    # Print message
-    arcpy.AddMessage("PCB Points and buffers created.")
-# Else print message
-else:
-    arcpy.AddMessage("PCB Points found...")
-
-# Combine the FUSRAP polygons to the combined UST/HWP polygons
+# Feature classes pcbbuff builds the PCB points and buffers from. Their
+# fingerprints are kept with the script's, so edited samples rebuild the
+# layer. Keep this in step with create_pcbPoints.
+pcb_sources = [MoEastConnection + os.sep + 'PCB_Samples']
+# FUSRAP and PCB layers are kept in the workspace GDB between runs and are
+# only rebuilt when their sources change
+layer_cache = layercache.LayerCache(os.path.join(ws, "LayerCache.json"))
+# Combined output
 comb_output = os.path.join(wsGDB, "Contamination")
-arcpy.management.Merge([fusrap_input, pcb_input, dis_output_loc], comb_output)
-print("FUSRAP, DNR, and HWP polygons combined.")
-arcpy.AddMessage("FUSRAP, DNR, and HWP polygons combined.")
+# Assign variable to existing contamination layer
+current_contamination = MoEastConnection + os.sep +'Contamination'
+# Only the sites that changed since the last run are edited. The snapshot
+# of what was applied last time is kept next to the workspace GDB.
+snapshot_path = os.path.join(ws, "ContaminationSnapshot.json")
 
-# Delete Unwanted fields
-unloved_fields = ["AUL_ID", "OUID_1","SMARS_ID","SITE_FACILITY_NAME", 
-                  "FEDERAL_ID", "COUNTY_1"]
-# Delete the unloved fields :(
-for field in unloved_fields:
-    arcpy.management.DeleteField(comb_output, field)
-    
-# Rename fields to proper fields in schema that have been deleted
-arcpy.management.AlterField(comb_output, "AULID", "AUL_ID")
-arcpy.management.AlterField(comb_output, "SMARSID", "SMARS_ID")
-arcpy.management.AlterField(comb_output, "SITENAME", "SITE_FACILITY_NAME")
-arcpy.management.AlterField(comb_output, "FEDERALID", "FEDERAL_ID")
 
-# Update site ownership with with valid fields
-# Open an update cursor
-with arcpy.da.UpdateCursor(comb_output, ["DNRPROGRAM", "SITEOWN", "SITE_OWNERSHIP", "SUBTYPECD", "NOTES"]) as cursor:
-    for row in cursor:
-        # If DNRPROGRAM has characters and SITEOWN is empty
-        # replace SITE_OWNERSHIP with DNRPROGRAM field
-        if row[0] is not None and row[1] is None:
-            row[2] = row[0]
-            row[3] = 3
-        # If DNRPROGRAM has no characters and SITEOWN has characters
-        # replace SITE_OWNERSHIP with SITEOWN field
-        if row[0] is None and row[1] is not None:
-            row[2] = row[1]
-            row[3] = 3
-        if row[0] is not None and row[1] is not None:
-            row[2] = row[1]
-            row[3] = 3
-        # Update Notes for PCB samples
-        if row[3] == 2:
-            row[4] = "Dispose of all pipe, fittings and associated debris in 'cast iron projects' dumpster at . Wear nitrile gloves and face shield when inside of pipe is exposed."
-        cursor.updateRow(row)
-arcpy.AddMessage("Fields updated with new values...")
-print("Fields updated with new values...")
+def fetch_dnr_layer(url, query, name, stage):
+    """
+    Copy a DNR layer into the workspace GDB with the query run by the
+    server, then match its schema to the SDE.
+    """
+    arcpy.AddMessage("Downloading {0}...".format(name))
+    # Copy the features. The service's OBJECTID_1 object id and its extra
+    # OBJECTID field are left out so the copy gets a normal OBJECTID.
+    site_fc = dnrfetch.copy_layer(url, wsGDB, name, query, drop=["OBJECTID"], stage=stage, lock=arcpy_lock)
+    print("Copy of {0} has been made at {1}.".format(name, wsGDB))
+    with arcpy_lock:
+        arcpy.AddMessage("Copy of {0} has been made at {1}.".format(name, wsGDB))
+        # Alter shape field to match SDE
+        arcpy.management.AlterField(site_fc, "Shape", "SHAPE")
+        # Add global ids
+        arcpy.AddGlobalIDs_management(site_fc)
+    return site_fc
 
-# Clean Up Phase Mark 2
-# Repair up geometry in case of issues
-arcpy.management.RepairGeometry(comb_output)
-# Delete unneeded fields
-del_me = ["DNRPROGRAM", "SITEOWN"]
-for item in del_me:
-    arcpy.DeleteField_management(comb_output, item)
-# Get list of fields in final output
-field_list = arcpy.ListFields(comb_output)
-# Go through list
-for field in field_list:
-    # Find alias names with FIRST_ in them
-    if "FIRST_" in field.aliasName:
-        # Set new alias name
-        new_name = field.aliasName.replace('FIRST_', '')
-        # Alter field with new alias name
-        arcpy.management.AlterField(comb_output, field.name, new_field_alias=new_name)
-# Add spatial index
-arcpy.management.AddSpatialIndex(comb_output)
-# Add global ids
-for item in [comb_output, dnrSite, ustSite]:
-    arcpy.AddGlobalIDs_management(item)
-    
-# Delete the intermediate files created
-list_del = [dis_output_loc, fusrap_input, pcb_input]
-for item in list_del:
-    arcpy.management.Delete(item)
-print("Spatial Index added, global IDs added, intermediate files deleted...")
-arcpy.AddMessage("Spatial Index added, global IDs added, intermediate files deleted...")
-# Set subtypes
-# Create dictionary of subtype code and values
-stypeDict = {"1": "Special PPE and Disposal - FUSRAP", "2": "Special PPE and Disposal - Legacy",
-              "3": "Special PPE and Disposal - DNR Remediation"}
-# Set the subtype field
-arcpy.SetSubtypeField_management(comb_output, "SUBTYPECD")
-#Code the subtype field
-for code in stypeDict:
-    arcpy.AddSubtype_management(comb_output, code, stypeDict[code])
-# Set default subtype
-arcpy.SetDefaultSubtype_management(comb_output, "1")
-print("Subtypes set...")
-arcpy.AddMessage("Subtypes set...")
 
-# #######Copying new file to Prod SDE#####
-# Assign variable to existing contamination layer
-current_contamination = MoEastConnection + os.sep +'Contamination'
-# Delete all features
-arcpy.management.DeleteFeatures(current_contamination)
-arcpy.AddMessage("All features deleted from layer...")
-# Append the combined output into the sde feature class
-arcpy.management.Append(comb_output, current_contamination, 'TEST')
+def join_parcels(stage):
+    """Join parcels within 50 feet of a UST or HWP site and fill in site names."""
+    # Both site layers are indexed and checked in one pass over the parcels,
+    # which gives the same rows as a one to one spatial join against each
+    # layer and a merge of the two.
+    joined = stage.rows_out = parceljoin.join_parcels(parcel_fc, [ustCopy, hwpCopy], union_output,
+                                                      distance_feet=50)
+    print("UST and HWP sites joined to parcels, {0} parcels found...".format(joined))
+    arcpy.AddMessage("UST and HWP sites joined to parcels, {0} parcels found...".format(joined))
+    #The merge will need to be dissolved based on SITENAME but usts use FACNAME instead
+    # A cursor is needed to move FACNAME to SITENAME
+    with arcpy.da.UpdateCursor(union_output, ["SITENAME","FACNAME"]) as cursor:
+        # Iterate through all rows in the union
+        for row in cursor:
+            # Replace a null or blank sitename with the facility name
+            row[0] = contamschema.site_name(row[0], row[1])
+            # Update the row
+            cursor.updateRow(row)
+    # Print messages
+    print("Empty SITENAME fields filled with FACNAME fields...")
+    arcpy.AddMessage("Empty SITENAME fields filled with FACNAME fields...")
+    return joined
+
+
+def dissolve_sites(stage):
+    """Dissolve the parcel join based on SITENAME, which has no null or blank values."""
+    stage.rows_in = graph.results['parcel_join']
+    #Perform dissolve based on site name with multi-part features. The first
+    # value of each kept field is taken and keeps its own name.
+    dissolved = stage.rows_out = sitedissolve.dissolve_fc(
+        union_output, dis_output_loc, "SITENAME",
+        ["AULID", "OUID", "SMARSID", "FEDERALID", "COUNTY", "DNRPROGRAM", "SITEOWN"])
+    # Print messages
+    print("UST/HWP dissolved based on SITNAME, {0} sites...".format(dissolved))
+    arcpy.AddMessage("UST/HWP dissolved based on SITNAME, {0} sites...".format(dissolved))
+    return dissolved
+
+
+def fusrap_layer(stage):
+    """Copy the FUSRAP polygons from the SDE if they have changed."""
+    with arcpy_lock:
+        _, rebuilt = layer_cache.ensure(
+            fusrap_name, fusrap_input, layercache.table_fingerprint(fusrap_sde, fusrap_where),
+            lambda: arcpy.conversion.FeatureClassToFeatureClass(fusrap_sde, wsGDB, fusrap_name, fusrap_where))
+    if rebuilt:
+        print("FUSRAP Feature Class created in {0}.".format(wsGDB))
+        arcpy.AddMessage("FUSRAP Feature Class created in {0}.".format(wsGDB))
+    else:
+        arcpy.AddMessage("FUSRAP Feature Class unchanged...")
+        print("FUSRAP Feature Class unchanged...")
+    return layer_cache.entries[fusrap_name]['built']
+
+
+def pcb_layer(stage):
+    """Create the PCB points and buffers if the pcbbuff script or its inputs have changed."""
+    with arcpy_lock:
+        fingerprint = {'script': layercache.files_fingerprint([pcbGen.__file__]),
+                       'sources': [layercache.table_fingerprint(source) for source in pcb_sources]}
+        _, rebuilt = layer_cache.ensure(
+            "PCB_Samples", pcb_input, fingerprint,
+            lambda: pcbGen.create_pcbPoints(ws, wsGDBName))
+    if rebuilt:
+        # Print message
+        arcpy.AddMessage("PCB Points and buffers created.")
+    # Else print message
+    else:
+        arcpy.AddMessage("PCB Points unchanged...")
+    return layer_cache.entries["PCB_Samples"]['built']
+
+
+def write_contamination(stage):
+    """Combine the FUSRAP, PCB and dissolved DNR polygons into Contamination."""
+    # The Contamination schema is declared in contamschema. Fields are dropped,
+    # renamed and SITE_OWNERSHIP, SUBTYPECD and NOTES are filled while the
+    # features are copied, so the output is written once.
+    combined = stage.rows_out = contamschema.write_contamination([fusrap_input, pcb_input, dis_output_loc],
+                                                                 comb_output)
+    print("FUSRAP, DNR, and HWP polygons combined, {0} features written.".format(combined))
+    arcpy.AddMessage("FUSRAP, DNR, and HWP polygons combined, {0} features written.".format(combined))
+    # Repair up geometry in case of issues
+    arcpy.management.RepairGeometry(comb_output)
+    # Set subtypes
+    # Create dictionary of subtype code and values
+    stypeDict = contamschema.SUBTYPES
+    # Set the subtype field
+    arcpy.SetSubtypeField_management(comb_output, "SUBTYPECD")
+    #Code the subtype field
+    for code in stypeDict:
+        arcpy.AddSubtype_management(comb_output, code, stypeDict[code])
+    # Set default subtype
+    arcpy.SetDefaultSubtype_management(comb_output, "1")
+    print("Subtypes set...")
+    arcpy.AddMessage("Subtypes set...")
+    return combined
+
+
+def sync_contamination(stage):
+    """Copy the changed sites to the production Contamination layer."""
+    stage.rows_in = graph.results['write_contamination']
+    added, changed, removed = contamsync.sync_contamination(comb_output, current_contamination,
+                                                            snapshot_path, workspace=MoEastConnection)
+    stage.rows_out = added + changed + removed
+    print("Contamination layer synced: {0} added, {1} updated, {2} deleted.".format(added, changed, removed))
+    arcpy.AddMessage("Contamination layer synced: {0} added, {1} updated, {2} deleted.".format(added, changed, removed))
+    return [added, changed, removed]
+
+
+graph.add('fetch_hwp', lambda stage: fetch_dnr_layer(hwpServer, hwp_query, "DNRHWPSite", stage),
+          outputs=[hwpCopy], params={'query': hwp_query})
+graph.add('fetch_ust', lambda stage: fetch_dnr_layer(ustServer, ust_query, "DNRTankSite", stage),
+          outputs=[ustCopy], params={'query': ust_query})
+# The layer cache decides whether these need rebuilding, so they always run.
+# They return when their layer was built, which the stages after them are
+# fingerprinted with.
+graph.add('fusrap_layer', fusrap_layer, outputs=[fusrap_input], always=True)
+graph.add('pcb_layer', pcb_layer, outputs=[pcb_input], always=True)
+graph.add('parcel_join', join_parcels, deps=['fetch_hwp', 'fetch_ust', 'fusrap_layer', 'pcb_layer'],
+          outputs=[union_output],
+          params={'distance_feet': 50})
+graph.add('dissolve', dissolve_sites, deps=['parcel_join'], outputs=[dis_output_loc])
+graph.add('write_contamination', write_contamination,
+          deps=['dissolve', 'fusrap_layer', 'pcb_layer'], outputs=[comb_output])
+graph.add('sync_contamination', sync_contamination, deps=['write_contamination'])
+graph.run()
+# The run finished, so the next one starts fresh
+graph.clear()
+
+# Delete the intermediate files created. FUSRAP and PCB_Samples are cached
+# for the next run.
+list_del = [union_output, dis_output_loc]
+for item in list_del:
+    if arcpy.Exists(item):
+        arcpy.management.Delete(item)
+print("Intermediate files deleted...")
+arcpy.AddMessage("Intermediate files deleted...")
+print(report.summary())
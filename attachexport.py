@@ -0,0 +1,124 @@
+# Project: Spire to Locator Contractor data compilation
+# Create Date: 10/17/2026
+# Purpose: Export attachment pictures for a set of features straight from
+#          the attachment table to disk
+# ArcGIS Version:   Pro 2.8
+# Python Version:   3.6
+# -----------------------------------------------------------------------
+# Import modules
+import os
+from concurrent.futures import ThreadPoolExecutor
+import arcpy
+
+
+def _in_batches(values, size):
+    """Yield lists of at most size values."""
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _in_clause(field, values):
+    """Build a SQL IN clause for a list of string values."""
+    return "{0} IN ({1})".format(field, ",".join("'{0}'".format(str(v).replace("'", "''")) for v in values))
+
+
+class AttachmentExporter(object):
+    """
+    Writes the attachments of selected features from an attachment table to
+    a folder, one file per related global id.
+
+    The related global id and content type filters are sent to the
+    database, so only matching rows come back. The attachment list is read
+    first without the DATA blob, and attachments already on disk with the
+    same size are skipped. The blobs of the rest are then read in batches
+    and written as they arrive by a pool of writer threads, straight from
+    the cursor's memoryview without copying them to bytes first.
+
+    Parameters
+    ----------
+    table : String
+        Path of the attachment table.
+    out_dir : String
+        Folder the files are written to. It is created if it doesn't exist.
+    content_type : String
+        Only attachments of this CONTENT_TYPE are exported.
+    extension : String
+        Extension given to the exported files.
+    workers : int
+        Number of files written at once.
+    batch_size : int
+        Number of ids placed in each IN clause.
+    """
+    def __init__(self, table, out_dir, content_type='image/jpeg', extension='.jpg',
+                 workers=4, batch_size=500):
+        self.table = table
+        self.out_dir = out_dir
+        self.content_type = content_type
+        self.extension = extension
+        self.workers = max(1, int(workers))
+        self.batch_size = batch_size
+
+    def _filename(self, rel_globalid):
+        """Return the output path for an attachment."""
+        return os.path.join(self.out_dir, str(rel_globalid) + self.extension)
+
+    def _pending(self, global_ids):
+        """
+        Return a dictionary of attachment id to output path for attachments
+        that aren't exported yet, and the number that were skipped. The DATA
+        blob is not read here. Files are named after the related global id,
+        so when a feature has several attachments the last one read is kept.
+        """
+        fields = [f.name.upper() for f in arcpy.ListFields(self.table)]
+        has_size = 'DATA_SIZE' in fields
+        read_fields = ['ATTACHMENTID', 'REL_GLOBALID'] + (['DATA_SIZE'] if has_size else [])
+        by_path = {}
+        skipped = 0
+        for batch in _in_batches(global_ids, self.batch_size):
+            query = "{0} AND CONTENT_TYPE = '{1}'".format(_in_clause('REL_GLOBALID', batch), self.content_type)
+            with arcpy.da.SearchCursor(self.table, read_fields, query) as cursor:
+                for row in cursor:
+                    filepath = self._filename(row[1])
+                    # Skip attachments already written with the same size
+                    if os.path.exists(filepath) and (not has_size or os.path.getsize(filepath) == row[2]):
+                        skipped += 1
+                        continue
+                    by_path[filepath] = row[0]
+        return {aid: filepath for filepath, aid in by_path.items()}, skipped
+
+    @staticmethod
+    def _write(filepath, data):
+        """Write one attachment blob to disk."""
+        with open(filepath, 'wb') as out_file:
+            out_file.write(data)
+        return filepath
+
+    def export(self, global_ids):
+        """
+        Export the attachments related to global_ids. Returns a tuple of the
+        number of files written and the number already on disk.
+        """
+        global_ids = set(global_ids)
+        if not os.path.exists(self.out_dir):
+            os.makedirs(self.out_dir)
+            print("No folder for attachments. A directory has been created at {0}.".format(self.out_dir))
+        if not global_ids:
+            return 0, 0
+        pending, skipped = self._pending(global_ids)
+        written = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for batch in _in_batches(sorted(pending), self.batch_size):
+                query = "ATTACHMENTID IN ({0})".format(",".join(str(aid) for aid in batch))
+                futures = []
+                with arcpy.da.SearchCursor(self.table, ['ATTACHMENTID', 'DATA'], query) as cursor:
+                    for row in cursor:
+                        # The blob's buffer belongs to the cursor and is gone once
+                        # it closes, so the writers get their own copy
+                        futures.append(pool.submit(self._write, pending[row[0]], bytes(row[1])))
+                # Finish the batch before reading the next so only one batch
+                # of blobs is held in memory
+                for future in futures:
+                    future.result()
+                    written += 1
+        return written, skipped
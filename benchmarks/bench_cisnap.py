@@ -0,0 +1,74 @@
+# Project: Missouri East Cast Iron Model
+# Create Date: 10/17/2026
+# Purpose: Time the cisnap nearest main engine against measuring every point
+#          to every main segment on a synthetic street grid of mains. Checks
+#          both find the same distances.
+# Usage:   python benchmarks/bench_cisnap.py [points]
+# -----------------------------------------------------------------------
+# Import modules
+import os
+import sys
+import time
+import random
+import numpy
+import shapely
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import cisnap
+
+
+def make_mains(blocks, seed=3):
+    """
+    Build a street grid of main segments, one 300 foot segment per block
+    side, with a little jitter so segments aren't perfectly aligned.
+    """
+    rand = random.Random(seed)
+    lines = []
+    for i in range(blocks):
+        for j in range(blocks):
+            x = i * 300.0
+            y = j * 300.0
+            lines.append(shapely.LineString([(x, y + rand.random()), (x + 300.0, y + rand.random())]))
+            lines.append(shapely.LineString([(x + rand.random(), y), (x + rand.random(), y + 300.0)]))
+    return numpy.array(lines, dtype=object)
+
+
+def make_points(count, extent, seed=5):
+    """Scatter leak repairs over the grid, most of them near a street."""
+    rand = random.Random(seed)
+    points = []
+    for _ in range(count):
+        x = rand.uniform(0, extent)
+        y = round(rand.uniform(0, extent) / 300.0) * 300.0 + rand.gauss(0, 12)
+        points.append(shapely.Point(x, y) if rand.random() < 0.5 else shapely.Point(y, x))
+    return numpy.array(points, dtype=object)
+
+
+def baseline(mains, points):
+    """Measure each point to every main and keep the nearest."""
+    return numpy.array([shapely.distance(mains, point).min() for point in points])
+
+
+def main():
+    points_count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print("{0:>8} {1:>8} {2:>12} {3:>12}".format("mains", "points", "brute force", "engine"))
+    for blocks in (10, 30, 100):
+        mains = make_mains(blocks)
+        points = make_points(points_count, blocks * 300.0)
+        start = time.perf_counter()
+        expected = baseline(mains, points)
+        base_time = time.perf_counter() - start
+        start = time.perf_counter()
+        index = cisnap.MainIndex(mains, numpy.arange(len(mains)))
+        distance, _, snapped = index.nearest(points)
+        status = cisnap.classify(distance, 10, 25)
+        engine_time = time.perf_counter() - start
+        assert numpy.allclose(distance, expected)
+        # Snapped points sit on their main
+        assert numpy.allclose(shapely.distance(snapped, points), distance)
+        print("{0:>8} {1:>8} {2:>11.2f}s {3:>11.2f}s  ({4} within, {5} snapped, {6} to move)".format(
+            len(mains), len(points), base_time, engine_time, (status == cisnap.WITHIN).sum(),
+            (status == cisnap.SNAPPED).sum(), (status == cisnap.MOVE_CLOSER).sum()))
+
+
+if __name__ == '__main__':
+    main()
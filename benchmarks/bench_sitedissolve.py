@@ -0,0 +1,76 @@
+# Project: MO Environmental Updates
+# Create Date: 10/17/2026
+# Purpose: Time the sitedissolve group/union engine against a GeoPandas
+#          dissolve on synthetic parcel sized polygons for a growing number
+#          of sites. Checks both give the same areas and first values.
+# Usage:   python benchmarks/bench_sitedissolve.py [parcels] [workers]
+# -----------------------------------------------------------------------
+# Import modules
+import os
+import sys
+import time
+import random
+import numpy
+import shapely
+import geopandas
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sitedissolve
+
+
+def make_join(parcels, sites, seed=7):
+    """
+    Build a synthetic parcel join: a grid of 100 by 60 foot parcels, each
+    given one of sites site names. Parcels of a site sit next to each other
+    the way parcels around one contamination site do.
+    """
+    rand = random.Random(seed)
+    cols = int(parcels ** 0.5) + 1
+    boxes = []
+    names = []
+    per_site = max(1, parcels // sites)
+    for i in range(parcels):
+        x = (i % cols) * 100.0
+        y = (i // cols) * 60.0
+        # Slight jitter so neighbouring parcels overlap a little
+        boxes.append(shapely.box(x, y, x + 100.0 + rand.random(), y + 60.0 + rand.random()))
+        names.append(None if i % 211 == 0 else "SITE {0:05d}".format(min(i // per_site, sites - 1)))
+    gdf = geopandas.GeoDataFrame({'SITENAME': names}, geometry=boxes)
+    for field in sitedissolve.FIRST_FIELDS:
+        gdf[field] = ["{0}{1}".format(field, i) for i in range(parcels)]
+    return gdf
+
+
+def baseline(gdf):
+    """GeoPandas dissolve with first aggregation, sorted like sitedissolve."""
+    out = gdf.dissolve(by='SITENAME', aggfunc='first', dropna=False, sort=False).reset_index()
+    return out
+
+
+def main():
+    parcels = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)
+    print("{0:>8} {1:>8} {2:>12} {3:>12} {4:>12}".format(
+        "parcels", "sites", "geopandas", "engine x1", "engine x{0}".format(workers)))
+    for sites in (10, 100, 1000, parcels // 4):
+        gdf = make_join(parcels, sites)
+        start = time.perf_counter()
+        expected = baseline(gdf)
+        base_time = time.perf_counter() - start
+        start = time.perf_counter()
+        serial = sitedissolve.dissolve_first(gdf, 'SITENAME', workers=1)
+        serial_time = time.perf_counter() - start
+        start = time.perf_counter()
+        threaded = sitedissolve.dissolve_first(gdf, 'SITENAME', workers=workers)
+        threaded_time = time.perf_counter() - start
+        # Same groups in the same order with the same first values and areas
+        for result in (serial, threaded):
+            assert list(result['SITENAME']) == list(expected['SITENAME'])
+            for field in sitedissolve.FIRST_FIELDS:
+                assert list(result[field]) == list(expected[field])
+            assert numpy.allclose(result.geometry.area.values, expected.geometry.area.values)
+        print("{0:>8} {1:>8} {2:>11.2f}s {3:>11.2f}s {4:>11.2f}s".format(
+            parcels, len(expected), base_time, serial_time, threaded_time))
+
+
+if __name__ == '__main__':
+    main()
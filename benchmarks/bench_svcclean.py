@@ -0,0 +1,104 @@
+# Project: Spire to Locator Contractor data compilation
+# Create Date: 10/17/2026
+# Purpose: Compare the original apply/lambda service table cleanup with the
+#          vectorized svcclean pipeline. Checks that both write byte
+#          identical csv files and prints the time taken by each.
+# Usage:   python benchmarks/bench_svcclean.py [rows]
+# -----------------------------------------------------------------------
+# Import modules
+import io
+import os
+import re
+import sys
+import time
+import random
+import datetime
+from urllib.parse import urlparse
+import pandas
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import svcclean
+
+
+def make_table(rows, seed=12):
+    """Build a synthetic service card export shaped like file.txt."""
+    rand = random.Random(seed)
+    hosts = ["https://spire.sharepoint.com/sites/Maps/servicecards/{0}/{1}/card {2}.pdf",
+             "http://doclocation/FieldBook/{0}/OHBUpoad_{1}#{2}.pdf",
+             "\\\\doclocation\\MaximoDrawers123_Images_{0}\\{1}_{2}.tif",
+             "https://files/FY19_Maximo_Images_{0}/{1}/{2}.jpg**extra",
+             "https://spire.sharepoint.com/sites/x/servicecards/{0}/{1}/{2}.pdf?web=1"]
+    start = datetime.datetime(2020, 1, 1)
+    data = {'Location': [], 'URLName': [], 'createdate': []}
+    for i in range(rows):
+        data['Location'].append(None if i % 97 == 0 else "LOC{0:07d}".format(rand.randint(0, rows)))
+        data['URLName'].append(None if i % 89 == 0 else
+                               rand.choice(hosts).format(rand.randint(1, 50), i, rand.randint(1, 999)))
+        data['createdate'].append(None if i % 83 == 0 else
+                                  (start + datetime.timedelta(minutes=rand.randint(0, 10 ** 6))).isoformat())
+    return pandas.DataFrame(data).to_csv(index=False)
+
+
+def read_table(text):
+    """Read the table the same way Spire_LocatorScript.py does."""
+    svc_df = pandas.read_csv(io.StringIO(text),
+                             usecols=['Location', 'URLName', 'createdate'],
+                             dtype={'Location': 'string', 'URLName': 'string'},
+                             parse_dates=['createdate'])
+    svc_df['Location'] = svc_df['Location'].fillna("No Location")
+    svc_df['URLName'] = svc_df['URLName'].fillna("No URL Found")
+    svc_df['createdate'] = svc_df['createdate'].astype(object).where(svc_df['createdate'].notna(), '01/01/1000')
+    return svc_df
+
+
+def legacy_clean(svc_df):
+    """The original cleanup from Spire_LocatorScript.py."""
+    svc_df = svc_df.apply(lambda x: x.replace({'doclocation': 'server',
+                                               '#': '%23', "FieldBook": "Field Book", "\\\\": r'/'},
+                                              regex=True))
+    svc_df['URLName'] = svc_df['URLName'].str.split(re.escape('**')).str[0]
+    svc_df['Document'] = svc_df['URLName'].apply(lambda x: x[x.rfind('/')+1:])
+    svc_mask = (svc_df['URLName'].str.contains('servicecards'))
+    svc_mask_df = svc_df.loc[svc_mask]
+    svc_mask_df['Document'] = svc_mask_df['URLName'].apply(lambda x: '_'.join(urlparse(x).path[1:].split('/')[2:]))
+    svc_invert_mask = (~svc_df['URLName'].str.contains('servicecards'))
+    svc_invert_df = svc_df.loc[svc_invert_mask]
+    mask_concat = pandas.concat([svc_invert_df, svc_mask_df])
+    replace_pat = '|'.join(["OHBUpoad_", "MaximoDrawers123_Images_", "FY19_Maximo_Images_"])
+    mask_concat.loc[mask_concat['Document'].str.contains(replace_pat, regex=True), 'Document'] = \
+        mask_concat['Document'].str.replace(replace_pat, '', regex=True)
+    return svc_df, mask_concat
+
+
+def vector_clean(svc_df):
+    """The svcclean pipeline used by Spire_LocatorScript.py."""
+    svc_df = svcclean.clean_service_urls(svc_df)
+    return svc_df, svcclean.service_card_documents(svc_df)
+
+
+def timed(func, svc_df, repeat=3):
+    """Return the best time of repeat runs and the last result."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(svc_df.copy())
+        took = time.perf_counter() - start
+        best = took if best is None else min(best, took)
+    return best, result
+
+
+if __name__ == '__main__':
+    pandas.options.mode.chained_assignment = None
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    svc_df = read_table(make_table(rows))
+    legacy_time, (legacy_svc, legacy_out) = timed(legacy_clean, svc_df)
+    vector_time, (vector_svc, vector_out) = timed(vector_clean, svc_df)
+    # file.csv has to come out byte for byte the same
+    legacy_csv = legacy_out.to_csv()
+    vector_csv = svcclean.legacy_order(vector_out).to_csv()
+    print("Rows: {0}".format(rows))
+    print("Legacy cleanup:     {0:.3f}s".format(legacy_time))
+    print("Vectorized cleanup: {0:.3f}s ({1:.1f}x)".format(vector_time, legacy_time / vector_time))
+    print("file.csv identical: {0}".format(legacy_csv == vector_csv))
+    print("svc_df identical:   {0}".format(legacy_svc.to_csv() == vector_svc.to_csv()))
+    if legacy_csv != vector_csv or legacy_svc.to_csv() != vector_svc.to_csv():
+        sys.exit(1)
@@ -0,0 +1,269 @@
+# Project: Spire to Locator Contractor data compilation
+# Create Date: 10/17/2026
+# Purpose: Download service cards for the locator contractor through a shared,
+#          pooled session with a bounded number of workers
+# Python Version:   3.6
+# -----------------------------------------------------------------------
+# Import modules
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, unquote
+import requests
+from requests.adapters import HTTPAdapter
+
+# Status codes that are worth another attempt, along with any 5xx. Anything
+# else (404, 401...) is a bad service card and goes straight to the bad csv.
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+def sharepoint_credentials(service="rjd_sharepointlogin", username="email"):
+    """
+    Look up the sharepoint password from keyring one time and return a
+    UserCredential that can be shared by every download in the run.
+    """
+    import keyring
+    from office365.runtime.auth.user_credential import UserCredential
+    # Grab the password from the windows credential store
+    sharepoint_pass = keyring.get_password(service, username)
+    return UserCredential(username, sharepoint_pass)
+
+
+class CardDownloader(object):
+    """
+    Downloads service cards from a merged service card dataframe using a pool
+    of worker threads.
+
+    Plain http(s) urls share one requests session so connections are kept
+    alive and reused. Sharepoint urls share one credential and one client
+    context per site for each worker thread. No more than per_host downloads
+    are sent to the same host at once, and failed downloads are retried with
+    an exponential backoff before being written to the bad csv.
+
+    Parameters
+    ----------
+    credentials : UserCredential
+        Sharepoint credentials from sharepoint_credentials. Only required if
+        any of the urls are sharepoint urls.
+    workers : int
+        Number of downloads to run at once.
+    per_host : int
+        Maximum number of downloads to run at once against a single host.
+    retries : int
+        Number of extra attempts made for a url before it is marked bad.
+    backoff : float
+        Seconds to wait before the first retry. Doubles with every retry.
+    timeout : float
+        Seconds to wait on the server before a request is abandoned.
+    cache : doccache.DocumentCache
+        Optional manifest of cards delivered on previous runs. Cards that
+        haven't changed on the server are skipped or hard linked instead of
+        being downloaded again.
+    """
+    def __init__(self, credentials=None, workers=8, per_host=4, retries=3,
+                 backoff=1.0, timeout=60, cache=None):
+        self.credentials = credentials
+        self.cache = cache
+        self.workers = max(1, int(workers))
+        self.per_host = max(1, int(per_host))
+        self.retries = max(0, int(retries))
+        self.backoff = backoff
+        self.timeout = timeout
+        # One session for the whole run. The pool is sized so every worker
+        # can hold an open connection.
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.workers,
+                              pool_maxsize=self.workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        # Per host semaphores are created on demand
+        self._host_limits = {}
+        self._host_lock = threading.Lock()
+        # Bad csv writes are serialized so lines don't interleave
+        self._bad_lock = threading.Lock()
+        # Bytes written by downloads, for the run report
+        self.bytes_downloaded = 0
+        self._bytes_lock = threading.Lock()
+        # Sharepoint client contexts are not thread safe, so each thread
+        # keeps its own per site
+        self._local = threading.local()
+
+    def close(self):
+        """Close the pooled session."""
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _host_limit(self, url):
+        """Return the semaphore limiting downloads to the url's host."""
+        host = urlparse(url).netloc.lower()
+        with self._host_lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.BoundedSemaphore(self.per_host)
+            return self._host_limits[host]
+
+    def _sharepoint_context(self, url):
+        """
+        Return a client context for the sharepoint site holding url and the
+        server relative path of the file. Contexts are cached per thread so
+        the site lookup and sign in only happen once per worker.
+        """
+        from office365.sharepoint.client_context import ClientContext
+        parts = urlparse(url)
+        segments = parts.path.split('/')
+        # Files under /sites/<name> and /teams/<name> belong to that site,
+        # everything else belongs to the root site
+        if len(segments) > 2 and segments[1].lower() in ('sites', 'teams'):
+            site_path = '/'.join(segments[:3])
+        else:
+            site_path = ''
+        site_url = "{0}://{1}{2}".format(parts.scheme, parts.netloc, site_path)
+        contexts = getattr(self._local, 'contexts', None)
+        if contexts is None:
+            contexts = self._local.contexts = {}
+        if site_url not in contexts:
+            contexts[site_url] = ClientContext(site_url).with_credentials(self.credentials)
+        return contexts[site_url], unquote(parts.path)
+
+    def _fetch_sharepoint(self, url, part_path, filepath):
+        """
+        Download a sharepoint file to part_path. When a cache is in use the
+        file properties are checked first and an unchanged file is restored
+        to filepath instead. Returns the validators to record for the file,
+        or None if nothing was downloaded.
+        """
+        ctx, server_path = self._sharepoint_context(url)
+        sp_file = ctx.web.get_file_by_server_relative_path(server_path)
+        validator = {}
+        if self.cache is not None:
+            # A property request is far smaller than the file itself
+            sp_file.get().execute_query()
+            length = sp_file.properties.get('Length')
+            validator = {'etag': sp_file.properties.get('ETag'),
+                         'size': int(length) if length is not None else None}
+            if self.cache.is_current(url, validator) and self.cache.restore(url, filepath):
+                return None
+        with open(part_path, 'wb') as new_file:
+            sp_file.download(new_file).execute_query()
+        return validator
+
+    def _fetch_http(self, url, part_path, filepath, conditional=True):
+        """
+        Stream a plain http(s) file to part_path through the pooled session.
+        When the cache holds the url a conditional request is sent and a 304
+        restores the cached copy to filepath. Returns the validators to
+        record for the file, or None if nothing was downloaded.
+        """
+        headers = {}
+        entry = self.cache.lookup(url) if self.cache is not None and conditional else None
+        if entry is not None and self.cache.available(url):
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as resp:
+            if resp.status_code == 304:
+                if self.cache.restore(url, filepath):
+                    return None
+                # The cached copy went missing, so ask for the whole file
+                return self._fetch_http(url, part_path, filepath, conditional=False)
+            resp.raise_for_status()
+            with open(part_path, 'wb') as new_file:
+                for chunk in resp.iter_content(chunk_size=64 * 1024):
+                    new_file.write(chunk)
+            return {'etag': resp.headers.get('ETag'),
+                    'last_modified': resp.headers.get('Last-Modified')}
+
+    @staticmethod
+    def _is_retryable(error):
+        """
+        Identify errors that could go away on another attempt: connection
+        errors, timeouts and responses of 429 or 5xx. Sharepoint client
+        errors carry the response too, so they are judged by its status.
+        """
+        if isinstance(error, (requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError)):
+            return True
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+        return status is not None and (status in RETRY_STATUS or 500 <= status < 600)
+
+    def fetch(self, url, filepath):
+        """
+        Download url to filepath, retrying transient failures. The file is
+        written to a .part file first so a failed download never leaves a
+        partial service card behind. Raises the last error if every attempt
+        fails.
+        """
+        part_path = filepath + ".part"
+        fetcher = self._fetch_sharepoint if 'sharepoint' in url else self._fetch_http
+        attempt = 0
+        while True:
+            try:
+                with self._host_limit(url):
+                    validator = fetcher(url, part_path, filepath)
+                # None means the cache already put the card in place
+                if validator is not None:
+                    os.replace(part_path, filepath)
+                    with self._bytes_lock:
+                        self.bytes_downloaded += os.path.getsize(filepath)
+                    if self.cache is not None:
+                        self.cache.record(url, validator, filepath)
+                return filepath
+            except Exception as e:
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+                if attempt >= self.retries or not self._is_retryable(e):
+                    raise
+                # Wait a little longer after each failure
+                time.sleep(self.backoff * (2 ** attempt))
+                attempt += 1
+
+    def _write_bad(self, badcsv, location, url):
+        """Add a record to the bad service card csv."""
+        with self._bad_lock:
+            with open(badcsv, 'a') as bad_file:
+                bad_file.write(str(location) + "," + str(url) + "\n")
+
+    def _download_one(self, path, region, badcsv, location, url, filename):
+        """Download one service card and record it as bad if it fails."""
+        filepath = os.path.join(path, region, filename)
+        try:
+            self.fetch(url, filepath)
+            return True
+        except Exception as e:
+            print("Error {0}.".format(e))
+            print("Error on {0}".format(url))
+            self._write_bad(badcsv, location, url)
+            return False
+
+    def download_frame(self, merge_df, path, region, badcsv,
+                       url_field='URLName', location_field='Location',
+                       file_field='Document'):
+        """
+        Download every service card in merge_df into the region folder under
+        path. Rows with an empty file name are ignored. Urls that can't be
+        downloaded are added to the badcsv file. Cards that are no longer in
+        merge_df are dropped from the cache.
+
+        Returns a tuple of the number of cards downloaded and the number of
+        cards that failed.
+        """
+        # Pull the three columns out once instead of building a series per row
+        jobs = [(loc, url, name) for loc, url, name in
+                merge_df[[location_field, url_field, file_field]].itertuples(index=False, name=None)
+                # Ignore null or empty file names
+                if isinstance(name, str) and name]
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            results = list(pool.map(lambda job: self._download_one(path, region, badcsv, *job), jobs))
+        good = sum(results)
+        # Keep the manifest up to date so a rerun after a failure skips these cards
+        if self.cache is not None:
+            self.cache.prune(url for _, url, _ in jobs)
+            self.cache.save()
+        print("{0} service cards downloaded for {1}. {2} could not be found.".format(
+            good, region, len(results) - good))
+        return good, len(results) - good
@@ -0,0 +1,228 @@
+# Project: Missouri East Cast Iron Model
+# Create Date: 10/17/2026
+# Purpose: Keep a persistent index of the CIModelPoints master keyed by
+#          quantized coordinates and work order, apply new points to it as
+#          upserts and log the rows each run changes
+# Python Version:   3.6
+# -----------------------------------------------------------------------
+# Import modules
+import os
+import json
+import codecs
+import datetime
+import cisnap
+import fieldmatch
+
+# Coordinates are rounded to this many units of the master's coordinate
+# system, feet in Missouri East, before they are compared
+QUANTUM = 0.01
+WORK_ORDER_FIELD = 'MXWONUM'
+
+
+def point_key(x, y, work_order, quantum=QUANTUM):
+    """Return the index key of a point: its rounded coordinates and work order."""
+    if x is None or y is None:
+        return None
+    return "{0}:{1}:{2}".format(int(round(x / quantum)), int(round(y / quantum)),
+                                '' if work_order is None else str(work_order).strip())
+
+
+def read_keys(in_fc, quantum=QUANTUM, spatial_reference=None):
+    """Return a dictionary of object id to index key for every point of in_fc."""
+    import arcpy
+    keys = {}
+    with arcpy.da.SearchCursor(in_fc, ['OID@', 'SHAPE@XY', WORK_ORDER_FIELD],
+                               spatial_reference=spatial_reference) as cursor:
+        for oid, xy, work_order in cursor:
+            key = point_key(xy[0], xy[1], work_order, quantum) if xy else None
+            if key is not None:
+                keys[oid] = key
+    return keys
+
+
+class MasterIndex(object):
+    """
+    Index of the master points, built in memory with one pass over the
+    master when it is opened. A saved index would have to be checked
+    against the master with a pass of its own to catch points moved or
+    edited by hand, so it is simply rebuilt once per process.
+
+    keys holds the key of each master point's own location. aliases holds
+    the key of the location a point had in the leak repair or pipe
+    observation service before it was snapped, so the next update of the
+    same work order still finds it. Only the aliases are kept in the json
+    file, as they can't be read back from the master. Aliases of points
+    that no longer exist are dropped.
+
+    Parameters
+    ----------
+    path : String
+        The json file the aliases are kept in. It is created on the first
+        save.
+    master_fc : String
+        The master point feature class.
+    quantum : float
+        Coordinates are rounded to this before comparing.
+    """
+    def __init__(self, path, master_fc, quantum=QUANTUM):
+        self.path = path
+        self.master_fc = master_fc
+        self.quantum = quantum
+        saved = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as index_file:
+                    saved = json.load(index_file)
+            except ValueError:
+                saved = {}
+        # Aliases made with another quantum would never match
+        self.rebuild(saved.get('aliases', {}) if saved.get('quantum') == quantum else {})
+
+    def rebuild(self, aliases=None):
+        """Read the keys from the master, keeping the aliases of points that still exist."""
+        by_oid = read_keys(self.master_fc, self.quantum)
+        self.keys = {key: oid for oid, key in by_oid.items()}
+        self.aliases = {key: oid for key, oid in (aliases or {}).items() if oid in by_oid}
+
+    def lookup(self, key):
+        """Return the object id of the master point with key, or None."""
+        if key is None:
+            return None
+        oid = self.keys.get(key)
+        return self.aliases.get(key) if oid is None else oid
+
+    def matches(self, keys):
+        """Return a dictionary of the object ids in keys to the master point each matches."""
+        found = {}
+        for oid, key in keys.items():
+            master_oid = self.lookup(key)
+            if master_oid is not None:
+                found[oid] = master_oid
+        return found
+
+    def add(self, master_oid, key, alias=None):
+        """Index a master point by its key and the key it was matched on."""
+        self.keys[key] = master_oid
+        if alias is not None and alias != key:
+            self.aliases[alias] = master_oid
+
+    def remove(self, master_oids):
+        """Drop every key of the master points in master_oids."""
+        master_oids = set(master_oids)
+        self.keys = {key: oid for key, oid in self.keys.items() if oid not in master_oids}
+        self.aliases = {key: oid for key, oid in self.aliases.items() if oid not in master_oids}
+
+    def save(self):
+        """Write the aliases through a temporary file."""
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'w') as index_file:
+            json.dump({'quantum': self.quantum, 'aliases': self.aliases}, index_file)
+        os.replace(temp_path, self.path)
+
+
+class ChangeLog(object):
+    """
+    Appends a json line for every master point a run inserts, updates or
+    deletes. Updates and deletes hold the row as it was, so a run can be
+    undone without a full copy of the master.
+
+    Parameters
+    ----------
+    path : String
+        The json lines file. Lines are appended to it.
+    run : String
+        Label of the run, such as the date, written on every line.
+    """
+    def __init__(self, path, run):
+        self.path = path
+        self.run = run
+        self.counts = {'insert': 0, 'update': 0, 'delete': 0}
+
+    def write(self, action, oid, fields=None, row=None):
+        """Log one change. row is the old values of fields followed by the old geometry WKB."""
+        line = {'run': self.run, 'action': action, 'oid': oid,
+                'time': datetime.datetime.now().isoformat(timespec='seconds')}
+        if row is not None:
+            values = row[:-1]
+            wkb = row[-1]
+            line['before'] = {name: value.isoformat() if isinstance(value, datetime.datetime) else value
+                              for name, value in zip(fields, values)}
+            line['shape'] = None if wkb is None else codecs.encode(bytes(wkb), 'hex').decode('ascii')
+        with open(self.path, 'a') as log_file:
+            log_file.write(json.dumps(line, default=str) + "\n")
+        self.counts[action] += 1
+
+
+def upsert_points(source_fc, oids, source_keys, index, change_log):
+    """
+    Apply the points of source_fc in oids to the master. A point whose key
+    in source_keys, taken before it was snapped, matches a master point
+    updates that point in place. The others are inserted. The index and
+    change log are updated. Returns the number inserted and updated.
+    """
+    import arcpy
+    if not oids:
+        return 0, 0
+    master_fc = index.master_fc
+    fields = fieldmatch.compare_fields(source_fc, master_fc)
+    work_order = fields.index(WORK_ORDER_FIELD) if WORK_ORDER_FIELD in fields else None
+    new_rows = {}
+    locations = {}
+    with arcpy.da.SearchCursor(source_fc, ['OID@'] + fields + ['SHAPE@WKB', 'SHAPE@XY'],
+                               cisnap.oid_where(source_fc, oids),
+                               spatial_reference=arcpy.Describe(master_fc).spatialReference) as cursor:
+        for row in cursor:
+            new_rows[row[0]] = list(row[1:-1])
+            locations[row[0]] = row[-1]
+    updates = {}
+    for oid in new_rows:
+        master_oid = index.lookup(source_keys.get(oid))
+        if master_oid is not None:
+            updates[master_oid] = oid
+    placed = {}
+    if updates:
+        with arcpy.da.UpdateCursor(master_fc, ['OID@'] + fields + ['SHAPE@WKB'],
+                                   cisnap.oid_where(master_fc, updates)) as cursor:
+            for row in cursor:
+                change_log.write('update', row[0], fields, list(row[1:]))
+                cursor.updateRow([row[0]] + new_rows[updates[row[0]]])
+                placed[updates[row[0]]] = row[0]
+    inserted = 0
+    with arcpy.da.InsertCursor(master_fc, fields + ['SHAPE@WKB']) as cursor:
+        for oid, new_row in new_rows.items():
+            if oid in placed:
+                continue
+            placed[oid] = cursor.insertRow(new_row)
+            change_log.write('insert', placed[oid])
+            inserted += 1
+    # Index the points where they now sit, and by the key they were matched on
+    for oid, master_oid in placed.items():
+        xy = locations[oid]
+        if xy is None or xy[0] is None:
+            continue
+        key = point_key(xy[0], xy[1], None if work_order is None else new_rows[oid][work_order], index.quantum)
+        index.add(master_oid, key, source_keys.get(oid))
+    return inserted, len(placed) - inserted
+
+
+def delete_matches(oids, source_keys, index, change_log):
+    """
+    Delete the master points matched by the keys of oids in source_keys,
+    logging each one. Used for updated points that have to be moved by hand
+    before they go back in. Returns the number deleted.
+    """
+    import arcpy
+    master_oids = {index.lookup(source_keys.get(oid)) for oid in oids} - {None}
+    if not master_oids:
+        return 0
+    master_fc = index.master_fc
+    fields = fieldmatch.compare_fields(master_fc, master_fc)
+    deleted = 0
+    with arcpy.da.UpdateCursor(master_fc, ['OID@'] + fields + ['SHAPE@WKB'],
+                               cisnap.oid_where(master_fc, master_oids)) as cursor:
+        for row in cursor:
+            change_log.write('delete', row[0], fields, list(row[1:]))
+            cursor.deleteRow()
+            deleted += 1
+    index.remove(master_oids)
+    return deleted
@@ -0,0 +1,302 @@
+# Project: Missouri East Cast Iron Model
+# Create Date: 10/17/2026
+# Purpose: Run the cast iron model replacement notebook's steps without the
+#          notebook, for any number of input csvs in one process. The master
+#          points, main segments and their indexes are loaded once.
+# Python Version:   3.6
+# Usage:   python cimodel.py ws leak_repair_url pipe_ob_url in_csv [in_csv ...]
+# -----------------------------------------------------------------------
+# Import modules
+import os
+import sys
+import glob
+import argparse
+import datetime
+import traceback
+import woindex
+import cisnap
+import cimaster
+import stagestats
+
+
+class CsvRunError(Exception):
+    """
+    Raised when an input csv fails part way. step is the step that failed
+    and changes the master point changes the csv had already made, by
+    action, which are left in place and logged in the change log.
+    """
+    def __init__(self, in_csv, step, changes):
+        self.in_csv = in_csv
+        self.step = step
+        self.changes = changes
+        if any(changes.values()):
+            state = "The master points were partially updated, see the change log: {0}.".format(
+                ", ".join("{0} {1}s".format(count, action) for action, count in changes.items()))
+        else:
+            state = "The master points were not changed."
+        super(CsvRunError, self).__init__("{0} failed at {1}. {2}".format(in_csv, step, state))
+
+
+def expand_csvs(paths):
+    """Return the csv files in paths. Folders give their csvs and patterns are expanded, in name order."""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            found.extend(sorted(glob.glob(os.path.join(path, '*.csv'))))
+        elif any(char in path for char in '*?['):
+            found.extend(sorted(glob.glob(path)))
+        else:
+            found.append(path)
+    # A csv named twice is only run once
+    return list(dict.fromkeys(found))
+
+
+class CastIronModel(object):
+    """
+    The cast iron model workspace, opened once for a batch of input csvs.
+
+    Parameters
+    ----------
+    ws : String
+        Workspace folder. The index, change log and run report are kept in it.
+    leak_repairs : String
+        Url of the LeakRepairMaximo feature service layer.
+    pipe_obs : String
+        Url of the PipeOb feature service layer.
+    ws_gdb : String
+        Workspace geodatabase holding CIModelPoints and CI_MainModelSegments.
+        Defaults to data.gdb in ws.
+    token : String
+        Optional token for the feature services.
+    snap_feet : float
+        Points further than within_feet but within this distance of cast iron
+        main are snapped onto it. Points further away go to MoveCloser.
+    within_feet : float
+        Points within this distance of cast iron main are added as they are.
+    workers : int
+        Requests sent to a feature service at once.
+    """
+    def __init__(self, ws, leak_repairs, pipe_obs, ws_gdb=None, token=None, snap_feet=25,
+                 within_feet=10, workers=4):
+        import arcpy
+        arcpy.env.overwriteOutput = True
+        self.ws = ws
+        self.ws_gdb = ws_gdb or os.path.join(ws, "data.gdb")
+        self.leak_repairs = leak_repairs
+        self.pipe_obs = pipe_obs
+        self.token = token
+        self.snap_feet = snap_feet
+        self.within_feet = within_feet
+        self.workers = workers
+        self.master_fc = os.path.join(self.ws_gdb, "CIModelPoints")
+        self.mains_fc = os.path.join(self.ws_gdb, "CI_MainModelSegments")
+        self.move_fc = os.path.join(self.ws_gdb, "MoveCloser")
+        self.error_fc = os.path.join(self.ws_gdb, "Error_UnfoundPoints")
+        self.date = str(datetime.datetime.now().date()).replace("-", "_")
+        self.report = stagestats.RunReport(os.path.join(ws, "CIModelRunReport.jsonl"), 'cimodel')
+        with self.report.stage('load') as stage:
+            self.master_sr = arcpy.Describe(self.master_fc).spatialReference
+            self.main_sr = arcpy.Describe(self.mains_fc).spatialReference
+            # Loaded once and kept for every csv of the batch
+            self.main_index = cisnap.read_mains(self.mains_fc)
+            self.master_index = cimaster.MasterIndex(os.path.join(ws, "CIModelPoints_aliases.json"),
+                                                     self.master_fc)
+            stage.rows_in = len(self.main_index)
+        self.change_log = cimaster.ChangeLog(os.path.join(ws, "CIModelPoints_changes.jsonl"), self.date)
+        self._move_created = False
+        # The step being run, reported when a csv fails
+        self.step = None
+        # What the last match_csv downloaded from each service
+        self.fetched = {}
+
+    def _move_closer(self, in_fc, oids):
+        """Add the points of in_fc in oids to MoveCloser, which is started fresh for each batch."""
+        import arcpy
+        if not self._move_created:
+            if arcpy.Exists(self.move_fc):
+                arcpy.management.Delete(self.move_fc)
+            arcpy.management.CreateFeatureclass(self.ws_gdb, os.path.basename(self.move_fc), "POINT",
+                                                self.master_fc, spatial_reference=self.master_sr)
+            self._move_created = True
+        if not oids:
+            return
+        layer = arcpy.management.MakeFeatureLayer(in_fc, "MoveCloserLyr", cisnap.oid_where(in_fc, oids))
+        arcpy.management.Append(layer, self.move_fc, "NO_TEST")
+        arcpy.management.Delete(layer)
+
+    def match_csv(self, wo_index):
+        """
+        Find the leak repairs and pipe observations of the work orders in a
+        woindex.WorkOrderIndex and match its rows to them. Returns a
+        woindex.Matches. What was downloaded from each service is kept in
+        fetched.
+        """
+        work_orders = wo_index.work_orders()
+        self.step = "fetching leak repairs"
+        lr_points, lr_fetched = woindex.fetch_service_points(self.leak_repairs, "MXWONUM", work_orders,
+                                                             self.master_sr, self.token, self.workers)
+        # Pipe observations are only needed for the work orders that aren't leak repairs
+        self.step = "fetching pipe observations"
+        po_points, po_fetched = woindex.fetch_service_points(self.pipe_obs, "WORKORDERMX",
+                                                             [wo for wo in work_orders if wo not in lr_points],
+                                                             self.master_sr, self.token, self.workers)
+        self.fetched = {'leak_repairs': lr_fetched, 'pipe_observations': po_fetched}
+        return wo_index.classify(lr_points, po_points)
+
+    def apply_points(self, name, matches):
+        """
+        Write matched (row, geometry) pairs to a feature class called name,
+        snap them to the mains and apply them to the master points. Returns
+        a dictionary of counts.
+        """
+        import arcpy
+        out_fc = os.path.join(self.ws_gdb, name)
+        self.step = "{0}: writing points".format(name)
+        woindex.write_points(out_fc, self.master_fc, matches, self.master_sr)
+        # Keyed where they are in the service, before any are snapped
+        keys = cimaster.read_keys(out_fc, self.master_index.quantum, self.master_sr)
+        self.step = "{0}: snapping to mains".format(name)
+        status, _ = cisnap.snap_features(out_fc, self.main_index, self.main_sr, self.within_feet, self.snap_feet)
+        self.step = "{0}: updating master points".format(name)
+        added, updated = cimaster.upsert_points(out_fc, status[cisnap.WITHIN] + status[cisnap.SNAPPED],
+                                                keys, self.master_index, self.change_log)
+        removed = cimaster.delete_matches(status[cisnap.MOVE_CLOSER], keys, self.master_index, self.change_log)
+        self.step = "{0}: adding to MoveCloser".format(name)
+        self._move_closer(out_fc, status[cisnap.MOVE_CLOSER])
+        arcpy.management.Delete(out_fc)
+        return {'found': len(matches), 'within': len(status[cisnap.WITHIN]),
+                'snapped': len(status[cisnap.SNAPPED]), 'move_closer': len(status[cisnap.MOVE_CLOSER]),
+                'added': added, 'updated': updated, 'removed': removed}
+
+    def create_error_fc(self):
+        """Create the empty Error_UnfoundPoints feature class for unmatched rows if it isn't there."""
+        import arcpy
+        if not arcpy.Exists(self.error_fc):
+            arcpy.management.CreateFeatureclass(self.ws_gdb, os.path.basename(self.error_fc), "POINT",
+                                                self.master_fc, spatial_reference=self.master_sr)
+        return self.error_fc
+
+    def copy_csv(self, in_csv):
+        """
+        Keep a dated copy of the input as a table, named after the csv so
+        several csvs can run on one day. Returns the table path.
+        """
+        import arcpy
+        stem = os.path.splitext(os.path.basename(in_csv))[0]
+        name = woindex.field_name("CIModel_" + self.date + "_" + stem)
+        arcpy.conversion.TableToTable(in_csv, self.ws_gdb, name)
+        return os.path.join(self.ws_gdb, name)
+
+    def run_csv(self, in_csv):
+        """
+        Add the leak repairs and pipe observations of one input csv. Returns
+        a dictionary of counts. Raises CsvRunError, naming the failed step
+        and any master point changes already made, if the csv fails.
+        """
+        before = dict(self.change_log.counts)
+        try:
+            with self.report.stage(os.path.basename(in_csv)) as stage:
+                self.step = "reading the csv"
+                wo_index = woindex.WorkOrderIndex.from_csv(in_csv)
+                stage.rows_in = len(wo_index)
+                matches = self.match_csv(wo_index)
+                result = {'csv': in_csv, 'counts': matches.counts(), 'fetched': self.fetched,
+                          'leak_repairs': self.apply_points("newLeakRepairs", matches.leak_repairs),
+                          'pipe_observations': self.apply_points("pipeObsNewLR", matches.pipe_observations)}
+                if matches.unmatched:
+                    result['unmatched'] = [row.get(wo_index.key_field) for row in matches.unmatched]
+                    self.step = "creating Error_UnfoundPoints"
+                    self.create_error_fc()
+                self.step = "copying the csv"
+                self.copy_csv(in_csv)
+                stage.rows_out = sum(result[part]['added'] + result[part]['updated']
+                                     for part in ('leak_repairs', 'pipe_observations'))
+        except Exception as err:
+            changes = {action: count - before[action] for action, count in self.change_log.counts.items()}
+            raise CsvRunError(in_csv, self.step, changes) from err
+        return result
+
+    def finish(self):
+        """Save the locations snapped points had in the services for the next run."""
+        self.master_index.save()
+
+    def run(self, csvs):
+        """
+        Run each csv in turn. A csv that fails is logged and skipped.
+        Returns the results of the csvs that ran and the csvs that failed.
+        """
+        results = []
+        failed = []
+        try:
+            for in_csv in csvs:
+                print("Running {0}...".format(in_csv))
+                try:
+                    results.append(self.run_csv(in_csv))
+                except CsvRunError as err:
+                    print("{0}\n{1}".format(err, traceback.format_exc()))
+                    failed.append(in_csv)
+                    continue
+                print_result(results[-1])
+        finally:
+            self.finish()
+        return results, failed
+
+
+def print_result(result):
+    """Print the counts of one csv the way the notebook does."""
+    counts = result['counts']
+    print("{0}: {1} rows, {2} leak repairs, {3} pipe observations, {4} unmatched.".format(
+        result['csv'], counts['csv'], counts[woindex.LEAK_REPAIR], counts[woindex.PIPE_OBSERVATION],
+        counts[woindex.UNMATCHED]))
+    print_fetched(result['fetched'])
+    for part in ('leak_repairs', 'pipe_observations'):
+        part_counts = result[part]
+        print("  {0}: {1} within 10', {2} snapped, {3} to move closer. {4} added, {5} updated, {6} removed.".format(
+            part, part_counts['within'], part_counts['snapped'], part_counts['move_closer'],
+            part_counts['added'], part_counts['updated'], part_counts['removed']))
+    if result.get('unmatched'):
+        print("  Work orders not found: {0}".format(", ".join(str(wo) for wo in result['unmatched'])))
+
+
+def print_fetched(fetched):
+    """Print what match_csv downloaded from each service."""
+    for part in ('leak_repairs', 'pipe_observations'):
+        part_fetched = fetched[part]
+        print("  {0}: {1} features downloaded in {2} requests.".format(
+            part, part_fetched['features'], part_fetched['requests']))
+        if part_fetched['skipped']:
+            print("  {0}: {1} work orders skipped, they aren't numbers: {2}".format(
+                part, len(part_fetched['skipped']), ", ".join(part_fetched['skipped'])))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Add the leak repairs and pipe observations of input csvs "
+                                                 "to the cast iron model points.")
+    parser.add_argument("ws", help="workspace folder")
+    parser.add_argument("leak_repairs", help="LeakRepairMaximo feature service layer url")
+    parser.add_argument("pipe_obs", help="PipeOb feature service layer url")
+    parser.add_argument("csvs", nargs="+", help="input csvs, folders of csvs or patterns such as 2026_*.csv")
+    parser.add_argument("--gdb", help="workspace geodatabase, data.gdb in ws by default")
+    parser.add_argument("--snap-feet", type=float, default=25)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--token", help="feature service token, the portal sign in token by default")
+    args = parser.parse_args(argv)
+    token = args.token
+    if token is None:
+        import arcpy
+        signin = arcpy.GetSigninToken()
+        token = signin['token'] if signin else None
+    csvs = expand_csvs(args.csvs)
+    model = CastIronModel(args.ws, args.leak_repairs, args.pipe_obs, args.gdb, token, args.snap_feet,
+                          workers=args.workers)
+    results, failed = model.run(csvs)
+    print(model.report.summary())
+    print("Master point changes: {0}".format(model.change_log.counts))
+    if failed:
+        print("Failed csvs: {0}".format(", ".join(failed)))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,148 @@
+# Project: Missouri East Cast Iron Model
+# Create Date: 10/17/2026
+# Purpose: Find the nearest cast iron main segment of each new leak repair or
+#          pipe observation in one batch and snap the points that are close
+#          enough onto it, leaving only the outliers to be moved by hand
+# Python Version:   3.6
+# -----------------------------------------------------------------------
+# Import modules
+import numpy
+import shapely
+from shapely import STRtree
+from parceljoin import METERS_PER_FOOT
+
+# What happens to a point, by its distance to the nearest main
+WITHIN = 'within'
+SNAPPED = 'snapped'
+MOVE_CLOSER = 'move_closer'
+
+
+class MainIndex(object):
+    """
+    The cast iron main segments held in memory with a spatial index, so the
+    nearest segment of a whole batch of points is found at once.
+
+    Parameters
+    ----------
+    geoms : array like
+        Shapely line geometries of the main segments.
+    ids : array like
+        Id of each segment, such as its object id.
+    """
+    def __init__(self, geoms, ids):
+        self.geoms = numpy.asarray(geoms, dtype=object)
+        self.ids = numpy.asarray(ids)
+        self.tree = STRtree(self.geoms)
+
+    def __len__(self):
+        return len(self.geoms)
+
+    def nearest(self, points, max_distance=None):
+        """
+        Return the distance to the nearest segment, that segment's id and the
+        closest point on it for each of points. Points that are missing or
+        have no segment within max_distance get a distance of nan, an id of
+        None and no snapped point.
+        """
+        points = numpy.asarray(points, dtype=object)
+        distance = numpy.full(len(points), numpy.nan)
+        ids = numpy.full(len(points), None, dtype=object)
+        snapped = numpy.full(len(points), None, dtype=object)
+        valid = numpy.flatnonzero(~(shapely.is_missing(points) | shapely.is_empty(points)))
+        if len(valid) == 0 or len(self.geoms) == 0:
+            return distance, ids, snapped
+        pairs, found = self.tree.query_nearest(points[valid], max_distance=max_distance,
+                                               return_distance=True, all_matches=False)
+        point_idx = valid[pairs[0]]
+        lines = self.geoms[pairs[1]]
+        distance[point_idx] = found
+        ids[point_idx] = self.ids[pairs[1]]
+        # Project each point onto its segment and take the point at that
+        # distance along it
+        snapped[point_idx] = shapely.line_interpolate_point(
+            lines, shapely.line_locate_point(lines, points[point_idx]))
+        return distance, ids, snapped
+
+
+def classify(distance, within, snap_distance):
+    """
+    Sort points by their distance to the nearest main. Points within
+    within are kept where they are, points further than that but within
+    snap_distance are snapped onto the main and the rest, including points
+    with no main found, are left to be moved by hand.
+    """
+    distance = numpy.asarray(distance, dtype=float)
+    status = numpy.full(len(distance), MOVE_CLOSER, dtype=object)
+    status[distance <= snap_distance] = SNAPPED
+    status[distance <= within] = WITHIN
+    return status
+
+
+def read_mains(main_fc, spatial_reference=None):
+    """Read the main segments of a feature class into a MainIndex keyed by object id."""
+    import arcpy
+    ids = []
+    wkbs = []
+    with arcpy.da.SearchCursor(main_fc, ['OID@', 'SHAPE@WKB'], spatial_reference=spatial_reference) as cursor:
+        for row in cursor:
+            if row[1] is None:
+                continue
+            ids.append(row[0])
+            wkbs.append(bytes(row[1]))
+    return MainIndex(shapely.from_wkb(numpy.array(wkbs, dtype=object)), ids)
+
+
+def feet_to_units(feet, spatial_reference):
+    """
+    Convert a distance in feet to the linear unit of a spatial reference.
+    Raises ValueError if it isn't projected, as degrees have no fixed
+    length.
+    """
+    meters_per_unit = spatial_reference.metersPerUnit
+    if spatial_reference.type != 'Projected' or not meters_per_unit:
+        raise ValueError("{0} is not a projected coordinate system, distances in feet can't be used.".format(
+            spatial_reference.name))
+    return feet * METERS_PER_FOOT / meters_per_unit
+
+
+def snap_features(point_fc, main_index, spatial_reference, within_feet=10, snap_feet=25):
+    """
+    Classify every point of point_fc by its distance to the nearest main in
+    main_index, which has to be in spatial_reference, and move the points
+    between within_feet and snap_feet onto their main. Returns a dictionary
+    of WITHIN, SNAPPED and MOVE_CLOSER to the object ids in each, and a
+    dictionary of object id to the id of its nearest main for the points
+    within snap_feet of one.
+    """
+    import arcpy
+    oids = []
+    wkbs = []
+    with arcpy.da.SearchCursor(point_fc, ['OID@', 'SHAPE@WKB'], spatial_reference=spatial_reference) as cursor:
+        for row in cursor:
+            oids.append(row[0])
+            wkbs.append(None if row[1] is None else bytes(row[1]))
+    points = shapely.from_wkb(numpy.array(wkbs, dtype=object))
+    snap_distance = feet_to_units(snap_feet, spatial_reference)
+    # Nothing further than snap_feet is moved, so the search stops there
+    distance, main_ids, snapped = main_index.nearest(points, max_distance=snap_distance)
+    status = classify(distance, feet_to_units(within_feet, spatial_reference), snap_distance)
+    moves = {oid: wkb for oid, wkb, state in zip(oids, shapely.to_wkb(snapped), status) if state == SNAPPED}
+    if moves:
+        with arcpy.da.UpdateCursor(point_fc, ['OID@', 'SHAPE@WKB'],
+                                   spatial_reference=spatial_reference) as cursor:
+            for row in cursor:
+                if row[0] in moves:
+                    cursor.updateRow([row[0], moves[row[0]]])
+    status_oids = {state: [oid for oid, s in zip(oids, status) if s == state]
+                   for state in (WITHIN, SNAPPED, MOVE_CLOSER)}
+    mains = {oid: main_id for oid, main_id in zip(oids, main_ids.tolist()) if main_id is not None}
+    return status_oids, mains
+
+
+def oid_where(in_fc, oids):
+    """Return a where clause selecting the object ids in oids."""
+    import arcpy
+    field = arcpy.AddFieldDelimiters(in_fc, arcpy.Describe(in_fc).OIDFieldName)
+    if not oids:
+        return "{0} IS NULL".format(field)
+    return "{0} IN ({1})".format(field, ", ".join(str(int(oid)) for oid in oids))
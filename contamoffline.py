@@ -0,0 +1,248 @@
+# Project: MO Environmental Updates
+# Create Date: 10/17/2026
+# Purpose: Run the contamination pipeline on GeoPandas with GeoParquet
+#          intermediates, without arcpy or a file geodatabase
+# Python Version:   3.6
+# Usage:   python contamoffline.py parcels.parquet fusrap.parquet pcb.parquet work_dir
+# -----------------------------------------------------------------------
+# Import modules
+import os
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import numpy
+import pandas
+import shapely
+import geopandas
+import dnrfetch
+import parceljoin
+import sitedissolve
+import contamschema
+
+HWP_URL = "https://gis.dnr.mo.gov/arcgis/rest/services/e_start/e_start/MapServer/0"
+UST_URL = "https://gis.dnr.mo.gov/arcgis/rest/services/e_start/e_start/MapServer/3"
+HWP_QUERY = "SITESTAT IN ('Active', 'Brownfield Assessment', 'Long-Term Stewardship', 'Inactive VCP (Terminated/Withdrew)')"
+UST_QUERY = ("FACSTAT IN ('Investigation/Corrective Action is Ongoing or Incomplete', "
+             "'No Further Action Letter Issued with Restriction', 'Administrative Closure')")
+
+
+def _esri_polygon(rings):
+    """Build a shapely polygon from esri rings. Clockwise rings are shells."""
+    polygons = []
+    for ring in rings:
+        ring = shapely.LinearRing(ring)
+        if not ring.is_ccw or not polygons:
+            polygons.append([ring, []])
+        else:
+            polygons[-1][1].append(ring)
+    parts = [shapely.Polygon(shell, holes) for shell, holes in polygons]
+    return parts[0] if len(parts) == 1 else shapely.MultiPolygon(parts)
+
+
+def esri_geometry(geometry):
+    """Convert one esri json geometry to a shapely geometry."""
+    if not geometry:
+        return None
+    if 'x' in geometry:
+        return None if geometry['x'] is None else shapely.Point(geometry['x'], geometry['y'])
+    if 'points' in geometry:
+        return shapely.MultiPoint(geometry['points'])
+    if 'paths' in geometry:
+        paths = [shapely.LineString(path) for path in geometry['paths']]
+        return paths[0] if len(paths) == 1 else shapely.MultiLineString(paths)
+    if 'rings' in geometry:
+        return _esri_polygon(geometry['rings'])
+    raise ValueError("Unknown esri geometry: {0}".format(sorted(geometry)))
+
+
+def feature_set_to_gdf(feature_set):
+    """Convert an esri json feature set to a GeoDataFrame."""
+    columns = [field['name'] for field in feature_set['fields']]
+    records = [feature.get('attributes', {}) for feature in feature_set['features']]
+    geometry = [esri_geometry(feature.get('geometry')) for feature in feature_set['features']]
+    sr = feature_set.get('spatialReference') or {}
+    crs = sr.get('latestWkid') or sr.get('wkid')
+    return geopandas.GeoDataFrame(pandas.DataFrame.from_records(records, columns=columns),
+                                  geometry=geopandas.GeoSeries(geometry), crs=crs)
+
+
+def fetch_sites(url, where, workers=4):
+    """Download a DNR layer into a GeoDataFrame with the where clause run by the server."""
+    with dnrfetch.LayerFetcher(url, workers=workers) as fetcher:
+        feature_set = fetcher.fetch(where)
+        dnrfetch.drop_fields(feature_set, [fetcher.oid_field(), "OBJECTID"])
+    return feature_set_to_gdf(feature_set)
+
+
+def join_parcels(parcels, site_frames, distance_feet=50, chunk_size=50000):
+    """
+    Join parcels within distance_feet of the sites in each of site_frames,
+    giving the same rows as parceljoin.join_parcels. Sites are projected to
+    the parcel coordinate system, which has to be a projected one.
+    """
+    meters_per_unit = parceljoin.METERS_PER_FOOT
+    if parcels.crs is not None:
+        meters_per_unit = parcels.crs.axis_info[0].unit_conversion_factor
+    distance = distance_feet * parceljoin.METERS_PER_FOOT / meters_per_unit
+    layers = []
+    for sites in site_frames:
+        if parcels.crs is not None and sites.crs is not None:
+            sites = sites.to_crs(parcels.crs)
+        sites = sites[sites.geometry.notna()]
+        fields = [c for c in sites.columns if c != sites.geometry.name]
+        layers.append(parceljoin.SiteLayer(numpy.asarray(sites.geometry.values, dtype=object),
+                                           list(sites[fields].itertuples(index=False, name=None)), fields))
+    ids = numpy.arange(len(parcels))
+    wkbs = shapely.to_wkb(numpy.asarray(parcels.geometry.values, dtype=object))
+    chunks = ((ids[i:i + chunk_size].tolist(), list(wkbs[i:i + chunk_size]))
+              for i in range(0, len(parcels), chunk_size))
+    frames = []
+    for layer, rows in zip(layers, parceljoin.join_chunks(chunks, layers, distance)):
+        frame = pandas.DataFrame([list(site_row) for _, _, _, site_row in rows], columns=layer.fields)
+        frame.insert(0, 'TARGET_FID', [parcel_id for parcel_id, _, _, _ in rows])
+        frame.insert(0, 'Join_Count', [count for _, _, count, _ in rows])
+        geometry = shapely.from_wkb(numpy.array([wkb for _, wkb, _, _ in rows], dtype=object))
+        frames.append(geopandas.GeoDataFrame(frame, geometry=geopandas.GeoSeries(geometry), crs=parcels.crs))
+    return geopandas.GeoDataFrame(pandas.concat(frames, ignore_index=True), crs=parcels.crs)
+
+
+def fill_site_names(union):
+    """Replace null or blank SITENAME values with FACNAME."""
+    if 'FACNAME' not in union:
+        return union
+    if 'SITENAME' not in union:
+        union['SITENAME'] = None
+    blank = union['SITENAME'].isna() | (union['SITENAME'].astype(str).str.len() == 0)
+    union['SITENAME'] = union['SITENAME'].where(~blank, union['FACNAME'])
+    return union
+
+
+def consolidate(frames):
+    """
+    Combine the FUSRAP, PCB and dissolved DNR frames into the Contamination
+    schema, applying the same drops, renames and rules as contamschema.
+    """
+    rule_fields = ["DNRPROGRAM", "SITEOWN"]
+    drop_first = [name for name in contamschema.DROP_FIELDS if name not in rule_fields]
+    crs = next((frame.crs for frame in frames if frame.crs is not None), None)
+    prepared = []
+    for frame in frames:
+        frame = frame.drop(columns=[c for c in frame.columns if c in drop_first])
+        frame = frame.rename(columns=contamschema.RENAME_FIELDS)
+        if frame.crs is not None and crs is not None:
+            frame = frame.to_crs(crs)
+        prepared.append(frame)
+    combined = geopandas.GeoDataFrame(pandas.concat(prepared, ignore_index=True), crs=crs)
+    for name in rule_fields + ["SITE_OWNERSHIP", "SUBTYPECD", "NOTES"]:
+        if name not in combined:
+            combined[name] = None
+    program = combined["DNRPROGRAM"]
+    owner = combined["SITEOWN"]
+    dnr = program.notna() | owner.notna()
+    combined["SITE_OWNERSHIP"] = combined["SITE_OWNERSHIP"].where(~dnr, owner.where(owner.notna(), program))
+    combined["SUBTYPECD"] = pandas.to_numeric(combined["SUBTYPECD"].where(~dnr, 3)).astype('Int64')
+    combined["NOTES"] = combined["NOTES"].where(combined["SUBTYPECD"] != 2, contamschema.PCB_NOTES)
+    combined = combined.drop(columns=rule_fields)
+    # Repair geometry in case of issues
+    repaired = shapely.make_valid(numpy.asarray(combined.geometry.values, dtype=object))
+    combined = combined.set_geometry(geopandas.GeoSeries(repaired, index=combined.index, crs=crs))
+    return combined
+
+
+class OfflinePipeline(object):
+    """
+    Runs the contamination stages on GeoDataFrames. Each stage's result is
+    written to work_dir as GeoParquet so it can be inspected, benchmarked
+    or exported on its own.
+
+    Parameters
+    ----------
+    work_dir : String
+        Folder the GeoParquet intermediates are written to.
+    workers : int
+        Pages fetched at once and threads used by the dissolve.
+    """
+    def __init__(self, work_dir, workers=4):
+        self.work_dir = work_dir
+        self.workers = max(1, int(workers))
+        os.makedirs(work_dir, exist_ok=True)
+
+    def path(self, name):
+        """Return the GeoParquet path for a stage."""
+        return os.path.join(self.work_dir, name + ".parquet")
+
+    def save(self, name, gdf):
+        """Write a stage result and return it."""
+        gdf.to_parquet(self.path(name))
+        print("{0}: {1} rows written to {2}.".format(name, len(gdf), self.path(name)))
+        return gdf
+
+    def load(self, name):
+        """Read a stage result back."""
+        return geopandas.read_parquet(self.path(name))
+
+    def run(self, parcels, fusrap, pcb, hwp=None, ust=None):
+        """
+        Run every stage and return the Contamination GeoDataFrame. parcels,
+        fusrap and pcb are GeoDataFrames or paths readable by GeoPandas.
+        The DNR sites are downloaded unless hwp and ust are given.
+        """
+        # The two DNR layers download while the local layers are read
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            hwp_future = pool.submit(fetch_sites, HWP_URL, HWP_QUERY, self.workers) if hwp is None else None
+            ust_future = pool.submit(fetch_sites, UST_URL, UST_QUERY, self.workers) if ust is None else None
+            parcels, fusrap, pcb = [read_frame(f) for f in (parcels, fusrap, pcb)]
+            hwp = hwp if hwp_future is None else hwp_future.result()
+            ust = ust if ust_future is None else ust_future.result()
+        hwp = self.save("DNRHWPSite", read_frame(hwp))
+        ust = self.save("DNRTankSite", read_frame(ust))
+        union = self.save("contamination_union", fill_site_names(join_parcels(parcels, [ust, hwp])))
+        dissolved = self.save("contamination_dissolve",
+                              sitedissolve.dissolve_first(union, "SITENAME", workers=self.workers))
+        return self.save("Contamination", consolidate([fusrap, pcb, dissolved]))
+
+
+def read_frame(source):
+    """Return source as a GeoDataFrame, reading it if it is a path."""
+    if isinstance(source, geopandas.GeoDataFrame):
+        return source
+    if str(source).lower().endswith('.parquet'):
+        return geopandas.read_parquet(source)
+    return geopandas.read_file(source)
+
+
+def export_gdb(gdf, out_fc):
+    """
+    Write a GeoDataFrame to a geodatabase feature class with arcpy. Kept
+    apart from the pipeline so it is the only step that needs ArcGIS.
+    """
+    import arcpy
+    # GeoPackage is read natively by ArcGIS, so it is used to hand the
+    # result over
+    gpkg_path = out_fc + "_export.gpkg"
+    gdf.to_file(gpkg_path, layer="Contamination", driver="GPKG")
+    try:
+        arcpy.conversion.ExportFeatures(os.path.join(gpkg_path, "main.Contamination"), out_fc)
+    finally:
+        os.remove(gpkg_path)
+    return out_fc
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the Contamination layer with GeoPandas.")
+    parser.add_argument("parcels", help="parcel polygons")
+    parser.add_argument("fusrap", help="FUSRAP polygons")
+    parser.add_argument("pcb", help="PCB sample polygons")
+    parser.add_argument("work_dir", help="folder for the GeoParquet intermediates")
+    parser.add_argument("--hwp", help="HWP sites instead of downloading them")
+    parser.add_argument("--ust", help="UST sites instead of downloading them")
+    parser.add_argument("--gpkg", help="also write the result to this GeoPackage")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    result = OfflinePipeline(args.work_dir, args.workers).run(args.parcels, args.fusrap, args.pcb,
+                                                             args.hwp, args.ust)
+    if args.gpkg:
+        result.to_file(args.gpkg, layer="Contamination", driver="GPKG")
+
+
+if __name__ == '__main__':
+    main()
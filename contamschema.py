@@ -0,0 +1,142 @@
+# Project: MO Environmental Updates
+# Create Date: 10/17/2026
+# Purpose: Declare the Contamination schema once and write the combined
+#          FUSRAP, PCB and DNR features into it in a single pass
+# Python Version:   3.6
+# -----------------------------------------------------------------------
+# Import modules
+import os
+from parceljoin import FIELD_TYPES
+
+# Fields dropped from the inputs. The FUSRAP and PCB copies of the ids are
+# replaced by the DNR values, and DNRPROGRAM/SITEOWN only feed SITE_OWNERSHIP.
+DROP_FIELDS = ["AUL_ID", "OUID_1", "SMARS_ID", "SITE_FACILITY_NAME",
+               "FEDERAL_ID", "COUNTY_1", "DNRPROGRAM", "SITEOWN"]
+
+# DNR field names to the Contamination field they are written to
+RENAME_FIELDS = {"AULID": "AUL_ID", "SMARSID": "SMARS_ID",
+                 "SITENAME": "SITE_FACILITY_NAME", "FEDERALID": "FEDERAL_ID"}
+
+# Notes given to the PCB sample polygons
+PCB_NOTES = ("Dispose of all pipe, fittings and associated debris in 'cast iron projects' dumpster at . "
+             "Wear nitrile gloves and face shield when inside of pipe is exposed.")
+
+# Subtype codes of the Contamination layer
+SUBTYPES = {"1": "Special PPE and Disposal - FUSRAP", "2": "Special PPE and Disposal - Legacy",
+            "3": "Special PPE and Disposal - DNR Remediation"}
+
+_SYSTEM_TYPES = ('OID', 'GlobalID', 'Geometry', 'Blob', 'Raster')
+
+
+def site_name(sitename, facname):
+    """Return the site name, falling back to the facility name when it is empty."""
+    if sitename is None or len(sitename) == 0:
+        return facname
+    return sitename
+
+
+def apply_rules(values):
+    """
+    Fill SITE_OWNERSHIP, SUBTYPECD and NOTES in a dictionary of field
+    values from the DNR program and owner. DNR sites get subtype 3 and PCB
+    samples (subtype 2) get the disposal notes.
+    """
+    program = values.get("DNRPROGRAM")
+    owner = values.get("SITEOWN")
+    # The owner is used when there is one, otherwise the program
+    if program is not None or owner is not None:
+        values["SITE_OWNERSHIP"] = owner if owner is not None else program
+        values["SUBTYPECD"] = 3
+    if values.get("SUBTYPECD") == 2:
+        values["NOTES"] = PCB_NOTES
+    return values
+
+
+class TargetField(object):
+    """
+    One field of the Contamination output and the input field it is read
+    from.
+    """
+    def __init__(self, name, field_type, length=None, alias=None, source=None):
+        self.name = name
+        self.field_type = field_type
+        self.length = length
+        self.alias = alias or name
+        self.source = source or name
+
+    def __repr__(self):
+        return "TargetField({0!r}, {1!r}, source={2!r})".format(self.name, self.field_type, self.source)
+
+    def add_field_row(self):
+        """Return the row describing this field for AddFields."""
+        return [self.name, FIELD_TYPES.get(self.field_type, 'TEXT'), self.alias,
+                self.length if self.field_type == 'String' else None]
+
+
+def build_schema(inputs, drop=DROP_FIELDS, renames=RENAME_FIELDS):
+    """
+    Return the list of TargetFields for the combined output. Fields are
+    taken from the inputs in order and the first input holding a name sets
+    its type, as Merge does. Dropped fields are skipped and renamed fields
+    take their new name. FIRST_ is removed from aliases left by a dissolve.
+    """
+    import arcpy
+    drop = {name.upper() for name in drop}
+    fields = []
+    seen = set()
+    for in_fc in inputs:
+        for field in arcpy.ListFields(in_fc):
+            if field.type in _SYSTEM_TYPES or field.name.upper() in ('SHAPE_LENGTH', 'SHAPE_AREA'):
+                continue
+            if field.name.upper() in drop:
+                continue
+            name = renames.get(field.name, field.name)
+            if name.upper() in seen:
+                continue
+            seen.add(name.upper())
+            alias = field.aliasName.replace('FIRST_', '') if field.aliasName else name
+            if field.name in renames:
+                alias = name
+            fields.append(TargetField(name, field.type, field.length, alias, field.name))
+    return fields
+
+
+def write_contamination(inputs, out_fc, schema=None):
+    """
+    Create out_fc and fill it from inputs in one pass.
+
+    Each input is read once with only the fields the output needs, renamed
+    on the fly, run through site_name and apply_rules and inserted. The
+    output is created with its fields and global ids before any rows go
+    in, so the table is only written once. Returns the number of rows
+    written.
+    """
+    import arcpy
+    if schema is None:
+        schema = build_schema(inputs)
+    spatial_reference = arcpy.Describe(inputs[0]).spatialReference
+    if arcpy.Exists(out_fc):
+        arcpy.management.Delete(out_fc)
+    arcpy.management.CreateFeatureclass(os.path.dirname(out_fc), os.path.basename(out_fc),
+                                        "POLYGON", spatial_reference=spatial_reference)
+    arcpy.management.AddFields(out_fc, [field.add_field_row() for field in schema])
+    arcpy.management.AddGlobalIDs(out_fc)
+    out_names = [field.name for field in schema]
+    written = 0
+    with arcpy.da.InsertCursor(out_fc, ['SHAPE@'] + out_names) as out_cursor:
+        for in_fc in inputs:
+            in_names = {f.name for f in arcpy.ListFields(in_fc)}
+            # Read only the output fields this input has plus the fields
+            # the rules need
+            fields = [field for field in schema if field.source in in_names]
+            extra = [name for name in ("DNRPROGRAM", "SITEOWN", "FACNAME") if name in in_names]
+            read = [field.source for field in fields] + extra
+            with arcpy.da.SearchCursor(in_fc, ['SHAPE@'] + read, spatial_reference=spatial_reference) as cursor:
+                for row in cursor:
+                    values = dict(zip([field.name for field in fields] + extra, row[1:]))
+                    if "FACNAME" in values and "SITE_FACILITY_NAME" in values:
+                        values["SITE_FACILITY_NAME"] = site_name(values["SITE_FACILITY_NAME"], values["FACNAME"])
+                    apply_rules(values)
+                    out_cursor.insertRow([row[0]] + [values.get(name) for name in out_names])
+                    written += 1
+    return written
@@ -0,0 +1,185 @@
+# Project: MO Environmental Updates
+# Create Date: 10/17/2026
+# Purpose: Apply only the changed contamination features to the production
+#          Contamination layer instead of deleting and appending everything
+# Python Version:   3.6
+# -----------------------------------------------------------------------
+# Import modules
+import os
+import json
+import hashlib
+import numpy
+import shapely
+import fieldmatch
+
+# Fields that identify a contamination site between runs. SUBTYPECD keeps
+# FUSRAP, PCB and DNR features with the same ids apart. FUSRAP and PCB
+# features have none of the ids, so they are told apart by their geometry.
+KEY_FIELDS = ["SUBTYPECD", "AUL_ID", "SMARS_ID", "FEDERAL_ID", "SITE_FACILITY_NAME"]
+
+# Coordinates are rounded to this before a geometry is used as a key, so
+# the production copy, stored at its own resolution, gives the same key
+GEOMETRY_QUANTUM = 0.01
+
+
+def geometry_key(wkb, quantum=GEOMETRY_QUANTUM):
+    """Return a hash of a geometry's coordinates rounded to quantum."""
+    if wkb is None:
+        return None
+    coords = shapely.get_coordinates(shapely.from_wkb(bytes(wkb)))
+    rounded = numpy.round(coords / quantum).astype(numpy.int64)
+    return hashlib.sha1(rounded.tobytes()).hexdigest()
+
+
+def feature_key(values, wkb=None):
+    """
+    Return the snapshot key for a tuple of key field values. When only the
+    first value, the subtype, is set the key also holds the geometry's
+    hash, as FUSRAP and PCB features have no ids of their own.
+    """
+    key = [None if v is None else str(v) for v in values]
+    if all(v is None for v in key[1:]):
+        key.append(geometry_key(wkb))
+    return json.dumps(key)
+
+
+def feature_hash(values, wkb):
+    """Return a hash of a feature's attribute values and geometry."""
+    digest = hashlib.sha1(json.dumps([None if v is None else str(v) for v in values]).encode('utf-8'))
+    if wkb is not None:
+        digest.update(bytes(wkb))
+    return digest.hexdigest()
+
+
+def diff_snapshots(old, new):
+    """
+    Compare two dictionaries of key to hash. Returns sets of the keys to
+    insert, update and delete to turn old into new.
+    """
+    old_keys = set(old)
+    new_keys = set(new)
+    inserts = new_keys - old_keys
+    deletes = old_keys - new_keys
+    updates = {key for key in old_keys & new_keys if old[key] != new[key]}
+    return inserts, updates, deletes
+
+
+class Snapshot(object):
+    """
+    The key to hash dictionary of the features applied on the last run,
+    kept as a json file next to the workspace geodatabase.
+    """
+    def __init__(self, path):
+        self.path = path
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def load(self):
+        """Return the saved hashes, or None if there is no usable snapshot."""
+        if not self.exists():
+            return None
+        try:
+            with open(self.path, 'r') as snap_file:
+                return json.load(snap_file)
+        except ValueError:
+            return None
+
+    def save(self, hashes):
+        """Write the hashes, replacing the old file only once written."""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w') as snap_file:
+            json.dump(hashes, snap_file)
+        os.replace(tmp_path, self.path)
+
+
+class DuplicateKeyError(ValueError):
+    """Raised when two features of a layer have the same snapshot key."""
+
+
+def read_features(source_fc, fields, key_count):
+    """
+    Read every feature of source_fc. Returns a dictionary of key to hash
+    and a dictionary of key to the row of fields and geometry. Raises
+    DuplicateKeyError if two features have the same key.
+    """
+    import arcpy
+    hashes = {}
+    rows = {}
+    with arcpy.da.SearchCursor(source_fc, fields + ['SHAPE@WKB', 'SHAPE@']) as cursor:
+        for row in cursor:
+            key = feature_key(row[:key_count], row[-2])
+            if key in hashes:
+                raise DuplicateKeyError("{0} has more than one feature with the key {1}".format(source_fc, key))
+            hashes[key] = feature_hash(row[:-2], row[-2])
+            rows[key] = list(row[:-2]) + [row[-1]]
+    return hashes, rows
+
+
+def sync_contamination(source_fc, target_fc, snapshot_path, key_fields=KEY_FIELDS, workspace=None):
+    """
+    Make target_fc match source_fc.
+
+    When a snapshot from the last run exists only the features whose key
+    is new, gone, or whose attributes or geometry hash changed are
+    inserted, deleted or updated, inside one edit session. Untouched
+    features keep their global ids. Without a snapshot every feature is
+    deleted and appended as before. The snapshot is saved once the edits
+    are applied. Features are matched by key_fields, and by geometry
+    when only the subtype is set. A duplicate key in either layer raises
+    DuplicateKeyError rather than deleting the extra features.
+
+    Returns a tuple of the number of inserts, updates and deletes.
+    """
+    import arcpy
+    snapshot = Snapshot(snapshot_path)
+    fields = fieldmatch.compare_fields(source_fc, target_fc, key_fields)
+    key_count = len([f for f in key_fields if f in fields])
+    new_hashes, new_rows = read_features(source_fc, fields, key_count)
+    old_hashes = snapshot.load()
+    if old_hashes is None:
+        # No record of what is in production, so replace everything
+        arcpy.management.DeleteFeatures(target_fc)
+        arcpy.management.Append(source_fc, target_fc, 'TEST')
+        snapshot.save(new_hashes)
+        return len(new_hashes), 0, 0
+    inserts, updates, deletes = diff_snapshots(old_hashes, new_hashes)
+    if inserts or updates or deletes:
+        if workspace is None:
+            workspace = os.path.dirname(target_fc)
+        edit = arcpy.da.Editor(workspace)
+        # Production is versioned, so edit inside an edit operation
+        edit.startEditing(False, True)
+        edit.startOperation()
+        try:
+            seen = set()
+            # Geometry keys are taken in the source's coordinates
+            spatial_reference = arcpy.Describe(source_fc).spatialReference
+            with arcpy.da.UpdateCursor(target_fc, fields + ['SHAPE@'],
+                                       spatial_reference=spatial_reference) as cursor:
+                for row in cursor:
+                    key = feature_key(row[:key_count], None if row[-1] is None else row[-1].WKB)
+                    if key in seen:
+                        raise DuplicateKeyError("{0} has more than one feature with the key {1}. Delete {2} "
+                                                "to replace every feature.".format(target_fc, key, snapshot_path))
+                    seen.add(key)
+                    # Remove features that are gone
+                    if key in deletes or key not in new_hashes:
+                        cursor.deleteRow()
+                        continue
+                    # A new key already in production is updated, not added twice
+                    if key in updates or key in inserts:
+                        cursor.updateRow(new_rows[key])
+            # Anything in the snapshot but missing from production is added back
+            inserts = set(new_hashes) - seen
+            with arcpy.da.InsertCursor(target_fc, fields + ['SHAPE@']) as cursor:
+                for key in inserts:
+                    cursor.insertRow(new_rows[key])
+            edit.stopOperation()
+            edit.stopEditing(True)
+        except Exception:
+            edit.abortOperation()
+            edit.stopEditing(False)
+            raise
+    snapshot.save(new_hashes)
+    return len(inserts), len(updates), len(deletes)
@@ -0,0 +1,337 @@
+# Project: MO Environmental Updates
+# Create Date: 10/17/2026
+# Purpose: Query ArcGIS REST map service layers page by page with the where
+#          clause and out fields sent to the server
+# Python Version:   3.6
+# -----------------------------------------------------------------------
+# Import modules
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+
+# Status codes that are worth another attempt. ArcGIS Server also reports
+# these inside a 200 response as an error code.
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+# Field types fetch_values can filter on, quoted and unquoted
+TEXT_TYPES = ('esriFieldTypeString', 'esriFieldTypeGUID', 'esriFieldTypeGlobalID')
+NUMBER_TYPES = ('esriFieldTypeOID', 'esriFieldTypeInteger', 'esriFieldTypeSmallInteger',
+                'esriFieldTypeBigInteger', 'esriFieldTypeDouble', 'esriFieldTypeSingle')
+
+
+class RestServiceError(Exception):
+    """Raised when a map service returns an error that retrying won't fix."""
+
+
+class LayerFetcher(object):
+    """
+    Downloads features from one ArcGIS REST map service layer.
+
+    The object ids matching the where clause are requested first, then the
+    features are requested in pages of object ids no larger than the
+    layer's maxRecordCount. Pages are requested side by side over one
+    pooled session, and failed requests are retried with an exponential
+    backoff. fetch returns once every page is in, so no fixed wait is
+    needed for the service to finish.
+
+    Parameters
+    ----------
+    url : String
+        Layer url, for example .../MapServer/0
+    session : requests.Session
+        Optional session to send the requests with. One is created if not
+        given.
+    workers : int
+        Number of pages requested at once.
+    page_size : int
+        Largest number of features requested at once. Lowered to the
+        layer's maxRecordCount if that is smaller.
+    retries : int
+        Number of extra attempts made for a request before giving up.
+    backoff : float
+        Seconds to wait before the first retry. Doubles with every retry.
+    timeout : float
+        Seconds to wait on the server before a request is abandoned.
+    token : String
+        Optional token sent with every request, for secured services such
+        as Portal feature services.
+    """
+    def __init__(self, url, session=None, workers=4, page_size=1000, retries=3,
+                 backoff=1.0, timeout=120, token=None):
+        self.url = url.rstrip('/')
+        self.token = token
+        self.workers = max(1, int(workers))
+        self.page_size = max(1, int(page_size))
+        self.retries = max(0, int(retries))
+        self.backoff = backoff
+        self.timeout = timeout
+        self._own_session = session is None
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.workers,
+                                  pool_maxsize=self.workers)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session = session
+        self._info = None
+        # Every page request is counted so callers can log it
+        self.requests_sent = 0
+        self.bytes_received = 0
+        self._count_lock = threading.Lock()
+
+    def close(self):
+        """Close the session if it was created here."""
+        if self._own_session:
+            self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _request(self, path, params):
+        """
+        Send one request and return the decoded json. Transient failures are
+        retried, other errors raise RestServiceError.
+        """
+        params = dict(params, f='json')
+        if self.token:
+            params['token'] = self.token
+        url = self.url + path
+        for attempt in range(self.retries + 1):
+            retry = False
+            try:
+                # POST keeps long object id lists out of the url
+                response = self.session.post(url, data=params, timeout=self.timeout)
+                with self._count_lock:
+                    self.requests_sent += 1
+                    self.bytes_received += len(response.content)
+                if response.status_code in RETRY_STATUS:
+                    retry = True
+                    message = "HTTP {0}".format(response.status_code)
+                else:
+                    response.raise_for_status()
+                    payload = response.json()
+                    error = payload.get('error')
+                    if error is None:
+                        return payload
+                    message = "{0} {1}".format(error.get('code'), error.get('message'))
+                    retry = error.get('code') in RETRY_STATUS
+            except (requests.ConnectionError, requests.Timeout) as err:
+                retry = True
+                message = str(err)
+            except (requests.HTTPError, ValueError) as err:
+                message = str(err)
+            if not retry or attempt == self.retries:
+                break
+            time.sleep(self.backoff * (2 ** attempt))
+        raise RestServiceError("Request to {0} failed: {1}".format(url, message))
+
+    def layer_info(self):
+        """Return the layer description. It is only requested once."""
+        if self._info is None:
+            self._info = self._request('', {})
+        return self._info
+
+    def oid_field(self):
+        """Return the name of the layer's object id field."""
+        info = self.layer_info()
+        if info.get('objectIdField'):
+            return info['objectIdField']
+        for field in info.get('fields', []):
+            if field.get('type') == 'esriFieldTypeOID':
+                return field['name']
+        raise RestServiceError("{0} has no object id field.".format(self.url))
+
+    def field_type(self, name):
+        """Return the esri type of a layer field, matched without case."""
+        for field in self.layer_info().get('fields', []):
+            if field['name'].upper() == name.upper():
+                return field.get('type')
+        raise RestServiceError("{0} has no field {1}.".format(self.url, name))
+
+    def object_ids(self, where="1=1"):
+        """Return the sorted object ids of the features matching where."""
+        payload = self._request('/query', {'where': where, 'returnIdsOnly': 'true'})
+        return sorted(payload.get('objectIds') or [])
+
+    def _page(self, oids, out_fields, out_sr):
+        """Request the features for one page of object ids."""
+        params = {'objectIds': ",".join(str(oid) for oid in oids),
+                  'outFields': out_fields,
+                  'returnGeometry': 'true'}
+        if out_sr is not None:
+            params['outSR'] = out_sr
+        payload = self._request('/query', params)
+        # A server with a lower limit than it reported returns part of the
+        # page, so the rest is requested again
+        if payload.get('exceededTransferLimit') and len(oids) > 1:
+            got = len(payload.get('features', []))
+            if 0 < got < len(oids):
+                rest = self._page(oids[got:], out_fields, out_sr)
+                payload['features'] = payload['features'] + rest['features']
+        return payload
+
+    def fetch(self, where="1=1", out_fields="*", out_sr=None):
+        """
+        Return the features matching where as an esri json feature set
+        dictionary with fields, geometryType, spatialReference and features.
+
+        :param - where - sql where clause, evaluated by the server
+        :param - out_fields - comma separated field names or *
+        :param - out_sr - optional wkid for the returned geometry"""
+        return self.fetch_ids(self.object_ids(where), out_fields, out_sr)
+
+    def fetch_ids(self, oids, out_fields="*", out_sr=None):
+        """Return the features with the object ids in oids as an esri json feature set dictionary."""
+        if isinstance(out_fields, (list, tuple)):
+            out_fields = ",".join(out_fields)
+        info = self.layer_info()
+        size = min(self.page_size, int(info.get('maxRecordCount') or self.page_size))
+        pages = [oids[start:start + size] for start in range(0, len(oids), size)]
+        if self.workers == 1 or len(pages) < 2:
+            results = [self._page(page, out_fields, out_sr) for page in pages]
+        else:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                results = list(pool.map(lambda page: self._page(page, out_fields, out_sr), pages))
+        feature_set = {'geometryType': info.get('geometryType'),
+                       'spatialReference': None,
+                       'fields': [],
+                       'features': []}
+        for result in results:
+            if not feature_set['fields']:
+                feature_set['fields'] = result.get('fields', [])
+                feature_set['geometryType'] = result.get('geometryType', feature_set['geometryType'])
+                feature_set['spatialReference'] = result.get('spatialReference')
+            feature_set['features'].extend(result.get('features', []))
+        if not feature_set['fields']:
+            # Nothing matched, use the layer fields so the schema is still right
+            feature_set['fields'] = info.get('fields', [])
+            extent = info.get('extent') or {}
+            feature_set['spatialReference'] = extent.get('spatialReference')
+        if len(feature_set['features']) != len(oids):
+            raise RestServiceError("{0} returned {1} of {2} features.".format(
+                self.url, len(feature_set['features']), len(oids)))
+        return feature_set
+
+    def fetch_values(self, field, values, out_fields="*", out_sr=None, batch_size=250):
+        """
+        Return the features whose field is one of values as an esri json
+        feature set dictionary. The values are sent to the server in
+        batches of field IN (...) where clauses, requested side by side,
+        so only the matching features are downloaded. Values that aren't
+        numbers are skipped when field is numeric. Date fields can't be
+        filtered on and raise RestServiceError. Returns the feature set and
+        a list of the values skipped.
+        """
+        field_type = self.field_type(field)
+        skipped = []
+        if field_type in TEXT_TYPES:
+            wheres = in_clauses(field, values, True, batch_size)
+        elif field_type in NUMBER_TYPES:
+            numbers, skipped = numeric_values(values)
+            wheres = in_clauses(field, numbers, False, batch_size)
+        else:
+            raise RestServiceError("{0} can't be filtered by value, it is a {1} field.".format(field, field_type))
+        if self.workers == 1 or len(wheres) < 2:
+            batches = [self.object_ids(where) for where in wheres]
+        else:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                batches = list(pool.map(self.object_ids, wheres))
+        return self.fetch_ids(sorted({oid for batch in batches for oid in batch}), out_fields, out_sr), skipped
+
+
+def numeric_values(values):
+    """
+    Split values into the text of the ones that are numbers and the text of
+    the ones that aren't. Whole numbers keep their digits, others are
+    written as floats.
+    """
+    numbers = []
+    skipped = []
+    for value in values:
+        if value is None:
+            continue
+        text = str(value).strip()
+        if text.lstrip('-').isdigit():
+            numbers.append(text)
+            continue
+        try:
+            number = float(text)
+        except ValueError:
+            skipped.append(text)
+            continue
+        if number != number or number in (float('inf'), float('-inf')):
+            skipped.append(text)
+        else:
+            numbers.append(repr(number))
+    return numbers, skipped
+
+
+def in_clauses(field, values, quoted=True, batch_size=250):
+    """
+    Return where clauses selecting field IN values, batch_size values to a
+    clause. Text values are quoted with their quotes doubled. Unquoted
+    values have to be numbers already, see numeric_values.
+    """
+    values = sorted({str(value) for value in values if value is not None})
+    if quoted:
+        values = ["'{0}'".format(value.replace("'", "''")) for value in values]
+    return ["{0} IN ({1})".format(field, ", ".join(values[start:start + batch_size]))
+            for start in range(0, len(values), batch_size)]
+
+
+def drop_fields(feature_set, names):
+    """
+    Remove fields from an esri json feature set in place and return it.
+    Used to drop the service's extra OBJECTID field, which clashes with the
+    object id created by the geodatabase.
+    """
+    names = set(names)
+    feature_set['fields'] = [f for f in feature_set['fields'] if f['name'] not in names]
+    for feature in feature_set['features']:
+        attributes = feature.get('attributes', {})
+        for name in names:
+            attributes.pop(name, None)
+    return feature_set
+
+
+def save_feature_set(feature_set, json_path):
+    """Write an esri json feature set to a file for JSONToFeatures."""
+    with open(json_path, 'w') as json_file:
+        json.dump(feature_set, json_file)
+    return json_path
+
+
+def copy_layer(url, out_gdb, out_name, where="1=1", out_fields="*", workers=4, drop=(), stage=None,
+               lock=None):
+    """
+    Copy the features of a map service layer matching where into a
+    geodatabase feature class and return its path. The service's object id
+    field and any fields in drop are left out, the new feature class gets
+    its own OBJECTID. If a stagestats stage record is given, the feature
+    count and bytes downloaded are set on it. If a lock is given, it is
+    held while arcpy writes the feature class, so copies can download in
+    several threads at once.
+    """
+    import arcpy
+    with LayerFetcher(url, workers=workers) as fetcher:
+        feature_set = fetcher.fetch(where, out_fields)
+        drop_fields(feature_set, [fetcher.oid_field()] + list(drop))
+        print("{0} features downloaded from {1} in {2} requests.".format(
+            len(feature_set['features']), url, fetcher.requests_sent))
+        if stage is not None:
+            stage.rows_out = len(feature_set['features'])
+            stage.bytes = fetcher.bytes_received
+    json_path = os.path.join(os.path.dirname(out_gdb), out_name + ".json")
+    save_feature_set(feature_set, json_path)
+    out_fc = os.path.join(out_gdb, out_name)
+    with lock or threading.Lock():
+        arcpy.conversion.JSONToFeatures(json_path, out_fc)
+    os.remove(json_path)
+    return out_fc
@@ -0,0 +1,207 @@
+# Project: Spire to Locator Contractor data compilation
+# Create Date: 10/17/2026
+# Purpose: Keep a manifest of service cards and field book pdfs that have
+#          already been delivered so unchanged documents are not re-sent
+# Python Version:   3.6
+# -----------------------------------------------------------------------
+# Import modules
+import os
+import json
+import shutil
+import hashlib
+import threading
+
+
+def file_hash(filepath, chunk_size=1024 * 1024):
+    """Return the sha256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as in_file:
+        for chunk in iter(lambda: in_file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DocumentCache(object):
+    """
+    A persistent, content addressed cache of delivered documents.
+
+    The manifest is a json file keyed on the document source (a url or a
+    source file path). Each entry holds the source validators (size, mtime,
+    ETag, Last-Modified), the sha256 hash of the content and the destination
+    the document was last delivered to. Every delivered document is also
+    hard linked into a store folder under its hash, so a document whose
+    destination has been cleared out can be put back with a hard link
+    instead of moving it over the network again.
+
+    Parameters
+    ----------
+    manifest_path : String
+        Path to the json manifest. It is created on the first save.
+    store_dir : String
+        Folder holding the content addressed copies. Defaults to a
+        DocumentStore folder next to the manifest. Neither should be inside
+        a folder that is delivered.
+    """
+    def __init__(self, manifest_path, store_dir=None):
+        self.manifest_path = manifest_path
+        if store_dir is None:
+            store_dir = os.path.join(os.path.dirname(os.path.abspath(manifest_path)), "DocumentStore")
+        self.store_dir = store_dir
+        self._lock = threading.Lock()
+        self.entries = {}
+        # Load the manifest from the previous run if there is one
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r') as manifest:
+                self.entries = json.load(manifest)
+        # Count what the cache saved this run
+        self.skipped = 0
+        self.linked = 0
+        self.transferred = 0
+        self.pruned = 0
+
+    def save(self):
+        """Write the manifest to disk. A temporary file is used so a failed
+        write never corrupts the previous manifest."""
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.manifest_path)), exist_ok=True)
+            temp_path = self.manifest_path + ".tmp"
+            with open(temp_path, 'w') as manifest:
+                json.dump(self.entries, manifest, indent=1, sort_keys=True)
+            os.replace(temp_path, self.manifest_path)
+
+    def lookup(self, key):
+        """Return the manifest entry for key or None if it has never been delivered."""
+        with self._lock:
+            return self.entries.get(key)
+
+    def _store_path(self, sha):
+        """Return the store location for a content hash."""
+        return os.path.join(self.store_dir, sha[:2], sha)
+
+    def available(self, key):
+        """Identify if the content for key can be restored without a transfer."""
+        entry = self.lookup(key)
+        return entry is not None and os.path.exists(self._store_path(entry['sha256']))
+
+    def is_current(self, key, validator):
+        """
+        Identify if the source behind key is unchanged since it was recorded.
+        Every validator value that is not None has to match the manifest and
+        at least one value has to be supplied.
+        """
+        entry = self.lookup(key)
+        if entry is None:
+            return False
+        checks = [(name, value) for name, value in validator.items() if value is not None]
+        return bool(checks) and all(entry.get(name) == value for name, value in checks)
+
+    def restore(self, key, dest):
+        """
+        Make sure the recorded content for key is at dest. If dest already
+        holds the delivered file nothing is done, otherwise it is hard linked
+        from the store. Returns False if the content is not in the store.
+        """
+        entry = self.lookup(key)
+        if entry is None:
+            return False
+        # The file is still where it was delivered
+        if entry.get('dest') == dest and os.path.exists(dest):
+            stat = os.stat(dest)
+            if stat.st_size == entry['size'] and stat.st_mtime_ns == entry.get('dest_mtime'):
+                with self._lock:
+                    self.skipped += 1
+                return True
+        store_path = self._store_path(entry['sha256'])
+        if not os.path.exists(store_path) or os.path.getsize(store_path) != entry['size']:
+            return False
+        self._link(store_path, dest)
+        with self._lock:
+            entry['dest'] = dest
+            entry['dest_mtime'] = os.stat(dest).st_mtime_ns
+            self.linked += 1
+        return True
+
+    @staticmethod
+    def _link(source, dest):
+        """Hard link source to dest, falling back to a copy across drives."""
+        if os.path.exists(dest):
+            os.remove(dest)
+        try:
+            os.link(source, dest)
+        except OSError:
+            shutil.copy2(source, dest)
+
+    def record(self, key, validator, dest):
+        """
+        Record a document that was just delivered to dest, adding its content
+        to the store. validator holds the source values used by is_current.
+        """
+        sha = file_hash(dest)
+        store_path = self._store_path(sha)
+        # Identical content delivered under another key is only stored once
+        if not os.path.exists(store_path):
+            os.makedirs(os.path.dirname(store_path), exist_ok=True)
+            self._link(dest, store_path)
+        entry = dict(validator)
+        entry.update({'sha256': sha, 'size': os.path.getsize(dest), 'dest': dest,
+                      'dest_mtime': os.stat(dest).st_mtime_ns})
+        with self._lock:
+            self.entries[key] = entry
+            self.transferred += 1
+        return entry
+
+    def copy_file(self, source, dest_dir):
+        """
+        Copy a local source file into dest_dir unless the manifest shows the
+        same size and modified time were already delivered. Returns True if
+        the file had to be copied.
+
+        dest may be a hard link into the store, so the copy is written to a
+        temporary file and moved over dest rather than written through it.
+        """
+        key = os.path.normcase(os.path.abspath(source))
+        dest = os.path.join(dest_dir, os.path.basename(source))
+        stat = os.stat(source)
+        validator = {'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+        if self.is_current(key, validator) and self.restore(key, dest):
+            return False
+        temp_path = dest + ".part"
+        shutil.copy2(source, temp_path)
+        os.replace(temp_path, dest)
+        self.record(key, validator, dest)
+        return True
+
+    def prune(self, keys=None):
+        """
+        Drop the manifest entries whose key isn't in keys, if keys is given,
+        and delete the stored content no entry refers to any more. Returns
+        the number of stored files deleted.
+        """
+        with self._lock:
+            if keys is not None:
+                keys = set(keys)
+                self.entries = {key: entry for key, entry in self.entries.items() if key in keys}
+            referenced = {entry['sha256'] for entry in self.entries.values()}
+        removed = 0
+        if not os.path.isdir(self.store_dir):
+            return removed
+        for prefix in os.listdir(self.store_dir):
+            prefix_dir = os.path.join(self.store_dir, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for sha in os.listdir(prefix_dir):
+                if sha not in referenced:
+                    os.remove(os.path.join(prefix_dir, sha))
+                    removed += 1
+            # Hash prefix folders are made again when needed
+            if not os.listdir(prefix_dir):
+                os.rmdir(prefix_dir)
+        with self._lock:
+            self.pruned += removed
+        return removed
+
+    def summary(self):
+        """Return a printable summary of what the cache did this run."""
+        return ("{0} documents transferred, {1} unchanged and skipped, {2} restored by hard link, "
+                "{3} no longer used removed from the store.").format(
+            self.transferred, self.skipped, self.linked, self.pruned)
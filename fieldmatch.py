@@ -0,0 +1,28 @@
+# Project: MO Environmental Updates
+# Create Date: 10/17/2026
+# Purpose: Find the fields two feature classes share, so rows read from one
+#          can be written to the other by the contamination sync and the
+#          cast iron model master point updates
+# Python Version:   3.6
+# -----------------------------------------------------------------------
+# Import modules
+
+# Field types the geodatabase fills in itself
+SYSTEM_TYPES = ('OID', 'GlobalID', 'Geometry', 'Raster', 'Blob')
+
+
+def compare_fields(source_fc, target_fc, key_fields=()):
+    """
+    Return the editable fields found in both feature classes, key fields
+    first. Object id, global id and geometry fields are left out.
+    """
+    import arcpy
+    target = {f.name.upper(): f.name for f in arcpy.ListFields(target_fc)
+              if f.type not in SYSTEM_TYPES and f.editable}
+    fields = []
+    for field in arcpy.ListFields(source_fc):
+        if field.type in SYSTEM_TYPES or field.name.upper() not in target:
+            continue
+        fields.append(field.name)
+    keys = [f for f in key_fields if f in fields]
+    return keys + [f for f in fields if f not in keys]
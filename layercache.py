@@ -0,0 +1,99 @@
+# Project: MO Environmental Updates
+# Create Date: 10/17/2026
+# Purpose: Keep derived source layers (FUSRAP, PCB samples) between runs and
+#          only rebuild them when their upstream data changes
+# Python Version:   3.6
+# -----------------------------------------------------------------------
+# Import modules
+import os
+import json
+import hashlib
+import datetime
+
+
+def files_fingerprint(paths):
+    """Return a sha256 hex digest of the contents of a list of files."""
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(os.path.basename(path).encode('utf-8'))
+        with open(path, 'rb') as in_file:
+            for chunk in iter(lambda: in_file.read(1024 * 1024), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def table_fingerprint(in_fc, where=None):
+    """
+    Return a fingerprint of a feature class: the row count matching where
+    and, when editor tracking is on, the latest edit date. Without editor
+    tracking the object ids are hashed so added and deleted rows still
+    show up.
+    """
+    import arcpy
+    desc = arcpy.Describe(in_fc)
+    edit_field = getattr(desc, 'editedAtFieldName', None) if getattr(desc, 'editorTrackingEnabled', False) else None
+    fields = [edit_field] if edit_field else ['OID@']
+    count = 0
+    latest = None
+    digest = hashlib.sha256()
+    with arcpy.da.SearchCursor(in_fc, fields, where_clause=where) as cursor:
+        for row in cursor:
+            count += 1
+            if edit_field:
+                if row[0] is not None and (latest is None or row[0] > latest):
+                    latest = row[0]
+            else:
+                digest.update(str(row[0]).encode('utf-8'))
+    fingerprint = {'count': count, 'where': where}
+    if edit_field:
+        fingerprint['max_edit'] = latest.isoformat() if isinstance(latest, datetime.datetime) else latest
+    else:
+        fingerprint['oids'] = digest.hexdigest()
+    return fingerprint
+
+
+class LayerCache(object):
+    """
+    A manifest of derived layers and the fingerprint of the sources they
+    were built from.
+
+    Parameters
+    ----------
+    manifest_path : String
+        Path to the json manifest. It is created on the first save.
+    """
+    def __init__(self, manifest_path):
+        self.manifest_path = manifest_path
+        self.entries = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r') as manifest:
+                self.entries = json.load(manifest)
+
+    def save(self):
+        """Write the manifest through a temporary file."""
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, 'w') as manifest:
+            json.dump(self.entries, manifest, indent=1, sort_keys=True)
+        os.replace(temp_path, self.manifest_path)
+
+    def is_fresh(self, name, fingerprint, exists=True):
+        """Identify if the cached layer exists and was built from the same sources."""
+        entry = self.entries.get(name)
+        return exists and entry is not None and entry.get('fingerprint') == fingerprint
+
+    def ensure(self, name, out_fc, fingerprint, build):
+        """
+        Return out_fc, calling build() to recreate it first if it is missing
+        or its fingerprint changed. Returns a tuple of the path and whether
+        it was rebuilt.
+        """
+        import arcpy
+        if self.is_fresh(name, fingerprint, arcpy.Exists(out_fc)):
+            return out_fc, False
+        if arcpy.Exists(out_fc):
+            arcpy.management.Delete(out_fc)
+        build()
+        self.entries[name] = {'fingerprint': fingerprint,
+                              'built': datetime.datetime.now().isoformat()}
+        self.save()
+        return out_fc, True
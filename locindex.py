@@ -0,0 +1,54 @@
+# Project: Spire to Locator Contractor data compilation
+# Create Date: 10/17/2026
+# Purpose: Hashed index of MXLOCATION keys built once per region and shared
+#          by every step that matches service records to locations
+# Python Version:   3.6
+# -----------------------------------------------------------------------
+# Import modules
+import numpy
+import pandas
+
+
+class LocationIndex(object):
+    """
+    A set of location keys backed by a hashed pandas Index. The hash table
+    is built the first time the index is queried and reused by every
+    query after that, unlike Series.isin which rebuilds it on every call.
+
+    Parameters
+    ----------
+    keys : array like
+        Location keys. Duplicates are dropped.
+    """
+    def __init__(self, keys):
+        self.keys = pandas.Index(pandas.unique(numpy.asarray(keys, dtype=object)), dtype=object)
+
+    @classmethod
+    def from_table(cls, in_fc, field):
+        """
+        Build an index from one attribute field of a feature class or
+        shapefile. Only that column is read, the geometry is never loaded.
+        """
+        import arcpy
+        values = arcpy.da.TableToNumPyArray(in_fc, [field], skip_nulls=True)[field]
+        return cls(values)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def contains(self, values):
+        """Return a boolean numpy array marking which values are in the index."""
+        values = pandas.Index(numpy.asarray(values, dtype=object), dtype=object)
+        return self.keys.get_indexer(values) >= 0
+
+    def select(self, df, field):
+        """Return the rows of df whose field value is in the index."""
+        return df[self.contains(df[field])]
+
+    def partition(self, df, field):
+        """
+        Split df into rows whose field value is in the index and rows whose
+        value is not, using a single lookup.
+        """
+        mask = self.contains(df[field])
+        return df[mask], df[~mask]
@@ -0,0 +1,162 @@
+# Project: MO Environmental Updates
+# Create Date: 10/17/2026
+# Purpose: Join parcels to nearby contamination sites with a spatial index
+#          built on the sites and the parcels read a chunk at a time
+# Python Version:   3.6
+# -----------------------------------------------------------------------
+# Import modules
+import os
+from itertools import islice
+import numpy
+import shapely
+from shapely import STRtree
+
+# Meters in a US survey foot and an international foot are close enough
+# that the international foot is used, as the Feet linear unit does
+METERS_PER_FOOT = 0.3048
+
+# arcpy field types to the names AddField takes
+FIELD_TYPES = {'String': 'TEXT', 'Integer': 'LONG', 'SmallInteger': 'SHORT',
+               'Double': 'DOUBLE', 'Single': 'FLOAT', 'Date': 'DATE',
+               'BigInteger': 'BIGINTEGER', 'GUID': 'GUID'}
+
+
+def first_matches(parcel_idx, site_idx):
+    """
+    Reduce parcel/site pairs to one row per parcel, the way a one to one
+    spatial join does. Returns the parcel indexes, the lowest matching site
+    index of each and the number of sites each parcel matched.
+    """
+    if len(parcel_idx) == 0:
+        empty = numpy.array([], dtype=numpy.intp)
+        return empty, empty, empty
+    order = numpy.lexsort((site_idx, parcel_idx))
+    parcel_idx = parcel_idx[order]
+    site_idx = site_idx[order]
+    parcels, starts, counts = numpy.unique(parcel_idx, return_index=True, return_counts=True)
+    return parcels, site_idx[starts], counts
+
+
+class SiteLayer(object):
+    """
+    The sites of one contamination layer held in memory for a join. The
+    spatial index is built on the sites, which are far fewer than the
+    parcels. Its bounding boxes are checked first and only those
+    candidates have their exact distance measured.
+
+    Parameters
+    ----------
+    geoms : array like
+        Shapely site geometries in the parcel coordinate system.
+    rows : list
+        Attribute values of each site, in the order of fields.
+    fields : list
+        Names of the site attribute fields.
+    """
+    def __init__(self, geoms, rows, fields):
+        self.geoms = numpy.asarray(geoms, dtype=object)
+        self.rows = rows
+        self.fields = list(fields)
+        self.tree = STRtree(self.geoms) if len(self.geoms) else None
+
+    def match(self, parcel_geoms, distance):
+        """Return the parcel indexes, first site index and match count for a chunk."""
+        if self.tree is None or len(parcel_geoms) == 0:
+            empty = numpy.array([], dtype=numpy.intp)
+            return empty, empty, empty
+        pairs = self.tree.query(parcel_geoms, predicate='dwithin', distance=distance)
+        return first_matches(pairs[0], pairs[1])
+
+
+def join_chunks(parcel_chunks, layers, distance):
+    """
+    Join chunks of parcels to every site layer in one pass.
+
+    parcel_chunks yields tuples of a list of parcel ids and a list of
+    parcel WKB geometries. Returns one list per layer of
+    (parcel id, parcel wkb, join count, site row) tuples.
+    """
+    joined = [[] for _ in layers]
+    for ids, wkbs in parcel_chunks:
+        geoms = shapely.from_wkb(numpy.array(wkbs, dtype=object))
+        for out, layer in zip(joined, layers):
+            parcels, sites, counts = layer.match(geoms, distance)
+            for parcel, site, count in zip(parcels, sites, counts):
+                out.append((ids[parcel], wkbs[parcel], int(count), layer.rows[site]))
+    return joined
+
+
+def _site_fields(site_fc):
+    """Return the attribute fields of a site feature class."""
+    import arcpy
+    return [f for f in arcpy.ListFields(site_fc)
+            if f.type not in ('OID', 'GlobalID', 'Geometry', 'Blob', 'Raster')
+            and f.name.upper() not in ('SHAPE_LENGTH', 'SHAPE_AREA')]
+
+
+def _read_sites(site_fc, spatial_reference):
+    """Read a site feature class into a SiteLayer in the parcel coordinate system."""
+    import arcpy
+    fields = [f.name for f in _site_fields(site_fc)]
+    geoms = []
+    rows = []
+    with arcpy.da.SearchCursor(site_fc, ['SHAPE@WKB'] + fields,
+                               spatial_reference=spatial_reference) as cursor:
+        for row in cursor:
+            if row[0] is None:
+                continue
+            geoms.append(row[0])
+            rows.append(row[1:])
+    return SiteLayer(shapely.from_wkb(numpy.array(geoms, dtype=object)), rows, fields)
+
+
+def _parcel_chunks(parcel_fc, chunk_size):
+    """Yield parcel object ids and WKB geometries chunk_size rows at a time."""
+    import arcpy
+    with arcpy.da.SearchCursor(parcel_fc, ['OID@', 'SHAPE@WKB']) as cursor:
+        rows = (row for row in cursor if row[1] is not None)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                return
+            yield [row[0] for row in chunk], [bytes(row[1]) for row in chunk]
+
+
+def join_parcels(parcel_fc, site_fcs, out_fc, distance_feet=50, chunk_size=50000):
+    """
+    Create out_fc holding every parcel within distance_feet of a site in
+    any of site_fcs, with the attributes of the site it joined to.
+
+    This gives the same rows as a JOIN_ONE_TO_ONE, KEEP_COMMON,
+    WITHIN_A_DISTANCE SpatialJoin against each site layer followed by a
+    Merge in site_fcs order. The output has the site fields of every layer,
+    Join_Count and TARGET_FID. Only chunk_size parcels are held in memory
+    at a time. Returns the number of rows written.
+    """
+    import arcpy
+    spatial_reference = arcpy.Describe(parcel_fc).spatialReference
+    meters_per_unit = spatial_reference.metersPerUnit or METERS_PER_FOOT
+    distance = distance_feet * METERS_PER_FOOT / meters_per_unit
+    layers = [_read_sites(site_fc, spatial_reference) for site_fc in site_fcs]
+    # Build the merged schema, first layer wins when a field is in both
+    arcpy.management.CreateFeatureclass(os.path.dirname(out_fc), os.path.basename(out_fc),
+                                        "POLYGON", spatial_reference=spatial_reference)
+    arcpy.management.AddField(out_fc, "Join_Count", "LONG")
+    arcpy.management.AddField(out_fc, "TARGET_FID", "LONG")
+    added = set()
+    for site_fc in site_fcs:
+        for field in _site_fields(site_fc):
+            if field.name.upper() in added:
+                continue
+            added.add(field.name.upper())
+            arcpy.management.AddField(out_fc, field.name, FIELD_TYPES.get(field.type, 'TEXT'),
+                                      field_length=field.length if field.type == 'String' else None,
+                                      field_alias=field.aliasName)
+    joined = join_chunks(_parcel_chunks(parcel_fc, chunk_size), layers, distance)
+    written = 0
+    for layer, rows in zip(layers, joined):
+        with arcpy.da.InsertCursor(out_fc, ['SHAPE@WKB', 'Join_Count', 'TARGET_FID'] + layer.fields) as cursor:
+            for parcel_id, wkb, count, site_row in rows:
+                cursor.insertRow([wkb, count, parcel_id] + list(site_row))
+                written += 1
+    return written
@@ -0,0 +1,91 @@
+# Project: Spire to Locator Contractor data compilation
+# Create Date: 10/17/2026
+# Purpose: Run the per-region pipelines in separate worker processes and
+#          merge their logs back into the main log
+# Python Version:   3.6
+# -----------------------------------------------------------------------
+# Import modules
+import os
+import sys
+import time
+import datetime
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+
+def region_log_path(log_dir, region):
+    """Return the path of the temporary log written by a region worker."""
+    return os.path.join(log_dir, "Log_{0}.txt".format(region))
+
+
+def run_logged(region, func, ctx, log_dir):
+    """
+    Run func(ctx) for a region, writing start, finish, anything func
+    returns and any errors to the region's own log file. Returns a tuple of
+    the region, whether it succeeded and the number of seconds it took. Errors are logged rather
+    than raised so one region failing doesn't stop the others.
+    """
+    start = time.time()
+    with open(region_log_path(log_dir, region), 'w') as log:
+        log.write("Region {0} started: {1}\n".format(region, datetime.datetime.now()))
+        try:
+            result = func(ctx)
+        except Exception:
+            # Grab the traceback information
+            pymsg = "PYTHON ERRORS:\nTraceback info:\n" + traceback.format_exc()
+            log.write(pymsg + "\n")
+            # Send arcpy errors to the log if arcpy is in use
+            if 'arcpy' in sys.modules:
+                log.write("ArcPy ERRORS:\n" + sys.modules['arcpy'].GetMessages(2) + "\n")
+            print("Region {0} failed.".format(region))
+            print(pymsg)
+            ok = False
+        else:
+            ok = True
+            # Region functions can hand back a line for the log
+            if result:
+                log.write(str(result) + "\n")
+        took = time.time() - start
+        log.write("Region {0} {1} after {2:.1f} seconds.\n".format(
+            region, "finished" if ok else "FAILED", took))
+    return region, ok, took
+
+
+def run_regions(jobs, log, log_dir, workers=None):
+    """
+    Run region pipelines side by side and merge their logs into log.
+
+    Parameters
+    ----------
+    jobs : list
+        A list of (region, func, ctx) tuples. func must be a module level
+        function so it can be sent to a worker process, and ctx is the
+        single argument passed to it.
+    log : file
+        The open main log file. Each region log is appended to it in job
+        order once every region is done.
+    log_dir : String
+        Folder the temporary region logs are written to.
+    workers : int
+        Number of worker processes. Defaults to one per region. With 1
+        worker the regions are run one after another in this process.
+
+    Returns a list of the regions that failed.
+    """
+    workers = len(jobs) if workers is None else max(1, int(workers))
+    if workers == 1:
+        results = [run_logged(region, func, ctx, log_dir) for region, func, ctx in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(run_logged, region, func, ctx, log_dir)
+                       for region, func, ctx in jobs]
+            results = [future.result() for future in futures]
+    # Merge the region logs into the main log
+    for region, ok, took in results:
+        reg_log = region_log_path(log_dir, region)
+        with open(reg_log, 'r') as reg_file:
+            log.write(reg_file.read())
+        os.remove(reg_log)
+        print("Region {0} {1} in {2:.1f} seconds.".format(region, "finished" if ok else "failed", took))
+    log.write("\n")
+    return [region for region, ok, took in results if not ok]
@@ -0,0 +1,149 @@
+# Project: Spire to Locator Contractor data compilation
+# Create Date: 10/17/2026
+# Purpose: Export SDE feature classes to the locator shapefiles from a list
+#          of declarative export specs
+# ArcGIS Version:   Pro 2.8
+# Python Version:   3.6
+# -----------------------------------------------------------------------
+# Import modules
+import os
+from concurrent.futures import ProcessPoolExecutor
+import arcpy
+
+
+class ExportSpec(object):
+    """
+    Describes one shapefile sent to the locator company.
+
+    Parameters
+    ----------
+    name : String
+        Name of the output shapefile without the .shp extension.
+    source : String
+        Full path of the SDE feature class to export.
+    keep_fields : list
+        Names of the fields to keep. OID, geometry and shape fields are
+        always kept.
+    where : String
+        Optional SQL query to take only certain features from the source.
+    region : String
+        The Spire area the shapefile belongs to: SpireAL, MoEast or MoWest.
+        This is also the name of the folder it is created in.
+    """
+    def __init__(self, name, source, keep_fields, where='#', region=None):
+        self.name = name
+        self.source = source
+        self.keep_fields = list(keep_fields)
+        self.where = where
+        self.region = region
+
+    def __repr__(self):
+        return "ExportSpec({0!r}, {1!r}, region={2!r})".format(self.name, self.source, self.region)
+
+
+def _export_worker(out_dir, spec, mapping):
+    """
+    Create the shapefile for one spec in a worker process, with the field
+    mappings handed over as a string, and return its path.
+    """
+    fmap = arcpy.FieldMappings()
+    fmap.loadFromString(mapping)
+    return ExportRunner(out_dir).copy(spec, fmap)
+
+
+class ExportRunner(object):
+    """
+    Creates shapefiles from ExportSpecs under out_dir/<region>.
+
+    The field list and the field mappings of each source feature class are
+    read once and cached, so exporting several layers from the same source
+    doesn't describe it again. Every export works on its own clone of the
+    cached mappings. arcpy isn't thread safe, so exports run side by side in
+    worker processes, each with its own arcpy, and get their mappings as a
+    string. Output paths are returned rather than kept in globals.
+
+    Parameters
+    ----------
+    out_dir : String
+        Folder holding a sub folder of shapefiles for each region.
+    workers : int
+        Number of worker processes exporting at once. With 1 worker the
+        exports run one after another in this process.
+    """
+    def __init__(self, out_dir, workers=1):
+        self.out_dir = out_dir
+        self.workers = max(1, int(workers))
+        self._schemas = {}
+        self._field_maps = {}
+
+    def region_path(self, region):
+        """Return the region's shapefile folder, creating it if needed."""
+        if region is None:
+            raise ValueError("A region is needed to know where to create the shapefile.")
+        shp_path = os.path.join(self.out_dir, region)
+        if not os.path.exists(shp_path):
+            os.makedirs(shp_path, exist_ok=True)
+            print("No folder for shapefiles. A directory has been created at {0}.".format(shp_path))
+        return shp_path
+
+    def field_mappings(self, source, keep_fields):
+        """
+        Return a new field mappings object for source holding only the
+        fields in keep_fields plus the required OID, geometry and shape
+        fields. It is cloned from the source's cached field mappings.
+        """
+        # Get all fields and the full field mappings one time per source
+        if source not in self._field_maps:
+            self._schemas[source] = [(f.name, f.type) for f in arcpy.ListFields(source)]
+            # The input FC is added to an empty field mapping object
+            table_map = arcpy.FieldMappings()
+            table_map.addTable(source)
+            self._field_maps[source] = table_map.exportToString()
+        fmap = arcpy.FieldMappings()
+        fmap.loadFromString(self._field_maps[source])
+        # Clean up field map based on keep list
+        for fname, ftype in self._schemas[source]:
+            # Avoid required OID and Geometry fields as well as SHAPE field
+            if ftype not in ('OID', 'Geometry') and 'shape' not in fname.lower():
+                # if the field name isn't something set to be kept,
+                # delete it from the field mappings object
+                if fname not in keep_fields:
+                    fmap.removeFieldMap(fmap.findFieldMapIndex(fname))
+        return fmap
+
+    def copy(self, spec, fmap):
+        """Create the shapefile for one spec with the field mappings fmap and return its path."""
+        shp_path = self.region_path(spec.region)
+        # Delete any existing shapefile to avoid overwrite issues
+        does_ex = os.path.join(shp_path, spec.name + ".shp")
+        if arcpy.Exists(does_ex):
+            arcpy.Delete_management(does_ex)
+        # Create the new shapefile to be sent to locator company
+        result = arcpy.conversion.FeatureClassToFeatureClass(spec.source, shp_path, spec.name,
+                                                             spec.where, fmap)
+        new_shp = str(result.getOutput(0))
+        print("Shapefile has been created in {0}.".format(new_shp))
+        return new_shp
+
+    def export(self, spec):
+        """Create the shapefile for one spec and return its path."""
+        return self.copy(spec, self.field_mappings(spec.source, spec.keep_fields))
+
+    def run(self, specs):
+        """
+        Export every spec and return a dictionary of shapefile name to
+        output path. Exports run in worker processes when workers is more
+        than 1.
+        """
+        if self.workers == 1 or len(specs) < 2:
+            paths = [self.export(spec) for spec in specs]
+        else:
+            # Folders are made here so the workers don't race to make them
+            for region in set(spec.region for spec in specs):
+                self.region_path(region)
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                futures = [pool.submit(_export_worker, self.out_dir, spec,
+                                       self.field_mappings(spec.source, spec.keep_fields).exportToString())
+                           for spec in specs]
+                paths = [future.result() for future in futures]
+        return {spec.name: path for spec, path in zip(specs, paths)}
@@ -0,0 +1,118 @@
+# Project: MO Environmental Updates
+# Create Date: 10/17/2026
+# Purpose: Dissolve the parcel/site join by SITENAME in process, keeping the
+#          first value of each kept field under its own name
+# Python Version:   3.6
+# -----------------------------------------------------------------------
+# Import modules
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy
+import pandas
+import shapely
+import geopandas
+
+# Fields kept from the first feature of each site by the contamination dissolve
+FIRST_FIELDS = ["AULID", "OUID", "SMARSID", "FEDERALID", "COUNTY", "DNRPROGRAM", "SITEOWN"]
+
+
+def group_index(keys):
+    """
+    Return the order that sorts keys into groups and the start of each
+    group in that order. The sort is stable so the first row of a group is
+    its first row in the input. Null keys form one group, as Dissolve does.
+    """
+    codes, uniques = pandas.factorize(pandas.Series(keys, dtype=object), use_na_sentinel=False)
+    order = numpy.argsort(codes, kind='stable')
+    if len(codes) == 0:
+        return order, numpy.array([], dtype=numpy.intp)
+    sorted_codes = codes[order]
+    starts = numpy.flatnonzero(numpy.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    return order, starts
+
+
+def _union_groups(geoms, bounds):
+    """Union each slice of geoms given by a list of (start, end) pairs."""
+    return [shapely.union_all(geoms[start:end]) for start, end in bounds]
+
+
+def dissolve_first(gdf, by, first_fields=FIRST_FIELDS, workers=1, multi_part=True):
+    """
+    Dissolve a GeoDataFrame on the by field.
+
+    Rows are sorted into groups once, each group's geometries are merged
+    with shapely.union_all and the first value of each field in
+    first_fields is taken from the group's first row. The fields keep their
+    names, there is no FIRST_ prefix. Groups are split between workers
+    threads, shapely releases the GIL while it unions.
+
+    Returns a GeoDataFrame with by, first_fields and geometry, one row per
+    group in the order the groups first appear.
+    """
+    geoms = numpy.asarray(gdf.geometry.values, dtype=object)
+    order, starts = group_index(gdf[by].to_numpy(dtype=object))
+    ends = numpy.r_[starts[1:], len(order)]
+    sorted_geoms = geoms[order]
+    bounds = list(zip(starts.tolist(), ends.tolist()))
+    if workers > 1 and len(bounds) > workers:
+        size = -(-len(bounds) // workers)
+        parts = [bounds[i:i + size] for i in range(0, len(bounds), size)]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            unions = [geom for part in pool.map(lambda p: _union_groups(sorted_geoms, p), parts)
+                      for geom in part]
+    else:
+        unions = _union_groups(sorted_geoms, bounds)
+    unions = numpy.asarray(unions, dtype=object) if unions else numpy.array([], dtype=object)
+    if not multi_part and len(unions):
+        # Single part output has a row for each part of a group
+        first_rows = order[starts]
+        parts, part_idx = shapely.get_parts(unions, return_index=True)
+        first_rows = first_rows[part_idx]
+        unions = parts
+    else:
+        first_rows = order[starts]
+    result = gdf.iloc[first_rows][[by] + list(first_fields)].reset_index(drop=True)
+    return geopandas.GeoDataFrame(result, geometry=geopandas.GeoSeries(unions, crs=gdf.crs))
+
+
+def read_features(in_fc, fields):
+    """Read fields and geometry of a feature class into a GeoDataFrame."""
+    import arcpy
+    rows = []
+    wkbs = []
+    with arcpy.da.SearchCursor(in_fc, ['SHAPE@WKB'] + list(fields)) as cursor:
+        for row in cursor:
+            wkbs.append(None if row[0] is None else bytes(row[0]))
+            rows.append(row[1:])
+    geometry = shapely.from_wkb(numpy.array(wkbs, dtype=object))
+    return geopandas.GeoDataFrame(pandas.DataFrame.from_records(rows, columns=list(fields)),
+                                  geometry=geopandas.GeoSeries(geometry))
+
+
+def dissolve_fc(in_fc, out_fc, by="SITENAME", first_fields=FIRST_FIELDS, workers=None):
+    """
+    Dissolve a feature class on by into out_fc, in place of a Dissolve with
+    FIRST statistics followed by renaming the FIRST_ fields. out_fc gets the
+    fields of in_fc with their own names and aliases. Returns the number of
+    features written.
+    """
+    import arcpy
+    from parceljoin import FIELD_TYPES
+    if workers is None:
+        workers = os.cpu_count() or 1
+    keep = [by] + list(first_fields)
+    in_fields = {f.name: f for f in arcpy.ListFields(in_fc)}
+    dissolved = dissolve_first(read_features(in_fc, keep), by, first_fields, workers)
+    if arcpy.Exists(out_fc):
+        arcpy.management.Delete(out_fc)
+    arcpy.management.CreateFeatureclass(os.path.dirname(out_fc), os.path.basename(out_fc), "POLYGON",
+                                        spatial_reference=arcpy.Describe(in_fc).spatialReference)
+    arcpy.management.AddFields(out_fc, [[name, FIELD_TYPES.get(in_fields[name].type, 'TEXT'),
+                                         in_fields[name].aliasName,
+                                         in_fields[name].length if in_fields[name].type == 'String' else None]
+                                        for name in keep])
+    wkbs = shapely.to_wkb(numpy.asarray(dissolved.geometry.values))
+    with arcpy.da.InsertCursor(out_fc, ['SHAPE@WKB'] + keep) as cursor:
+        for wkb, row in zip(wkbs, dissolved[keep].itertuples(index=False)):
+            cursor.insertRow([wkb] + [None if pandas.isna(v) else v for v in row])
+    return len(dissolved)
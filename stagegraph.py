@@ -0,0 +1,245 @@
+# Project: Spire to Locator Contractor data compilation / MO Environmental Updates
+# Create Date: 10/17/2026
+# Purpose: Run a script as a graph of stages with persisted checkpoints so a
+#          rerun skips finished stages and resumes at the first failure
+# Python Version:   3.6
+# -----------------------------------------------------------------------
+# Import modules
+import os
+import json
+import hashlib
+import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import stagestats
+
+
+def _file_state(path):
+    """Return the size and modified time of a file, or None if it is missing."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class Stage(object):
+    """
+    One step of a run.
+
+    Parameters
+    ----------
+    name : String
+        Unique name of the stage, used for its checkpoint.
+    func : function
+        Called with the stage's stagestats.StageRecord, which it can set row
+        and byte counts on, to run the stage. Its return value is kept
+        in the checkpoint, so it has to be json serializable, and is handed
+        back without calling func when the stage is skipped.
+    deps : list
+        Names of the stages that have to finish first.
+    outputs : list
+        Paths the stage creates. The stage is run again if any are missing.
+    inputs : list
+        Files the stage reads. The stage is run again if their size or
+        modified time changes.
+    params : dict
+        Settings the stage depends on. The stage is run again if they change.
+    always : bool
+        Run the stage every time, for example connections and emails. It
+        isn't checkpointed, so its return value stands in for its finish
+        time in the fingerprints of the stages depending on it. A stage
+        that rebuilds something only when needed should return a value
+        that changes when it does.
+    """
+    def __init__(self, name, func, deps=(), outputs=(), inputs=(), params=None, always=False):
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.outputs = list(outputs)
+        self.inputs = list(inputs)
+        self.params = params or {}
+        self.always = always
+
+    def __repr__(self):
+        return "Stage({0!r}, deps={1!r})".format(self.name, self.deps)
+
+
+class StageGraph(object):
+    """
+    Runs stages in dependency order and keeps a checkpoint of each stage
+    that finishes.
+
+    A stage is skipped when its checkpoint is from the same run key, its
+    fingerprint (params, input file states and the checkpoints of the
+    stages it depends on) is unchanged and its outputs still exist. After a
+    failure the next run with the same run key skips everything that
+    finished and starts again from the stage that failed.
+
+    Parameters
+    ----------
+    checkpoint_path : String
+        Json file holding the checkpoints.
+    run_key : String
+        Checkpoints from another run key are ignored, so for example a date
+        makes a rerun on the same day resume while the next night starts
+        fresh.
+    exists : function
+        Used to check that outputs exist. Pass arcpy.Exists for
+        geodatabase outputs.
+    report : stagestats.RunReport
+        Optional run report each stage is recorded in.
+    workers : int
+        Number of stages run at once. Stages whose dependencies have
+        finished are started in the order they were added, each in its own
+        thread, so stages that wait on the network can overlap. Stages that
+        share something that isn't thread safe, such as arcpy, have to guard
+        it themselves.
+    """
+    def __init__(self, checkpoint_path, run_key=None, exists=os.path.exists, report=None, workers=1):
+        self.checkpoint_path = checkpoint_path
+        self.run_key = run_key
+        self.exists = exists
+        self.report = report
+        self.workers = max(1, int(workers))
+        self.stages = []
+        self._by_name = {}
+        self.results = {}
+        self.checkpoints = {}
+        if os.path.exists(checkpoint_path):
+            try:
+                with open(checkpoint_path, 'r') as checkpoint_file:
+                    saved = json.load(checkpoint_file)
+            except ValueError:
+                saved = {}
+            if saved.get('run_key') == run_key:
+                self.checkpoints = saved.get('stages', {})
+
+    def add(self, name, func, deps=(), outputs=(), inputs=(), params=None, always=False):
+        """Add a stage. Stages must be added after the stages they depend on."""
+        known = {stage.name for stage in self.stages}
+        missing = [dep for dep in deps if dep not in known]
+        if missing:
+            raise ValueError("Stage {0} depends on unknown stages {1}.".format(name, missing))
+        if name in known:
+            raise ValueError("Stage {0} was added twice.".format(name))
+        stage = Stage(name, func, deps, outputs, inputs, params, always)
+        self.stages.append(stage)
+        self._by_name[name] = stage
+        return stage
+
+    def save(self):
+        """Write the checkpoints through a temporary file."""
+        temp_path = self.checkpoint_path + ".tmp"
+        with open(temp_path, 'w') as checkpoint_file:
+            json.dump({'run_key': self.run_key, 'stages': self.checkpoints}, checkpoint_file,
+                      indent=1, sort_keys=True, default=str)
+        os.replace(temp_path, self.checkpoint_path)
+
+    def fingerprint(self, stage):
+        """Return the fingerprint of a stage's params, inputs and dependencies."""
+        state = {'params': stage.params,
+                 'inputs': {path: _file_state(path) for path in stage.inputs},
+                 'deps': {dep: self._dep_state(dep) for dep in stage.deps}}
+        return hashlib.sha256(json.dumps(state, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def _dep_state(self, name):
+        """
+        Return what a stage's dependency adds to its fingerprint: the finish
+        time of its checkpoint, or for an always stage the result it
+        returned this run.
+        """
+        if self._by_name[name].always:
+            return self.results.get(name)
+        return self.checkpoints.get(name, {}).get('finished')
+
+    def is_current(self, stage):
+        """Identify if a stage's checkpoint lets it be skipped."""
+        if stage.always:
+            return False
+        checkpoint = self.checkpoints.get(stage.name)
+        if checkpoint is None or checkpoint.get('fingerprint') != self.fingerprint(stage):
+            return False
+        return all(self.exists(path) for path in stage.outputs)
+
+    def record(self, stage, result):
+        """Checkpoint a stage that just finished."""
+        self.results[stage.name] = result
+        if stage.always:
+            return
+        # Dependencies are checkpointed first, so their finish times are in
+        # the fingerprint
+        self.checkpoints[stage.name] = {'fingerprint': self.fingerprint(stage),
+                                        'finished': datetime.datetime.now().isoformat(),
+                                        'result': result}
+        self.save()
+
+    def _skip(self, stage):
+        """Hand back a skipped stage's saved result."""
+        self.results[stage.name] = self.checkpoints[stage.name].get('result')
+        print("Stage {0} is unchanged since {1} and was skipped.".format(
+            stage.name, self.checkpoints[stage.name].get('finished')))
+        if self.report is not None:
+            with self.report.stage(stage.name) as record:
+                record.status = 'skipped'
+
+    def _run_stage(self, stage):
+        """Run one stage, recording it in the report if there is one."""
+        if self.report is None:
+            return stage.func(stagestats.StageRecord(stage.name))
+        with self.report.stage(stage.name) as record:
+            return stage.func(record)
+
+    def invalidate(self, name):
+        """Drop a stage's checkpoint so it runs again."""
+        if self.checkpoints.pop(name, None) is not None:
+            self.save()
+
+    def run(self):
+        """
+        Run every stage that isn't current once its dependencies have
+        finished. A failing stage stops new stages from starting, the ones
+        already running are left to finish and are checkpointed, and the
+        first error is raised. Returns the dictionary of stage results.
+        """
+        pending = list(self.stages)
+        running = {}
+        done = set()
+        error = None
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while pending or running:
+                # Start ready stages in the order they were added. Skipped
+                # stages count as done straight away, which can make the
+                # stages after them ready in the same pass.
+                for stage in list(pending):
+                    if error is not None or len(running) >= self.workers:
+                        break
+                    if not all(dep in done for dep in stage.deps):
+                        continue
+                    pending.remove(stage)
+                    if self.is_current(stage):
+                        self._skip(stage)
+                        done.add(stage.name)
+                    else:
+                        running[pool.submit(self._run_stage, stage)] = stage
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    stage = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        error = error or e
+                        continue
+                    # Checkpoints are only written from this thread
+                    self.record(stage, result)
+                    done.add(stage.name)
+        if error is not None:
+            raise error
+        return self.results
+
+    def clear(self):
+        """Remove the checkpoint file, for example once the whole run succeeded."""
+        self.checkpoints = {}
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
@@ -0,0 +1,156 @@
+# Project: Spire to Locator Contractor data compilation / MO Environmental Updates
+# Create Date: 10/17/2026
+# Purpose: Record wall time, cpu time, peak memory, row counts and bytes
+#          moved for each stage of a run as a json lines report
+# Python Version:   3.6
+# -----------------------------------------------------------------------
+# Import modules
+import os
+import sys
+import json
+import time
+import uuid
+import threading
+import datetime
+import functools
+from contextlib import contextmanager
+
+
+def peak_rss():
+    """
+    Return the peak resident memory of this process in bytes, or None if
+    it can't be read. This is the peak since the process started, so a
+    stage's figure includes every stage before it.
+    """
+    if sys.platform == 'win32':
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                        ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                        ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                        ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        handle = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+            return int(counters.PeakWorkingSetSize)
+        return None
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return int(peak if sys.platform == 'darwin' else peak * 1024)
+
+
+class StageRecord(object):
+    """
+    Figures for one stage. rows_in, rows_out and bytes can be set by the
+    code inside the stage, the timings are filled in when it ends. cpu is
+    the cpu time of the whole process while the stage ran, so it includes
+    the thread pools the stage runs, such as downloads and dissolves, and
+    also the work of any stages running at the same time. The cpu of stages
+    that overlapped adds up to more than the run used.
+    """
+    def __init__(self, name, rows_in=None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.bytes = None
+        self.status = 'ok'
+        self.error = None
+        self.wall = None
+        self.cpu = None
+        self.peak_rss = None
+
+    def as_dict(self):
+        return {'stage': self.name, 'status': self.status, 'wall_s': self.wall, 'cpu_s': self.cpu,
+                'peak_rss': self.peak_rss, 'rows_in': self.rows_in, 'rows_out': self.rows_out,
+                'bytes': self.bytes, 'error': self.error}
+
+
+class RunReport(object):
+    """
+    Appends one json line per stage to a report file. Every line holds the
+    run id, so the stages of one night's run can be grouped and compared
+    with the night before.
+
+    Parameters
+    ----------
+    path : String
+        The json lines report file. Lines are appended to it.
+    script : String
+        Name of the script the stages belong to.
+    run_id : String
+        Id shared by every line of the run. A new one is made if not given,
+        region worker processes are handed the main process's id.
+    region : String
+        Optional region the stages ran for.
+    """
+    def __init__(self, path, script, run_id=None, region=None):
+        self.path = path
+        self.script = script
+        self.run_id = run_id or uuid.uuid4().hex
+        self.region = region
+        self.records = []
+        # Stages can finish in several threads at once
+        self._write_lock = threading.Lock()
+
+    def write(self, record):
+        """Append a finished stage to the report."""
+        line = dict(record.as_dict(), run_id=self.run_id, script=self.script, region=self.region,
+                    finished=datetime.datetime.now().isoformat(timespec='seconds'))
+        with self._write_lock:
+            with open(self.path, 'a') as report:
+                report.write(json.dumps(line) + "\n")
+            self.records.append(record)
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        """
+        Time the code in the with block as a stage. Yields the StageRecord so
+        row and byte counts can be set. A failing stage is recorded with its
+        error before the error is raised again.
+        """
+        record = StageRecord(name, rows_in)
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield record
+        except BaseException as e:
+            record.status = 'error'
+            record.error = "{0}: {1}".format(type(e).__name__, e)
+            raise
+        finally:
+            record.wall = round(time.perf_counter() - wall, 3)
+            record.cpu = round(time.process_time() - cpu, 3)
+            record.peak_rss = peak_rss()
+            self.write(record)
+
+    def timed(self, name=None):
+        """Decorator recording each call of a function as a stage."""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.stage(name or func.__name__):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def merge(self, other_path):
+        """Append the lines of another report file, such as a region worker's, and delete it."""
+        if not os.path.exists(other_path):
+            return
+        with open(other_path, 'r') as other, open(self.path, 'a') as report:
+            report.write(other.read())
+        os.remove(other_path)
+
+    def summary(self):
+        """Return a printable line per stage recorded by this report."""
+        return "\n".join("{0}: {1} in {2:.1f}s (cpu {3:.1f}s), rows in {4}, rows out {5}".format(
+            r.name, r.status, r.wall, r.cpu, r.rows_in, r.rows_out) for r in self.records)
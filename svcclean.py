@@ -0,0 +1,82 @@
+# Project: Spire to Locator Contractor data compilation
+# Create Date: 10/17/2026
+# Purpose: Clean the service card export table with vectorized string
+#          operations so no python code runs per row
+# Python Version:   3.6
+# -----------------------------------------------------------------------
+# Import modules
+import numpy
+
+# Literal replacements made to the Location and URLName fields. These were
+# previously run as regular expressions over every column of the table.
+URL_FIXES = [('doclocation', 'server'), ('#', '%23'), ('FieldBook', 'Field Book'), ('\\', '/')]
+# Image folder prefixes that are stripped from document names
+PREFIX_PAT = '|'.join(["OHBUpoad_", "MaximoDrawers123_Images_", "FY19_Maximo_Images_"])
+# Anything in front of the path of a url (scheme and network location)
+URL_HEAD_PAT = r'^(?:[A-Za-z][A-Za-z0-9+.\-]*:)?(?://[^/?#]*)?'
+# Query string and fragment of a url
+URL_TAIL_PAT = r'[?#].*$'
+# Parameters on the last segment of a url path
+URL_PARAMS_PAT = r';[^/]*$'
+
+
+def clean_service_urls(svc_df):
+    """
+    Takes the service card table read from the export and returns a new
+    dataframe, in the same row order, where the Location and URLName fields
+    have been cleaned and a Document field holds the last segment of the
+    URLName. Only the Location and URLName fields are touched.
+    """
+    cleaned = {}
+    for column in ['Location', 'URLName']:
+        values = svc_df[column]
+        # Clean up urls that contain incorrect sections
+        for old, new in URL_FIXES:
+            values = values.str.replace(old, new, regex=False)
+        cleaned[column] = values
+    # Drop everything after a ** in the url
+    cleaned['URLName'] = cleaned['URLName'].str.split('**', n=1, regex=False).str[0]
+    # The document is whatever follows the last forward slash
+    cleaned['Document'] = cleaned['URLName'].str.rsplit('/', n=1).str[-1]
+    return svc_df.assign(**cleaned)
+
+
+def service_card_documents(svc_df):
+    """
+    Takes a dataframe from clean_service_urls and returns a copy where
+    service card urls are named after the last two parts of their url path
+    (to account for duplicate names) and image folder prefixes are removed
+    from every document name. Row order is preserved.
+    """
+    urls = svc_df['URLName']
+    # Replace Document where URLName contains 'servicecards'
+    svc_mask = urls.str.contains('servicecards', regex=False).to_numpy(dtype=bool)
+    documents = svc_df['Document'].copy()
+    if svc_mask.any():
+        # Reduce the masked urls down to just their path the same way urlparse does
+        paths = (urls[svc_mask].str.replace(URL_HEAD_PAT, '', regex=True)
+                 .str.replace(URL_TAIL_PAT, '', regex=True)
+                 .str.replace(URL_PARAMS_PAT, '', regex=True))
+        # Drop the leading character and the first two folders then join the
+        # remaining folders with an underscore
+        documents.loc[svc_mask] = (paths.str[1:].str.extract(r'^(?:[^/]*/){2}(.*)$', expand=False)
+                                   .fillna('').str.replace('/', '_', regex=False))
+    # Strip image folder prefixes from the document names
+    documents = documents.str.replace(PREFIX_PAT, '', regex=True)
+    return svc_df.assign(Document=documents)
+
+
+def legacy_order(svc_df):
+    """
+    Return svc_df reordered the way the service table csv has always been
+    written: every non service card row first, followed by the service
+    card rows, each in their original order.
+    """
+    svc_mask = svc_df['URLName'].str.contains('servicecards', regex=False).to_numpy(dtype=bool)
+    return svc_df.iloc[numpy.argsort(svc_mask, kind='stable')]
+
+
+def write_service_csv(svc_df, output_path):
+    """Write a dataframe from service_card_documents to the base service table csv."""
+    legacy_order(svc_df).to_csv(output_path)
+    return output_path
@@ -0,0 +1,123 @@
+# Project: Spire to Locator Contractor data compilation
+# Create Date: 10/17/2026
+# Purpose: Find the loose ends of service lines that have no service point
+#          with one spatial index pass and write them as service points
+# Python Version:   3.6
+# -----------------------------------------------------------------------
+# Import modules
+import numpy
+import shapely
+from shapely import STRtree
+
+
+def _hits(tree_geoms, query_geoms, tolerance=0.0):
+    """
+    Return a boolean array marking which query_geoms touch any of
+    tree_geoms. A tolerance above 0 counts geometries that are within that
+    distance as touching, like the XY tolerance ArcGIS uses.
+    """
+    hit = numpy.zeros(len(query_geoms), dtype=bool)
+    if len(tree_geoms) == 0 or len(query_geoms) == 0:
+        return hit
+    tree = STRtree(tree_geoms)
+    if tolerance > 0:
+        pairs = tree.query(query_geoms, predicate='dwithin', distance=tolerance)
+    else:
+        pairs = tree.query(query_geoms, predicate='intersects')
+    # Row 0 of pairs holds the query geometry index
+    hit[pairs[0]] = True
+    return hit
+
+
+def line_endpoints(lines):
+    """
+    Return the start and end points of each line as two geometry arrays.
+    For multipart lines this is the start of the first part and the end of
+    the last, the same as FeatureVerticesToPoints with BOTH_ENDS.
+    """
+    lines = numpy.asarray(lines, dtype=object)
+    starts = shapely.get_point(shapely.get_geometry(lines, 0), 0)
+    ends = shapely.get_point(shapely.get_geometry(lines, -1), -1)
+    return starts, ends
+
+
+def orphan_endpoints(lines, points, mains, tolerance=0.0):
+    """
+    Find the endpoints of service lines that need a phantom service point.
+
+    Lines touching any service point are dropped. The two ends of every
+    other line are then checked against the mains and the ends that don't
+    touch a main are kept. Each test is a single STRtree query over every
+    geometry at once.
+
+    Parameters
+    ----------
+    lines : array like
+        Shapely service line geometries.
+    points : array like
+        Shapely service point geometries.
+    mains : array like
+        Shapely distribution main geometries.
+    tolerance : float
+        Distance in map units under which geometries are counted as touching.
+
+    Returns a tuple of the index into lines each endpoint came from and an
+    array of the endpoint geometries, starts before ends.
+    """
+    lines = numpy.asarray(lines, dtype=object)
+    points = numpy.asarray(points, dtype=object)
+    mains = numpy.asarray(mains, dtype=object)
+    points = points[~(shapely.is_missing(points) | shapely.is_empty(points))]
+    mains = mains[~(shapely.is_missing(mains) | shapely.is_empty(mains))]
+    # Lines without a service point, skipping null and empty geometries
+    valid = ~(shapely.is_missing(lines) | shapely.is_empty(lines))
+    loose = numpy.flatnonzero(valid & ~_hits(points, lines, tolerance))
+    starts, ends = line_endpoints(lines[loose])
+    line_idx = numpy.concatenate([loose, loose])
+    ends = numpy.concatenate([starts, ends])
+    # A line with an empty first or last part has no point at that end
+    found = ~shapely.is_missing(ends)
+    line_idx = line_idx[found]
+    ends = ends[found]
+    # Ends that are on a main are the service tap, not the loose end
+    keep = ~_hits(mains, ends, tolerance)
+    return line_idx[keep], ends[keep]
+
+
+def _read_shapes(in_fc, fields=()):
+    """Read the geometry and fields of a feature class as shapely geometries and rows."""
+    import arcpy
+    shapes = []
+    rows = []
+    with arcpy.da.SearchCursor(in_fc, ['SHAPE@WKB'] + list(fields)) as cursor:
+        for row in cursor:
+            shapes.append(row[0])
+            rows.append(row[1:])
+    return shapely.from_wkb(numpy.array(shapes, dtype=object)), rows
+
+
+def append_orphan_points(point_fc, line_fc, main_fc,
+                         line_fields=('MXLOCATION', 'STREETADDRESS'),
+                         point_fields=('SERVICEMXL', 'STREETADDR'),
+                         tolerance=None):
+    """
+    Insert a service point into point_fc at the loose end of every service
+    line in line_fc that has no service point. The line_fields values are
+    copied to the point_fields of the new points. tolerance defaults to
+    the XY tolerance of point_fc. Returns the number of points added.
+    """
+    import arcpy
+    if tolerance is None:
+        tolerance = arcpy.Describe(point_fc).spatialReference.XYTolerance or 0.0
+    points, _ = _read_shapes(point_fc)
+    lines, line_rows = _read_shapes(line_fc, line_fields)
+    # Mains are only read again if they are a different feature class
+    mains = lines if main_fc == line_fc else _read_shapes(main_fc)[0]
+    line_idx, ends = orphan_endpoints(lines, points, mains, tolerance)
+    # Taken point by point so the coordinates stay aligned with line_idx
+    xs = shapely.get_x(ends)
+    ys = shapely.get_y(ends)
+    with arcpy.da.InsertCursor(point_fc, ['SHAPE@XY'] + list(point_fields)) as cursor:
+        for x, y, idx in zip(xs, ys, line_idx):
+            cursor.insertRow([(x, y)] + list(line_rows[idx]))
+    return len(line_idx)
@@ -0,0 +1,125 @@
+# Project: Spire to Locator Contractor data compilation
+# Create Date: 10/17/2026
+# Purpose: Read ArcGIS tables and feature classes into pandas dataframes in
+#          chunks, with column projection and explicit dtypes
+# Python Version:   3.6
+# -----------------------------------------------------------------------
+# Import modules
+from itertools import islice
+import pandas
+from pandas.api.types import union_categoricals
+
+
+class ArcpyRowSource(object):
+    """
+    Row source backed by arcpy. Any object with the same four methods can be
+    handed to the readers below instead, which is how they are used without
+    arcpy (for example a row source serving rows from a list).
+    """
+    def oid_field(self, in_fc):
+        """Return the name of the object id field."""
+        import arcpy
+        return arcpy.Describe(in_fc).OIDFieldName
+
+    def field_names(self, in_fc):
+        """Return the names of every field in the table."""
+        import arcpy
+        return [field.name for field in arcpy.ListFields(in_fc)]
+
+    def rows(self, in_fc, fields, query):
+        """Yield row tuples for fields from a da search cursor."""
+        import arcpy
+        with arcpy.da.SearchCursor(in_fc, fields, where_clause=query) as cursor:
+            for row in cursor:
+                yield row
+
+    def bulk(self, in_fc, fields, query, kind='numpy', null_value=None):
+        """
+        Read fields in one call. kind is 'numpy' for TableToNumPyArray or
+        'arrow' for TableToArrowTable (ArcGIS Pro 3.2 and later). Returns a
+        dataframe.
+        """
+        import arcpy
+        if kind == 'arrow':
+            if not hasattr(arcpy.da, 'TableToArrowTable'):
+                raise ValueError("This version of ArcGIS does not support arrow tables. Use kind='numpy'.")
+            return arcpy.da.TableToArrowTable(in_fc, fields, where_clause=query).to_pandas()
+        return pandas.DataFrame(arcpy.da.TableToNumPyArray(in_fc, fields, where_clause=query,
+                                                           null_value=null_value))
+
+
+def _final_fields(source, in_fc, input_fields):
+    """Return the oid field name and the fields to read."""
+    oid = source.oid_field(in_fc)
+    # If there are input fields entered, add the oid to them, otherwise use all fields
+    if input_fields:
+        return oid, [oid] + [f for f in input_fields if f != oid]
+    return oid, source.field_names(in_fc)
+
+
+def iter_table_chunks(in_fc, input_fields=None, query="", chunk_size=100000, dtypes=None,
+                      row_source=None):
+    """
+    Yield an arcgis table as pandas dataframes of up to chunk_size rows with
+    an object id index. Only one chunk of rows is held in memory at a time.
+
+    :param - in_fc - input feature class or table to convert
+    :param - input_fields - fields to read. All fields are read if omitted.
+    :param - query - sql query to grab appropriate values
+    :param - chunk_size - number of rows in each dataframe
+    :param - dtypes - dictionary of field name to dtype applied to each chunk,
+             for example 'category' for codes or 'string' for nullable text
+    :param - row_source - object supplying rows. Defaults to arcpy.
+    :returns - generator of pandas.DataFrame"""
+    source = row_source if row_source is not None else ArcpyRowSource()
+    oid, final_fields = _final_fields(source, in_fc, input_fields)
+    rows = iter(source.rows(in_fc, final_fields, query))
+    first = True
+    while True:
+        data = list(islice(rows, chunk_size))
+        # Always yield at least one (possibly empty) chunk so callers get the
+        # columns, but no empty chunk after a full one, as its categories
+        # wouldn't combine with the others
+        if not data and not first:
+            return
+        first = False
+        chunk = pandas.DataFrame.from_records(data, columns=final_fields)
+        if dtypes:
+            chunk = chunk.astype(dtypes)
+        yield chunk.set_index(oid, drop=True)
+        if len(data) < chunk_size:
+            return
+
+
+def concat_chunks(chunks):
+    """
+    Concatenate dataframe chunks. Categorical columns are combined with a
+    union of their categories so they stay categorical.
+    """
+    chunks = list(chunks)
+    if len(chunks) == 1:
+        return chunks[0]
+    combined = pandas.concat(chunks)
+    for column in chunks[0].columns:
+        if all(isinstance(chunk[column].dtype, pandas.CategoricalDtype) for chunk in chunks):
+            combined[column] = pandas.Categorical(union_categoricals([chunk[column] for chunk in chunks]))
+    return combined
+
+
+def read_table(in_fc, input_fields=None, query="", dtypes=None, chunk_size=100000,
+               bulk=None, null_value=None, row_source=None):
+    """
+    Read an arcgis table into one pandas dataframe with an object id index.
+    Rows are converted a chunk at a time so dtypes are applied before the
+    next chunk is read. bulk can be 'numpy' or 'arrow' to read all the rows
+    in a single call instead of through a cursor. null_value is passed to
+    the numpy reader, which needs a fill value for null fields.
+    """
+    source = row_source if row_source is not None else ArcpyRowSource()
+    if bulk:
+        oid, final_fields = _final_fields(source, in_fc, input_fields)
+        table_df = source.bulk(in_fc, final_fields, query, bulk, null_value)
+        if dtypes:
+            table_df = table_df.astype(dtypes)
+        return table_df.set_index(oid, drop=True)
+    return concat_chunks(iter_table_chunks(in_fc, input_fields, query, chunk_size, dtypes, source))
@@ -0,0 +1,149 @@
+# Project: MO Environmental Updates
+# Create Date: 10/17/2026
+# Purpose: A local ArcGIS REST layer served over http for the tests, so the
+#          fetch code runs against real requests without a map service
+# -----------------------------------------------------------------------
+# Import modules
+import re
+import json
+import threading
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class MockLayer(object):
+    """
+    One map or feature service layer. where clauses of 1=1 and
+    FIELD IN (...) are understood, quoted or not.
+
+    Parameters
+    ----------
+    features : list
+        Esri json features, each with attributes holding the oid field.
+    fields : list
+        Esri json field descriptions. The first field is the object id.
+    max_record_count : int
+        Largest page the layer returns.
+    token : String
+        Token every request has to send, or None.
+    failures : list
+        Http status codes returned, in turn, before any request succeeds.
+    """
+    def __init__(self, features, fields, max_record_count=1000, token=None, failures=()):
+        self.features = features
+        self.fields = fields
+        self.oid_field = fields[0]['name']
+        self.max_record_count = max_record_count
+        self.token = token
+        self.failures = list(failures)
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def info(self):
+        return {'objectIdField': self.oid_field, 'maxRecordCount': self.max_record_count,
+                'geometryType': 'esriGeometryPoint', 'fields': self.fields,
+                'extent': {'spatialReference': {'wkid': 4326}}}
+
+    def matching(self, where):
+        """Return the features matching a where clause."""
+        if where.strip() == '1=1':
+            return list(self.features)
+        match = re.fullmatch(r"\s*(\w+) IN \((.*)\)\s*", where)
+        if match is None:
+            raise ValueError("Unsupported where clause: " + where)
+        field = match.group(1)
+        values = set()
+        for quoted, number in re.findall(r"'((?:[^']|'')*)'|([-\d.e]+)", match.group(2)):
+            values.add(quoted.replace("''", "'") if not number else float(number))
+        found = []
+        for feature in self.features:
+            value = feature['attributes'].get(field)
+            if isinstance(value, (int, float)):
+                value = float(value)
+            if value in values:
+                found.append(feature)
+        return found
+
+    def respond(self, path, params):
+        """Return the status code and json body for one request."""
+        with self.lock:
+            self.requests.append((path, params))
+            if self.failures:
+                return self.failures.pop(0), {}
+        if self.token is not None and params.get('token') != self.token:
+            return 200, {'error': {'code': 499, 'message': 'Token Required'}}
+        if not path.endswith('/query'):
+            return 200, self.info()
+        if 'returnIdsOnly' in params:
+            try:
+                features = self.matching(params['where'])
+            except ValueError as err:
+                return 200, {'error': {'code': 400, 'message': str(err)}}
+            return 200, {'objectIds': [f['attributes'][self.oid_field] for f in features]}
+        oids = [int(oid) for oid in params['objectIds'].split(',')]
+        wanted = set(oids[:self.max_record_count])
+        features = [f for f in self.features if f['attributes'][self.oid_field] in wanted]
+        body = {'fields': self.fields, 'geometryType': 'esriGeometryPoint',
+                'spatialReference': {'wkid': int(params.get('outSR') or 4326)}, 'features': features}
+        if len(oids) > self.max_record_count:
+            body['exceededTransferLimit'] = True
+        return 200, body
+
+
+class MockServer(object):
+    """
+    Serves a MockLayer on a free local port until closed. url is the
+    layer's url. GET requests are answered from routes, which maps a path to
+    a tuple of status code, bytes body and headers, or to a function taking
+    the request headers and returning one.
+    """
+    def __init__(self, layer=None, routes=None):
+        self.layer = layer
+        self.routes = routes or {}
+        self.hits = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                path = urllib.parse.urlsplit(self.path).path
+                server.hits.append(path)
+                route = server.routes.get(path, (404, b'', {}))
+                if callable(route):
+                    route = route(self.headers)
+                status, body, headers = route
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                length = int(self.headers['Content-Length'])
+                params = dict(urllib.parse.parse_qsl(self.rfile.read(length).decode('utf-8')))
+                status, payload = server.layer.respond(self.path, params)
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        self.base = "http://127.0.0.1:{0}".format(self.httpd.server_address[1])
+        self.url = self.base + "/arcgis/rest/services/Test/MapServer/0"
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
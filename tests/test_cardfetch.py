@@ -0,0 +1,99 @@
+# Project: Spire to Locator Contractor data compilation
+# Create Date: 10/17/2026
+# Purpose: Check service card downloads, retries and the bad csv against a
+#          local http server
+# -----------------------------------------------------------------------
+# Import modules
+import os
+import pandas
+import requests
+import cardfetch
+import doccache
+from tests.mockrest import MockServer
+
+
+def flaky(statuses, body):
+    """Return a route answering with each of statuses in turn, then body."""
+    statuses = list(statuses)
+
+    def route(headers):
+        if statuses:
+            return statuses.pop(0), b'', {}
+        return 200, body, {'ETag': '"v1"'}
+    return route
+
+
+def cards_frame(server, names):
+    return pandas.DataFrame({'Location': list(range(len(names))),
+                             'URLName': [server.base + '/cards/' + name for name in names],
+                             'Document': names})
+
+
+def test_downloads_cards_and_records_bad_urls(tmp_path):
+    routes = {'/cards/a.pdf': (200, b'card a', {}),
+              '/cards/b.pdf': flaky([503, 502], b'card b')}
+    os.makedirs(str(tmp_path / 'EAST'))
+    badcsv = str(tmp_path / 'bad.csv')
+    with MockServer(routes=routes) as server:
+        with cardfetch.CardDownloader(workers=2, backoff=0) as downloader:
+            good, bad = downloader.download_frame(cards_frame(server, ['a.pdf', 'b.pdf', 'missing.pdf']),
+                                                  str(tmp_path), 'EAST', badcsv)
+        hits = list(server.hits)
+    assert (good, bad) == (2, 1)
+    assert (tmp_path / 'EAST' / 'b.pdf').read_bytes() == b'card b'
+    assert not os.path.exists(str(tmp_path / 'EAST' / 'missing.pdf.part'))
+    assert open(badcsv).read().strip().endswith('/cards/missing.pdf')
+    # 5xx are retried, a 404 is not
+    assert hits.count('/cards/b.pdf') == 3
+    assert hits.count('/cards/missing.pdf') == 1
+
+
+def test_only_transient_errors_are_retried():
+    def http_error(status):
+        response = requests.Response()
+        response.status_code = status
+        return requests.HTTPError(response=response)
+    retryable = cardfetch.CardDownloader._is_retryable
+    assert retryable(requests.ConnectionError())
+    assert retryable(requests.Timeout())
+    assert retryable(http_error(429))
+    assert retryable(http_error(507))
+    assert not retryable(http_error(404))
+    assert not retryable(http_error(401))
+    assert not retryable(ValueError("bad card"))
+
+
+def test_unchanged_card_is_not_downloaded_again(tmp_path):
+    def conditional(headers):
+        if headers.get('If-None-Match') == '"v1"':
+            return 304, b'', {}
+        return 200, b'card c', {'ETag': '"v1"'}
+    os.makedirs(str(tmp_path / 'EAST'))
+    cache = doccache.DocumentCache(str(tmp_path / 'manifest.json'))
+    with MockServer(routes={'/cards/c.pdf': conditional}) as server:
+        url = server.base + '/cards/c.pdf'
+        filepath = str(tmp_path / 'EAST' / 'c.pdf')
+        with cardfetch.CardDownloader(cache=cache, backoff=0) as downloader:
+            downloader.fetch(url, filepath)
+            os.remove(filepath)
+            downloader.fetch(url, filepath)
+    assert open(filepath, 'rb').read() == b'card c'
+    assert cache.transferred == 1
+    assert cache.linked == 1
+
+
+def test_cards_no_longer_listed_leave_the_cache(tmp_path):
+    routes = {'/cards/a.pdf': (200, b'card a', {}), '/cards/b.pdf': (200, b'card b', {})}
+    os.makedirs(str(tmp_path / 'EAST'))
+    badcsv = str(tmp_path / 'bad.csv')
+    cache = doccache.DocumentCache(str(tmp_path / 'DocumentCache' / 'EAST' / 'DocumentManifest.json'))
+    with MockServer(routes=routes) as server:
+        with cardfetch.CardDownloader(cache=cache, backoff=0) as downloader:
+            downloader.download_frame(cards_frame(server, ['a.pdf', 'b.pdf']), str(tmp_path), 'EAST', badcsv)
+            downloader.download_frame(cards_frame(server, ['a.pdf']), str(tmp_path), 'EAST', badcsv)
+        url = server.base + '/cards/a.pdf'
+    assert list(cache.entries) == [url]
+    stored = [name for _, _, names in os.walk(cache.store_dir) for name in names]
+    assert stored == [cache.entries[url]['sha256']]
+    assert cache.pruned == 1
+    assert os.path.exists(cache.manifest_path)
@@ -0,0 +1,73 @@
+# Project: Missouri East Cast Iron Model
+# Create Date: 10/17/2026
+# Purpose: Check the nearest main search, the distance classes and the
+#          conversion of feet to map units without arcpy
+# -----------------------------------------------------------------------
+# Import modules
+import math
+from types import SimpleNamespace
+import numpy
+import pytest
+import shapely
+from shapely.geometry import LineString, Point
+import cisnap
+
+
+def main_index():
+    # Two mains along y=0 and y=100
+    return cisnap.MainIndex([LineString([(0, 0), (100, 0)]), LineString([(0, 100), (100, 100)])], [11, 22])
+
+
+def test_nearest_snaps_onto_the_closest_main():
+    distance, ids, snapped = main_index().nearest([Point(50, 5), Point(20, 90)])
+    assert distance.tolist() == [5.0, 10.0]
+    assert ids.tolist() == [11, 22]
+    assert [(p.x, p.y) for p in snapped] == [(50.0, 0.0), (20.0, 100.0)]
+
+
+def test_nearest_skips_missing_and_empty_points():
+    points = [None, Point(50, 5), shapely.from_wkt('POINT EMPTY')]
+    distance, ids, snapped = main_index().nearest(points)
+    assert math.isnan(distance[0]) and math.isnan(distance[2])
+    assert distance[1] == 5.0
+    assert ids.tolist() == [None, 11, None]
+    assert snapped[0] is None and snapped[2] is None
+
+
+def test_nearest_with_nothing_to_search():
+    distance, ids, snapped = main_index().nearest([None])
+    assert numpy.isnan(distance).all() and ids.tolist() == [None]
+    distance, ids, snapped = cisnap.MainIndex([], []).nearest([Point(0, 0)])
+    assert numpy.isnan(distance).all() and snapped.tolist() == [None]
+
+
+def test_nearest_stops_at_max_distance():
+    distance, ids, snapped = main_index().nearest([Point(50, 5), Point(50, 40), Point(50, 30)],
+                                                  max_distance=30)
+    assert distance[0] == 5.0 and distance[2] == 30.0
+    assert math.isnan(distance[1])
+    assert ids.tolist() == [11, None, 11]
+    assert snapped[1] is None
+
+
+def test_classify_boundaries_and_nan():
+    status = cisnap.classify([0.0, 10.0, 10.5, 25.0, 25.5, float('nan')], 10, 25)
+    assert status.tolist() == [cisnap.WITHIN, cisnap.WITHIN, cisnap.SNAPPED, cisnap.SNAPPED,
+                               cisnap.MOVE_CLOSER, cisnap.MOVE_CLOSER]
+
+
+def test_feet_to_units():
+    feet_sr = SimpleNamespace(name='State Plane (US Feet)', type='Projected', metersPerUnit=0.3048006096012192)
+    meters_sr = SimpleNamespace(name='UTM 15N', type='Projected', metersPerUnit=1.0)
+    assert cisnap.feet_to_units(10, feet_sr) == pytest.approx(10, rel=1e-5)
+    assert cisnap.feet_to_units(10, meters_sr) == pytest.approx(3.048)
+
+
+@pytest.mark.parametrize('sr', [
+    SimpleNamespace(name='GCS_WGS_1984', type='Geographic', metersPerUnit=None),
+    SimpleNamespace(name='GCS_WGS_1984', type='Geographic', metersPerUnit=1.0),
+    SimpleNamespace(name='Unknown', type='Projected', metersPerUnit=0),
+])
+def test_feet_to_units_needs_a_projected_system(sr):
+    with pytest.raises(ValueError):
+        cisnap.feet_to_units(10, sr)
@@ -0,0 +1,81 @@
+# Project: MO Environmental Updates
+# Create Date: 10/17/2026
+# Purpose: Run the GeoPandas contamination pipeline end to end on small
+#          fixture layers, without arcpy or the DNR services
+# -----------------------------------------------------------------------
+# Import modules
+import pytest
+import shapely
+import geopandas
+import contamoffline
+import contamschema
+
+# Missouri East state plane, in feet
+CRS = 'EPSG:6512'
+
+
+def frame(rows, geometry):
+    return geopandas.GeoDataFrame(rows, geometry=geometry, crs=CRS)
+
+
+@pytest.fixture
+def layers():
+    """Four parcels in a row, two DNR sites, one FUSRAP and one PCB polygon."""
+    parcels = frame({'PARCELID': ['P1', 'P2', 'P3', 'P4']},
+                    [shapely.box(x * 100, 0, x * 100 + 90, 90) for x in range(4)])
+    # The HWP site sits between P1 and P2, so both parcels join to it
+    hwp = frame({'SITENAME': ['Old Plating Works'], 'FACNAME': ['Plating'], 'AULID': ['A1'], 'OUID': ['1'],
+                 'SMARSID': [None], 'FEDERALID': [None], 'COUNTY': ['St. Louis'], 'DNRPROGRAM': ['HWP'],
+                 'SITEOWN': [None]},
+                [shapely.Point(95, 45).buffer(3)])
+    # The UST site is in P4, 52 feet from P3, and has no name so it takes
+    # the facility name
+    ust = frame({'SITENAME': [None], 'FACNAME': ['Corner Station'], 'AULID': [None], 'OUID': [None],
+                 'SMARSID': ['S9'], 'FEDERALID': [None], 'COUNTY': ['St. Louis'], 'DNRPROGRAM': ['UST'],
+                 'SITEOWN': ['Private']},
+                [shapely.Point(345, 45).buffer(3)])
+    fusrap = frame({'SUBTYPECD': [1], 'NOTES': ['FUSRAP'], 'AUL_ID': [None]},
+                   [shapely.box(1000, 1000, 1100, 1100)])
+    pcb = frame({'SUBTYPECD': [2], 'NOTES': [None], 'AUL_ID': [None]},
+                [shapely.Point(2000, 2000).buffer(25)])
+    return parcels, fusrap, pcb, hwp, ust
+
+
+def test_join_parcels_finds_parcels_near_each_site(layers):
+    parcels, _, _, hwp, ust = layers
+    union = contamoffline.fill_site_names(contamoffline.join_parcels(parcels, [ust, hwp], distance_feet=50))
+    names = union.groupby('SITENAME').size().to_dict()
+    assert names == {'Old Plating Works': 2, 'Corner Station': 1}
+
+
+def test_pipeline_writes_every_stage(tmp_path, layers):
+    parcels, fusrap, pcb, hwp, ust = layers
+    pipeline = contamoffline.OfflinePipeline(str(tmp_path), workers=2)
+    result = pipeline.run(parcels, fusrap, pcb, hwp, ust)
+    for name in ("DNRHWPSite", "DNRTankSite", "contamination_union", "contamination_dissolve", "Contamination"):
+        assert (tmp_path / (name + ".parquet")).exists()
+    # One FUSRAP, one PCB and one polygon per DNR site
+    assert sorted(result['SUBTYPECD'].tolist()) == [1, 2, 3, 3]
+    dnr = result[result['SUBTYPECD'] == 3].set_index('SITE_FACILITY_NAME')
+    assert dnr.loc['Old Plating Works', 'SITE_OWNERSHIP'] == 'HWP'
+    assert dnr.loc['Corner Station', 'SITE_OWNERSHIP'] == 'Private'
+    assert dnr.loc['Old Plating Works', 'AUL_ID'] == 'A1'
+    assert result.loc[result['SUBTYPECD'] == 2, 'NOTES'].iloc[0] == contamschema.PCB_NOTES
+    assert result.geometry.is_valid.all()
+    # The saved result reads back the same
+    assert len(pipeline.load("Contamination")) == len(result)
+
+
+def test_esri_feature_set_to_frame():
+    feature_set = {'fields': [{'name': 'SITENAME'}],
+                   'spatialReference': {'wkid': 102696, 'latestWkid': 6512},
+                   'features': [{'attributes': {'SITENAME': 'A'},
+                                 'geometry': {'rings': [[[0, 0], [0, 10], [10, 10], [10, 0], [0, 0]],
+                                                        [[2, 2], [8, 2], [8, 8], [2, 8], [2, 2]]]}},
+                                {'attributes': {'SITENAME': 'B'}, 'geometry': {'x': 1.0, 'y': 2.0}},
+                                {'attributes': {'SITENAME': 'C'}, 'geometry': None}]}
+    gdf = contamoffline.feature_set_to_gdf(feature_set)
+    assert gdf.crs.to_epsg() == 6512
+    assert gdf.geometry.iloc[0].area == 100 - 36
+    assert gdf.geometry.iloc[1].equals(shapely.Point(1, 2))
+    assert gdf.geometry.iloc[2] is None
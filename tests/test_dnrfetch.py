@@ -0,0 +1,73 @@
+# Project: MO Environmental Updates
+# Create Date: 10/17/2026
+# Purpose: Check paging, retries and error handling of the map service layer
+#          fetcher against a local mock MapServer
+# -----------------------------------------------------------------------
+# Import modules
+import pytest
+import dnrfetch
+from tests.mockrest import MockLayer, MockServer
+
+FIELDS = [{'name': 'OBJECTID', 'type': 'esriFieldTypeOID'},
+          {'name': 'SITENAME', 'type': 'esriFieldTypeString'}]
+
+
+def site_layer(count=950, **kwargs):
+    features = [{'attributes': {'OBJECTID': oid, 'SITENAME': 'Site {0}'.format(oid)},
+                 'geometry': {'x': float(oid), 'y': 0.0}} for oid in range(1, count + 1)]
+    return MockLayer(features, FIELDS, **kwargs)
+
+
+def test_fetch_pages_by_max_record_count():
+    layer = site_layer(max_record_count=200)
+    with MockServer(layer) as server:
+        with dnrfetch.LayerFetcher(server.url, workers=3) as fetcher:
+            feature_set = fetcher.fetch()
+            assert fetcher.requests_sent == 1 + 1 + 5
+    assert len(feature_set['features']) == 950
+    assert sorted(f['attributes']['OBJECTID'] for f in feature_set['features']) == list(range(1, 951))
+    assert feature_set['fields'] == FIELDS
+
+
+def test_short_pages_are_requested_again():
+    # The layer reports 500 but only returns 200 at a time
+    layer = site_layer(max_record_count=200)
+    layer.info = lambda: dict(MockLayer.info(layer), maxRecordCount=500)
+    with MockServer(layer) as server:
+        with dnrfetch.LayerFetcher(server.url, workers=1) as fetcher:
+            feature_set = fetcher.fetch()
+    assert len(feature_set['features']) == 950
+
+
+def test_empty_result_keeps_the_layer_schema():
+    with MockServer(site_layer(count=0)) as server:
+        with dnrfetch.LayerFetcher(server.url) as fetcher:
+            feature_set = fetcher.fetch()
+    assert feature_set['features'] == []
+    assert feature_set['fields'] == FIELDS
+    assert feature_set['spatialReference'] == {'wkid': 4326}
+
+
+def test_server_errors_are_retried():
+    layer = site_layer(count=10, failures=[503, 500])
+    with MockServer(layer) as server:
+        with dnrfetch.LayerFetcher(server.url, backoff=0) as fetcher:
+            feature_set = fetcher.fetch()
+    assert len(feature_set['features']) == 10
+
+
+def test_client_errors_are_not_retried():
+    layer = site_layer(count=10, failures=[404, 404, 404])
+    with MockServer(layer) as server:
+        with dnrfetch.LayerFetcher(server.url, backoff=0) as fetcher:
+            with pytest.raises(dnrfetch.RestServiceError):
+                fetcher.fetch()
+    assert len(layer.requests) == 1
+
+
+def test_drop_fields_removes_the_service_oid():
+    with MockServer(site_layer(count=3)) as server:
+        with dnrfetch.LayerFetcher(server.url) as fetcher:
+            feature_set = dnrfetch.drop_fields(fetcher.fetch(), [fetcher.oid_field()])
+    assert [f['name'] for f in feature_set['fields']] == ['SITENAME']
+    assert all(list(f['attributes']) == ['SITENAME'] for f in feature_set['features'])
@@ -0,0 +1,74 @@
+# Project: Missouri East Cast Iron Model
+# Create Date: 10/17/2026
+# Purpose: Check that work orders are pushed down to a feature service as
+#          batches of IN clauses, against a local mock feature service
+# -----------------------------------------------------------------------
+# Import modules
+import pytest
+import dnrfetch
+from tests.mockrest import MockLayer, MockServer
+
+OID = {'name': 'OBJECTID', 'type': 'esriFieldTypeOID'}
+
+
+def work_order_layer(field_type='esriFieldTypeString', **kwargs):
+    features = []
+    for oid in range(1, 2001):
+        work_order = 1000 + oid % 700
+        value = str(work_order) if field_type == 'esriFieldTypeString' else work_order
+        features.append({'attributes': {'OBJECTID': oid, 'WORKORDERMX': value},
+                         'geometry': {'x': float(oid), 'y': float(oid * 2)}})
+    return MockLayer(features, [OID, {'name': 'WORKORDERMX', 'type': field_type}], **kwargs)
+
+
+def test_in_clauses_batches_and_quotes():
+    clauses = dnrfetch.in_clauses('WO', ["O'Neil", 'A', 'B', None, 'A'], batch_size=2)
+    assert clauses == ["WO IN ('A', 'B')", "WO IN ('O''Neil')"]
+
+
+def test_numeric_values_skip_text():
+    numbers, skipped = dnrfetch.numeric_values(['12', ' 7 ', '1.5', 'WO-12', 'nan', None, 3])
+    assert numbers == ['12', '7', '1.5', '3']
+    assert skipped == ['WO-12', 'nan']
+
+
+def test_fetch_values_with_token():
+    layer = work_order_layer(max_record_count=300, token='tok')
+    with MockServer(layer) as server:
+        with dnrfetch.LayerFetcher(server.url, token='tok', workers=4) as fetcher:
+            work_orders = [str(1000 + i) for i in range(0, 700, 2)]
+            feature_set, skipped = fetcher.fetch_values('WORKORDERMX', work_orders, ['WORKORDERMX'], 3857,
+                                                        batch_size=100)
+    assert skipped == []
+    # 2000 features over 700 work orders, every other one asked for
+    expected = [f for f in layer.features if f['attributes']['WORKORDERMX'] in set(work_orders)]
+    assert len(feature_set['features']) == len(expected)
+    assert feature_set['spatialReference'] == {'wkid': 3857}
+    # Only matching features are requested, in pages of maxRecordCount
+    pages = [params for path, params in layer.requests if 'objectIds' in params]
+    assert all(len(params['objectIds'].split(',')) <= 300 for params in pages)
+    assert all(params['token'] == 'tok' for _, params in layer.requests)
+
+
+def test_fetch_values_without_token_fails():
+    with MockServer(work_order_layer(token='tok')) as server:
+        with dnrfetch.LayerFetcher(server.url, retries=0) as fetcher:
+            with pytest.raises(dnrfetch.RestServiceError):
+                fetcher.fetch_values('WORKORDERMX', ['1001'])
+
+
+def test_fetch_values_skips_text_for_number_field():
+    layer = work_order_layer('esriFieldTypeInteger')
+    with MockServer(layer) as server:
+        with dnrfetch.LayerFetcher(server.url) as fetcher:
+            feature_set, skipped = fetcher.fetch_values('WORKORDERMX', ['1001', 'WO-1002', '1003.0'])
+    values = {f['attributes']['WORKORDERMX'] for f in feature_set['features']}
+    assert values == {1001, 1003}
+    assert skipped == ['WO-1002']
+
+
+def test_fetch_values_refuses_date_fields():
+    with MockServer(work_order_layer('esriFieldTypeDate')) as server:
+        with dnrfetch.LayerFetcher(server.url) as fetcher:
+            with pytest.raises(dnrfetch.RestServiceError):
+                fetcher.fetch_values('WORKORDERMX', ['2026-01-01'])
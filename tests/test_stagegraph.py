@@ -0,0 +1,44 @@
+# Project: Spire to Locator Contractor data compilation / MO Environmental Updates
+# Create Date: 10/17/2026
+# Purpose: Check that stage graph reruns skip finished stages and rerun the
+#          stages after an always stage whose result changed
+# -----------------------------------------------------------------------
+# Import modules
+import os
+import stagegraph
+
+
+def build(path, calls, layer_built):
+    """Return a graph with an always stage feeding a checkpointed one."""
+    graph = stagegraph.StageGraph(path, 'run')
+    graph.add('layer', lambda stage: calls.append('layer') or layer_built, always=True)
+    graph.add('join', lambda stage: calls.append('join') or 1, deps=['layer'])
+    return graph
+
+
+def test_unchanged_always_stage_lets_later_stages_skip(tmp_path):
+    path = str(tmp_path / 'Checkpoints.json')
+    calls = []
+    build(path, calls, '2026-10-17T01:00:00').run()
+    build(path, calls, '2026-10-17T01:00:00').run()
+    assert calls == ['layer', 'join', 'layer']
+
+
+def test_changed_always_stage_reruns_later_stages(tmp_path):
+    path = str(tmp_path / 'Checkpoints.json')
+    calls = []
+    build(path, calls, '2026-10-17T01:00:00').run()
+    results = build(path, calls, '2026-10-17T02:00:00').run()
+    assert calls == ['layer', 'join', 'layer', 'join']
+    assert results == {'layer': '2026-10-17T02:00:00', 'join': 1}
+
+
+def test_clear_removes_checkpoints(tmp_path):
+    path = str(tmp_path / 'Checkpoints.json')
+    calls = []
+    graph = build(path, calls, '2026-10-17T01:00:00')
+    graph.run()
+    graph.clear()
+    assert not os.path.exists(path)
+    build(path, calls, '2026-10-17T01:00:00').run()
+    assert calls == ['layer', 'join', 'layer', 'join']
@@ -0,0 +1,59 @@
+# Project: Spire to Locator Contractor data compilation
+# Create Date: 10/17/2026
+# Purpose: Check the orphan service endpoints on synthetic service lines,
+#          points and mains, without arcpy
+# -----------------------------------------------------------------------
+# Import modules
+import numpy
+import shapely
+import svcends
+
+
+def line(*coords):
+    return shapely.LineString(coords)
+
+
+def test_loose_end_of_line_without_point():
+    # Tapped on the main at x=0, loose at x=10
+    lines = [line((0, 0), (10, 0))]
+    mains = [line((0, -50), (0, 50))]
+    line_idx, ends = svcends.orphan_endpoints(lines, [], mains)
+    assert list(line_idx) == [0]
+    assert shapely.equals(ends[0], shapely.Point(10, 0))
+
+
+def test_lines_with_a_point_are_dropped():
+    lines = [line((0, 0), (10, 0)), line((0, 5), (10, 5))]
+    mains = [line((0, -50), (0, 50))]
+    points = [shapely.Point(10, 5)]
+    line_idx, _ = svcends.orphan_endpoints(lines, points, mains)
+    assert list(line_idx) == [0]
+
+
+def test_tolerance_counts_near_misses_as_touching():
+    lines = [line((0.001, 0), (10, 0))]
+    mains = [line((0, -50), (0, 50))]
+    assert len(svcends.orphan_endpoints(lines, [], mains)[0]) == 2
+    assert len(svcends.orphan_endpoints(lines, [], mains, tolerance=0.01)[0]) == 1
+
+
+def test_null_and_empty_lines_keep_indexes_aligned():
+    lines = [line((0, 0), (10, 0)),
+             None,
+             shapely.from_wkt('LINESTRING EMPTY'),
+             shapely.from_wkt('MULTILINESTRING ((20 0, 30 0), EMPTY)'),
+             line((0, 5), (10, 5))]
+    mains = [line((0, -50), (0, 50))]
+    points = [shapely.Point(10, 5), None]
+    line_idx, ends = svcends.orphan_endpoints(lines, points, mains)
+    assert len(line_idx) == len(ends)
+    assert not shapely.is_missing(ends).any()
+    found = {int(idx): (x, y) for idx, x, y in zip(line_idx, shapely.get_x(ends), shapely.get_y(ends))}
+    assert found == {0: (10.0, 0.0), 3: (20.0, 0.0)}
+
+
+def test_multipart_ends_are_first_start_and_last_end():
+    lines = numpy.array([shapely.from_wkt('MULTILINESTRING ((1 1, 2 2), (3 3, 4 4))')], dtype=object)
+    starts, ends = svcends.line_endpoints(lines)
+    assert shapely.equals(starts[0], shapely.Point(1, 1))
+    assert shapely.equals(ends[0], shapely.Point(4, 4))
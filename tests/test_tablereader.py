@@ -0,0 +1,75 @@
+# Project: Spire to Locator Contractor data compilation
+# Create Date: 10/17/2026
+# Purpose: Check the chunked table readers with a row source serving rows
+#          from a list instead of arcpy
+# -----------------------------------------------------------------------
+# Import modules
+import pandas
+import tablereader
+
+FIELDS = ['OBJECTID', 'SERVICEMXL', 'STATUS', 'LENGTH']
+
+
+class ListRowSource(object):
+    """Row source over a list of tuples in FIELDS order."""
+    def __init__(self, rows):
+        self.table = rows
+        self.queries = []
+
+    def oid_field(self, in_fc):
+        return 'OBJECTID'
+
+    def field_names(self, in_fc):
+        return list(FIELDS)
+
+    def rows(self, in_fc, fields, query):
+        self.queries.append(query)
+        positions = [FIELDS.index(name) for name in fields]
+        for row in self.table:
+            yield tuple(row[position] for position in positions)
+
+    def bulk(self, in_fc, fields, query, kind='numpy', null_value=None):
+        return pandas.DataFrame.from_records(list(self.rows(in_fc, fields, query)), columns=fields)
+
+
+def service_rows(count):
+    return [(oid, 'MX{0}'.format(oid), 'ACTIVE' if oid % 3 else 'RETIRED', oid * 1.5)
+            for oid in range(1, count + 1)]
+
+
+def test_chunks_hold_chunk_size_rows():
+    source = ListRowSource(service_rows(25))
+    chunks = list(tablereader.iter_table_chunks('svc', chunk_size=10, row_source=source))
+    assert [len(chunk) for chunk in chunks] == [10, 10, 5]
+    assert chunks[0].index.name == 'OBJECTID'
+    assert list(chunks[0].columns) == FIELDS[1:]
+
+
+def test_empty_table_still_has_columns():
+    chunks = list(tablereader.iter_table_chunks('svc', ['SERVICEMXL'], row_source=ListRowSource([])))
+    assert len(chunks) == 1
+    assert list(chunks[0].columns) == ['SERVICEMXL']
+
+
+def test_projection_reads_only_the_fields_asked_for():
+    source = ListRowSource(service_rows(5))
+    table = tablereader.read_table('svc', ['LENGTH', 'OBJECTID'], query="STATUS = 'ACTIVE'",
+                                   row_source=source)
+    assert list(table.columns) == ['LENGTH']
+    assert source.queries == ["STATUS = 'ACTIVE'"]
+
+
+def test_categories_survive_concatenation():
+    source = ListRowSource(service_rows(20))
+    table = tablereader.read_table('svc', dtypes={'STATUS': 'category'}, chunk_size=4, row_source=source)
+    assert len(table) == 20
+    assert isinstance(table['STATUS'].dtype, pandas.CategoricalDtype)
+    assert set(table['STATUS'].cat.categories) == {'ACTIVE', 'RETIRED'}
+    assert table.loc[3, 'STATUS'] == 'RETIRED'
+
+
+def test_bulk_matches_cursor_read():
+    source = ListRowSource(service_rows(12))
+    by_cursor = tablereader.read_table('svc', chunk_size=5, row_source=source)
+    by_bulk = tablereader.read_table('svc', bulk='numpy', row_source=source)
+    pandas.testing.assert_frame_equal(by_cursor, by_bulk)
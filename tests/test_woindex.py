@@ -0,0 +1,98 @@
+# Project: Missouri East Cast Iron Model
+# Create Date: 10/17/2026
+# Purpose: Check the work order keys, csv field names, the matching of csv
+#          rows and the conversion of csv values to field types
+# -----------------------------------------------------------------------
+# Import modules
+import datetime
+import pytest
+import woindex
+
+
+@pytest.mark.parametrize('value, key', [
+    (12345, '12345'),
+    (12345.0, '12345'),
+    ('12345.00', '12345'),
+    (' 12345 ', '12345'),
+    ('WO-12', 'WO-12'),
+    (12.5, '12.5'),
+    (None, None),
+    (float('nan'), None),
+    ('  ', None),
+])
+def test_work_order_key(value, key):
+    assert woindex.work_order_key(value) == key
+
+
+@pytest.mark.parametrize('column, name', [
+    ('Work Order ID', 'Work_Order_ID'),
+    (' Date (Found) ', 'Date__Found_'),
+    ('2nd Main', '_2nd_Main'),
+    ('MXWONUM', 'MXWONUM'),
+])
+def test_field_name(column, name):
+    assert woindex.field_name(column) == name
+
+
+def test_classify_prefers_leak_repairs_and_counts_every_row():
+    rows = [{'Work_Order_ID': '1'}, {'Work_Order_ID': '2.0'}, {'Work_Order_ID': '3'},
+            {'Work_Order_ID': ''}, {'Work_Order_ID': '1'}]
+    index = woindex.WorkOrderIndex(rows)
+    assert sorted(index.work_orders()) == ['1', '2', '3']
+    assert 2 in index and 4 not in index
+    matches = index.classify({'1': b'lr1', '2': b'lr2'}, {'2': b'po2', '3': b'po3'})
+    assert [geometry for row, geometry in matches.leak_repairs] == [b'lr1', b'lr2', b'lr1']
+    assert [geometry for row, geometry in matches.pipe_observations] == [b'po3']
+    assert matches.unmatched == [{'Work_Order_ID': ''}]
+    assert matches.counts() == {'csv': 5, woindex.LEAK_REPAIR: 3, woindex.PIPE_OBSERVATION: 1,
+                                woindex.UNMATCHED: 1}
+    assert matches.balanced()
+
+
+def test_matches_not_balanced_when_a_row_is_lost():
+    matches = woindex.Matches(2)
+    matches.unmatched.append({})
+    assert not matches.balanced()
+
+
+def test_from_csv_names_fields_and_skips_blank_rows(tmp_path):
+    path = tmp_path / 'input.csv'
+    path.write_text('\ufeffWork Order ID,Date Found\n101,1/2/2026\n,\n102.0,2026-01-03\n', encoding='utf-8')
+    index = woindex.WorkOrderIndex.from_csv(str(path))
+    assert len(index) == 2
+    assert index.rows[0] == {'Work_Order_ID': '101', 'Date_Found': '1/2/2026'}
+    assert sorted(index.work_orders()) == ['101', '102']
+
+
+@pytest.mark.parametrize('text, value', [
+    ('1/2/2026 3:04:05 PM', datetime.datetime(2026, 1, 2, 15, 4, 5)),
+    ('1/2/2026 15:04:05', datetime.datetime(2026, 1, 2, 15, 4, 5)),
+    ('1/2/2026 15:04', datetime.datetime(2026, 1, 2, 15, 4)),
+    ('1/2/2026', datetime.datetime(2026, 1, 2)),
+    ('2026-01-02T15:04:05', datetime.datetime(2026, 1, 2, 15, 4, 5)),
+    ('2026-01-02 15:04:05', datetime.datetime(2026, 1, 2, 15, 4, 5)),
+    ('2026-01-02', datetime.datetime(2026, 1, 2)),
+])
+def test_to_field_value_dates(text, value):
+    assert woindex.to_field_value(text, 'Date') == value
+
+
+def test_to_field_value_numbers_text_and_blanks():
+    assert woindex.to_field_value(' 12 ', 'Integer') == 12
+    assert woindex.to_field_value('12.0', 'SmallInteger') == 12
+    assert woindex.to_field_value('1.5', 'Double') == 1.5
+    assert woindex.to_field_value(' main ', 'String') == 'main'
+    assert woindex.to_field_value('  ', 'Double') is None
+    assert woindex.to_field_value(None, 'Date') is None
+    assert woindex.to_field_value(7, 'String') == 7
+
+
+@pytest.mark.parametrize('text, field_type', [
+    ('abc', 'Integer'),
+    ('1,5', 'Double'),
+    ('2026/01/02', 'Date'),
+    ('13/40/2026', 'Date'),
+])
+def test_to_field_value_rejects_bad_values(text, field_type):
+    with pytest.raises(ValueError):
+        woindex.to_field_value(text, field_type)
@@ -0,0 +1,228 @@
+# Project: Missouri East Cast Iron Model
+# Create Date: 10/17/2026
+# Purpose: Index the input csv by work order and match every row to a leak
+#          repair, a pipe observation or nothing in one pass, writing the
+#          matches straight into the master point schema
+# Python Version:   3.6
+# -----------------------------------------------------------------------
+# Import modules
+import os
+import re
+import csv
+import datetime
+
+# What each csv row matched
+LEAK_REPAIR = 'leak_repair'
+PIPE_OBSERVATION = 'pipe_observation'
+UNMATCHED = 'unmatched'
+
+# Csv fields that aren't copied to the master points. The work order is
+# written to MXWONUM instead of Work_Order_ID.
+SKIP_FIELDS = ['OBJECTID', 'Work_Order_ID', 'GLOBALID']
+WORK_ORDER_FIELD = 'MXWONUM'
+
+
+def work_order_key(value):
+    """Return a work order id as text, the way it is stored in MXWONUM."""
+    if value is None:
+        return None
+    if isinstance(value, float):
+        if value != value:
+            return None
+        if value.is_integer():
+            value = int(value)
+    text = str(value).strip()
+    # Whole numbers read as text from a spreadsheet export
+    if re.fullmatch(r'\d+\.0+', text):
+        text = text.split('.')[0]
+    return text or None
+
+
+def field_name(column):
+    """Return the geodatabase field name a csv column gets, spaces and symbols become _."""
+    name = re.sub(r'\W', '_', column.strip())
+    return '_' + name if name[:1].isdigit() else name
+
+
+class Matches(object):
+    """
+    The csv rows sorted by what they matched. leak_repairs and
+    pipe_observations hold (row, geometry) pairs, unmatched holds rows.
+
+    Parameters
+    ----------
+    csv_count : int
+        Number of rows in the csv.
+    """
+    def __init__(self, csv_count):
+        self.csv_count = csv_count
+        self.leak_repairs = []
+        self.pipe_observations = []
+        self.unmatched = []
+
+    def counts(self):
+        """Return the count reconciliation of the csv rows."""
+        return {'csv': self.csv_count,
+                LEAK_REPAIR: len(self.leak_repairs),
+                PIPE_OBSERVATION: len(self.pipe_observations),
+                UNMATCHED: len(self.unmatched)}
+
+    def balanced(self):
+        """Identify if every csv row was counted as exactly one of the three."""
+        counts = self.counts()
+        return counts['csv'] == counts[LEAK_REPAIR] + counts[PIPE_OBSERVATION] + counts[UNMATCHED]
+
+
+class WorkOrderIndex(object):
+    """
+    The rows of the input csv held in memory and indexed by work order.
+
+    Parameters
+    ----------
+    rows : list
+        Dictionaries of field name to value, one per csv row.
+    key_field : String
+        Field holding the work order id.
+    """
+    def __init__(self, rows, key_field='Work_Order_ID'):
+        self.rows = list(rows)
+        self.key_field = key_field
+        self.keys = [work_order_key(row.get(key_field)) for row in self.rows]
+        self.index = {}
+        for position, key in enumerate(self.keys):
+            if key is not None:
+                self.index.setdefault(key, []).append(position)
+
+    @classmethod
+    def from_csv(cls, path, key_field='Work_Order_ID'):
+        """Read a csv, naming its fields the way TableToTable does."""
+        with open(path, 'r', newline='', encoding='utf-8-sig') as in_file:
+            reader = csv.reader(in_file)
+            header = [field_name(column) for column in next(reader)]
+            rows = [dict(zip(header, values)) for values in reader if any(values)]
+        return cls(rows, key_field)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, work_order):
+        return work_order_key(work_order) in self.index
+
+    def work_orders(self):
+        """Return the distinct work orders in the csv."""
+        return list(self.index)
+
+    def classify(self, leak_repairs, pipe_observations):
+        """
+        Match each row to a leak repair first, then a pipe observation.
+        leak_repairs and pipe_observations are dictionaries of work order to
+        geometry. Returns a Matches.
+        """
+        matches = Matches(len(self.rows))
+        for row, key in zip(self.rows, self.keys):
+            if key in leak_repairs:
+                matches.leak_repairs.append((row, leak_repairs[key]))
+            elif key in pipe_observations:
+                matches.pipe_observations.append((row, pipe_observations[key]))
+            else:
+                matches.unmatched.append(row)
+        return matches
+
+
+# Date formats found in the csv exports, tried in turn
+DATE_FORMATS = ('%m/%d/%Y %I:%M:%S %p', '%m/%d/%Y %H:%M:%S', '%m/%d/%Y %H:%M', '%m/%d/%Y',
+                '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d')
+
+
+def to_field_value(value, field_type):
+    """
+    Convert a csv text value to the type of the field it is written to.
+    Raises ValueError if the text isn't a value of that type.
+    """
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    if not isinstance(value, str):
+        return value
+    value = value.strip()
+    if field_type in ('Integer', 'SmallInteger', 'BigInteger'):
+        return int(float(value))
+    if field_type in ('Double', 'Single'):
+        return float(value)
+    if field_type == 'Date':
+        for date_format in DATE_FORMATS:
+            try:
+                return datetime.datetime.strptime(value, date_format)
+            except ValueError:
+                continue
+        raise ValueError("Unrecognized date: {0}".format(value))
+    return value
+
+
+def fetch_service_points(url, key_field, work_orders, spatial_reference, token=None, workers=4):
+    """
+    Return a dictionary of work order to the geometry of the first feature
+    of a feature service layer with that work order in key_field. Only the
+    work orders in work_orders are requested, in batches of server side IN
+    queries, and only key_field and the geometry come back. Geometries are
+    returned in spatial_reference.
+
+    Also returns a dictionary of the number of features downloaded, the
+    number of requests sent and the work orders skipped because key_field
+    is a number field and they aren't numbers.
+    """
+    import arcpy
+    import dnrfetch
+    wkid = spatial_reference.factoryCode or None
+    with dnrfetch.LayerFetcher(url, workers=workers, token=token) as fetcher:
+        feature_set, skipped = fetcher.fetch_values(key_field, work_orders, [key_field], wkid)
+    fetched = {'features': len(feature_set['features']),
+               'requests': fetcher.requests_sent,
+               'skipped': skipped}
+    service_sr = feature_set.get('spatialReference')
+    points = {}
+    for feature in feature_set['features']:
+        attributes = {name.upper(): value for name, value in feature.get('attributes', {}).items()}
+        key = work_order_key(attributes.get(key_field.upper()))
+        geometry = feature.get('geometry')
+        if key in points or not geometry or geometry.get('x') is None:
+            continue
+        shape = arcpy.AsShape(dict(geometry, spatialReference=service_sr), True)
+        if wkid is None:
+            # No well known id to ask the server for, so project here
+            shape = shape.projectAs(spatial_reference)
+        points[key] = bytes(shape.WKB)
+    return points, fetched
+
+
+def write_points(out_fc, template_fc, matches, spatial_reference, key_field='Work_Order_ID'):
+    """
+    Create out_fc with the schema of template_fc and insert one point per
+    (row, geometry) pair in matches. Row values are written to the fields of
+    the same name, converted to the field type, and the work order to
+    MXWONUM. A value that can't be converted is reported and written as
+    null. Returns the number of points written.
+    """
+    import arcpy
+    if arcpy.Exists(out_fc):
+        arcpy.management.Delete(out_fc)
+    arcpy.management.CreateFeatureclass(os.path.dirname(out_fc), os.path.basename(out_fc), "POINT",
+                                        template_fc, spatial_reference=spatial_reference)
+    skip = {name.upper() for name in SKIP_FIELDS}
+    fields = {f.name.upper(): f for f in arcpy.ListFields(out_fc)
+              if f.editable and f.type not in ('OID', 'GlobalID', 'Geometry') and f.name.upper() not in skip}
+    names = [f.name for f in fields.values()]
+    types = [f.type for f in fields.values()]
+    with arcpy.da.InsertCursor(out_fc, ['SHAPE@WKB'] + names) as cursor:
+        for row, geometry in matches:
+            values = {name.upper(): value for name, value in row.items()}
+            work_order = values[WORK_ORDER_FIELD] = work_order_key(row.get(key_field))
+            new_row = [geometry]
+            for name, field_type in zip(names, types):
+                try:
+                    new_row.append(to_field_value(values.get(name.upper()), field_type))
+                except ValueError:
+                    print("Work order {0}: {1} value {2!r} is not a {3}, it is left empty.".format(
+                        work_order, name, values.get(name.upper()), field_type))
+                    new_row.append(None)
+            cursor.insertRow(new_row)
+    return len(matches)